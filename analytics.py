@@ -0,0 +1,294 @@
+import heapq
+from collections import Counter
+from device_types import DEVICE_TYPES, device_type_of
+from smart_homes_store import DeviceRecord, iter_device_records
+
+
+def home_records(smart_homes):
+    """
+    Stream the devices of in-memory smart homes as plain records.
+    
+    Args:
+        smart_homes (list): The smart homes.
+    
+    Yields:
+        DeviceRecord: The home index, device type name, option value and
+        switch state of each device of a registered type.
+    
+    Returns:
+        int: The number of homes, as the value of the exhausted generator.
+    """
+    for home_index, home in enumerate(smart_homes):
+        for index in range(len(home)):
+            device = home.get_device(index)
+            device_type = device_type_of(device)
+            if device_type is not None:
+                yield DeviceRecord(home_index, device_type.name, device_type.get_option(device), device.switched_on)
+    return len(smart_homes)
+
+
+def store_records(paths, errors=None):
+    """
+    Stream the devices of one or more CSV stores as plain records.
+    
+    The stores are read one after another, one segment at a time, and the
+    homes are numbered across all of them, as import_smart_homes() would
+    order them.
+    
+    Args:
+        paths: A store file path or a list of them.
+        errors (list, optional): A list collecting messages describing
+            skipped segments.
+    
+    Yields:
+        DeviceRecord: The record of each device.
+    
+    Returns:
+        int: The number of homes read, as the value of the exhausted
+        generator.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    homes = 0
+    for path in paths:
+        homes = yield from iter_device_records(path, errors, homes)
+    return homes
+
+
+def _power(record):
+    """Get the watts a device record draws, 0 while it is switched off."""
+    if not record.switched_on:
+        return 0
+    return DEVICE_TYPES[record.type].power_model(record.value)
+
+
+def _option(record):
+    """Get the option value of a device record."""
+    return record.value
+
+
+# Named fields reports can group by and aggregate
+KEYS = {"home": lambda record: record.home, "type": lambda record: record.type}
+VALUES = {"power": _power, "option": _option}
+
+
+def _field(fields, field, kind):
+    """
+    Resolve a field name or callable of a report.
+    
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if callable(field):
+        return field
+    try:
+        return fields[field]
+    except KeyError:
+        raise ValueError(f"Unknown {kind}: {field}") from None
+
+
+class GroupedAggregate:
+    """
+    A report of the count, total, mean, minimum and maximum of a value per
+    group of device records.
+    
+    For example, the mean plug wattage per home is
+    GroupedAggregate("home", "power", where=lambda r: r.type == "SmartPlug").
+    """
+    
+    def __init__(self, key="home", value="power", where=None):
+        """
+        Initialize a GroupedAggregate.
+        
+        Args:
+            key (optional): "home", "type" or a callable taking a record and
+                returning its group. Defaults to "home".
+            value (optional): "power", "option" or a callable taking a
+                record and returning a number. Defaults to "power".
+            where (optional): A callable taking a record and returning
+                whether to include it. Defaults to every record.
+        
+        Raises:
+            ValueError: If the key or value name is unknown.
+        """
+        self.__key = _field(KEYS, key, "key")
+        self.__value = _field(VALUES, value, "value")
+        self.__where = where
+        self.__groups = {}
+    
+    def add(self, record):
+        """
+        Add a device record to its group.
+        
+        Args:
+            record (DeviceRecord): The device record.
+        """
+        if self.__where is not None and not self.__where(record):
+            return
+        value = self.__value(record)
+        key = self.__key(record)
+        group = self.__groups.get(key)
+        if group is None:
+            self.__groups[key] = [1, value, value, value]
+        else:
+            group[0] += 1
+            group[1] += value
+            if value < group[2]:
+                group[2] = value
+            elif value > group[3]:
+                group[3] = value
+    
+    def result(self):
+        """
+        Get the aggregates of every group.
+        
+        Returns:
+            dict: Each group mapped to a dict with its "count", "total",
+            "mean", "min" and "max".
+        """
+        return {
+            key: {"count": count, "total": total, "mean": total / count, "min": low, "max": high}
+            for key, (count, total, low, high) in self.__groups.items()
+        }
+
+
+class Histogram:
+    """
+    A report counting device records per bin of a value.
+    
+    For example, the heater setting distribution is
+    Histogram("option", where=lambda r: r.type == "SmartHeater").
+    """
+    
+    def __init__(self, value="option", width=1, where=None):
+        """
+        Initialize a Histogram.
+        
+        Args:
+            value (optional): "power", "option" or a callable taking a
+                record and returning a number. Defaults to "option".
+            width (int, optional): The width of each bin. Defaults to 1.
+            where (optional): A callable taking a record and returning
+                whether to include it. Defaults to every record.
+        
+        Raises:
+            ValueError: If the value name is unknown or width is not positive.
+        """
+        if width <= 0:
+            raise ValueError("Bin width must be positive")
+        self.__value = _field(VALUES, value, "value")
+        self.__width = width
+        self.__where = where
+        self.__counts = Counter()
+    
+    def add(self, record):
+        """
+        Count a device record in its bin.
+        
+        Args:
+            record (DeviceRecord): The device record.
+        """
+        if self.__where is not None and not self.__where(record):
+            return
+        self.__counts[self.__value(record) // self.__width * self.__width] += 1
+    
+    def result(self):
+        """
+        Get the bin counts.
+        
+        Returns:
+            dict: The lower bound of each non-empty bin mapped to its count,
+            in ascending order.
+        """
+        return dict(sorted(self.__counts.items()))
+
+
+class TopHomes:
+    """
+    A report of the k homes with the largest total of a value, such as the
+    homes drawing the most power.
+    
+    Only k homes are held at a time: a home's total is complete once the
+    records move on to the next home, and it then enters a heap of size k.
+    The records of a home must therefore be contiguous, as they are from
+    every record source.
+    """
+    
+    def __init__(self, k, value="power", where=None):
+        """
+        Initialize a TopHomes report.
+        
+        Args:
+            k (int): The number of homes to keep.
+            value (optional): "power", "option" or a callable taking a
+                record and returning a number. Defaults to "power".
+            where (optional): A callable taking a record and returning
+                whether to include it. Defaults to every record.
+        
+        Raises:
+            ValueError: If k is not a positive integer or the value name is unknown.
+        """
+        if not isinstance(k, int) or k < 1:
+            raise ValueError("k must be a positive integer")
+        self.k = k
+        self.__value = _field(VALUES, value, "value")
+        self.__where = where
+        self.__heap = []
+        self.__home = None
+        self.__total = 0
+    
+    def _flush(self):
+        """Offer the total of the current home to the heap."""
+        if self.__home is None:
+            return
+        entry = (self.__total, -self.__home)
+        if len(self.__heap) < self.k:
+            heapq.heappush(self.__heap, entry)
+        elif entry > self.__heap[0]:
+            heapq.heapreplace(self.__heap, entry)
+        self.__home = None
+        self.__total = 0
+    
+    def add(self, record):
+        """
+        Add a device record to its home's total.
+        
+        Args:
+            record (DeviceRecord): The device record.
+        """
+        if self.__where is not None and not self.__where(record):
+            return
+        if record.home != self.__home:
+            self._flush()
+            self.__home = record.home
+        self.__total += self.__value(record)
+    
+    def result(self):
+        """
+        Get the top homes.
+        
+        Returns:
+            list: (home index, total) tuples, largest total first; ties go
+            to the lower home index.
+        """
+        self._flush()
+        return [(-home, total) for total, home in sorted(self.__heap, reverse=True)]
+
+
+def analyze(records, **reports):
+    """
+    Feed device records to several reports in a single pass.
+    
+    Args:
+        records: An iterable of DeviceRecord, e.g. from store_records() or
+            home_records().
+        **reports: The reports to compute, by name.
+    
+    Returns:
+        dict: The result of each report, by name.
+    """
+    adders = [report.add for report in reports.values()]
+    for record in records:
+        for add in adders:
+            add(record)
+    return {name: report.result() for name, report in reports.items()}
@@ -0,0 +1,481 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from analytics import store_records, analyze, GroupedAggregate, TopHomes
+from device_types import device_type_of, from_columns, update_options
+from ingest import CHUNK_SIZE, IngestPipeline, encode_report
+from load_shedding import LoadShedder
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from smart_homes_store import save_smart_homes, load_smart_homes
+from store_codecs import CODECS
+
+DEFAULT_SIZES = [10, 1000, 100000]
+DEFAULT_THRESHOLD = 0.2
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a benchmark function under a name.
+    
+    A benchmark function takes the problem size and a scratch directory and
+    returns a callable that performs the measured work once; setup done
+    before returning is not timed.
+    
+    Args:
+        name (str): The name of the benchmark.
+    
+    Returns:
+        A decorator registering the function.
+    """
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def _make_devices(size):
+    """Create a repeating mix of plugs, ovens and heaters."""
+    kinds = [lambda: SmartPlug(45), SmartOven, SmartHeater]
+    return [kinds[i % 3]() for i in range(size)]
+
+
+def _make_home(size):
+    """Create a smart home holding a mix of devices."""
+    home = SmartHome(max_items=size)
+    for device in _make_devices(size):
+        home.add_device(device)
+    return home
+
+
+@benchmark("device_construction")
+def bench_device_construction(size, directory):
+    """Construct plugs, ovens and heaters."""
+    def run():
+        for i in range(size // 3 + 1):
+            SmartPlug(45)
+            SmartOven(150)
+            SmartHeater(2)
+    return run
+
+
+@benchmark("device_row_construction")
+def bench_device_row_construction(size, directory):
+    """Construct the devices of device_bulk_construction row by row."""
+    codes = [i % 3 + 1 for i in range(size)]
+    values = [i % 6 for i in range(size)]
+    switched_on = [i % 2 for i in range(size)]
+    classes = {1: SmartPlug, 2: SmartOven, 3: SmartHeater}
+    def run():
+        devices = []
+        for code, value, on in zip(codes, values, switched_on):
+            device = classes[code](value)
+            if on:
+                device.toggle_switch()
+            devices.append(device)
+    return run
+
+
+@benchmark("device_bulk_construction")
+def bench_device_bulk_construction(size, directory):
+    """Construct plugs, ovens and heaters from validated columns."""
+    codes = [i % 3 + 1 for i in range(size)]
+    values = [i % 6 for i in range(size)]
+    switched_on = [i % 2 for i in range(size)]
+    def run():
+        from_columns(codes, values, switched_on)
+    return run
+
+
+@benchmark("property_get")
+def bench_property_get(size, directory):
+    """Read a validated property."""
+    plug = SmartPlug(45)
+    def run():
+        for _ in range(size):
+            plug.consumption_rate
+    return run
+
+
+@benchmark("property_set_validation")
+def bench_property_set(size, directory):
+    """Assign a property through its validating setter."""
+    oven = SmartOven()
+    def run():
+        for i in range(size):
+            oven.temperature = i % 261
+    return run
+
+
+def _make_updates(size):
+    """Create devices and valid option values for size option updates."""
+    devices = _make_devices(min(size, 1000))
+    devices = [devices[i % len(devices)] for i in range(size)]
+    return devices, [i % 6 for i in range(size)]
+
+
+@benchmark("option_update_setter")
+def bench_option_update_setter(size, directory):
+    """Set device options one at a time through the validating setters."""
+    devices, values = _make_updates(size)
+    options = [device_type_of(device).option for device in devices]
+    def run():
+        for device, option, value in zip(devices, options, values):
+            setattr(device, option, value)
+    return run
+
+
+@benchmark("option_update_batch")
+def bench_option_update_batch(size, directory):
+    """Set device options with one batch validation pass."""
+    devices, values = _make_updates(size)
+    def run():
+        update_options(devices, values)
+    return run
+
+
+@benchmark("option_update_trusted")
+def bench_option_update_trusted(size, directory):
+    """Set device options from a trusted source without validation."""
+    devices, values = _make_updates(size)
+    def run():
+        update_options(devices, values, trusted=True)
+    return run
+
+
+@benchmark("home_add_device")
+def bench_home_add(size, directory):
+    """Add devices to an empty home."""
+    devices = _make_devices(size)
+    def run():
+        home = SmartHome(max_items=size)
+        for device in devices:
+            home.add_device(device)
+    return run
+
+
+@benchmark("home_toggle_device")
+def bench_home_toggle(size, directory):
+    """Toggle every device of a home by index."""
+    home = _make_home(size)
+    def run():
+        for i in range(size):
+            home.toggle_device(i)
+    return run
+
+
+@benchmark("home_update_option")
+def bench_home_update_option(size, directory):
+    """Update the option of every device of a home by index."""
+    home = _make_home(size)
+    def run():
+        for i in range(size):
+            home.update_option(i, 5)
+    return run
+
+
+@benchmark("home_switch_all")
+def bench_home_switch_all(size, directory):
+    """Switch every device of a home on and then off."""
+    home = _make_home(size)
+    def run():
+        home.switch_all_on()
+        home.switch_all_off()
+    return run
+
+
+@benchmark("home_remove_device")
+def bench_home_remove(size, directory):
+    """Fill a home and remove every device from the end."""
+    devices = _make_devices(size)
+    def run():
+        home = SmartHome(max_items=size)
+        for device in devices:
+            home.add_device(device)
+        for i in range(size - 1, -1, -1):
+            home.remove_device(i)
+    return run
+
+
+@benchmark("home_str")
+def bench_home_str(size, directory):
+    """Render a home with __str__."""
+    home = _make_home(size)
+    def run():
+        str(home)
+    return run
+
+
+def _make_fleet(size):
+    """Create a fleet of homes with 10 devices each, size devices in total."""
+    fleet = []
+    devices = _make_devices(size)
+    for start in range(0, size, 10):
+        home = SmartHome()
+        for device in devices[start:start + 10]:
+            home.add_device(device)
+        fleet.append(home)
+    return fleet
+
+
+@benchmark("store_save")
+def bench_store_save(size, directory):
+    """Save a fleet of 10-device homes to the CSV store."""
+    fleet = _make_fleet(size)
+    path = os.path.join(directory, "smart_homes.csv")
+    def run():
+        save_smart_homes(fleet, path)
+    return run
+
+
+@benchmark("store_load")
+def bench_store_load(size, directory):
+    """Load a fleet of 10-device homes from the CSV store."""
+    path = os.path.join(directory, "smart_homes.csv")
+    save_smart_homes(_make_fleet(size), path)
+    def run():
+        load_smart_homes(path)
+    return run
+
+
+@benchmark("store_analytics")
+def bench_store_analytics(size, directory):
+    """Stream per-type power and the top homes from the CSV store."""
+    path = os.path.join(directory, "smart_homes.csv")
+    save_smart_homes(_make_fleet(size), path)
+    def run():
+        analyze(store_records(path), types=GroupedAggregate("type"), top=TopHomes(10))
+    return run
+
+
+@benchmark("load_shedding")
+def bench_load_shedding(size, directory):
+    """Switch every device of a fleet of budgeted homes on and off."""
+    fleet = _make_fleet(size)
+    shedder = LoadShedder(1500)
+    for home in fleet:
+        shedder.watch(home)
+    def run():
+        for home in fleet:
+            home.switch_all_on()
+            home.switch_all_off()
+    return run
+
+
+def _make_ingest(size):
+    """Create a fleet and size option updates, one per device, grouped by home."""
+    fleet = _make_fleet(size)
+    batches = [[("update_option", j, (h + j) % 6) for j in range(len(home))] for h, home in enumerate(fleet)]
+    return fleet, batches
+
+
+@benchmark("ingest_update_option")
+def bench_ingest_update_option(size, directory):
+    """Apply an option update to every device of a fleet, one call per update."""
+    fleet, batches = _make_ingest(size)
+    def run():
+        for home, batch in zip(fleet, batches):
+            for _, index, value in batch:
+                home.update_option(index, value)
+    return run
+
+
+@benchmark("ingest_update_options")
+def bench_ingest_update_options(size, directory):
+    """Apply an option update to every device of a fleet, one validated batch per home."""
+    fleet, batches = _make_ingest(size)
+    columns = [([index for _, index, _ in batch], [value for _, _, value in batch]) for batch in batches]
+    def run():
+        for home, (indices, values) in zip(fleet, columns):
+            home.update_options(indices, values)
+    return run
+
+
+@benchmark("ingest_update_options_trusted")
+def bench_ingest_update_options_trusted(size, directory):
+    """Apply trusted option updates to every device of a fleet, one batch per home."""
+    fleet, batches = _make_ingest(size)
+    columns = [([index for _, index, _ in batch], [value for _, _, value in batch]) for batch in batches]
+    def run():
+        for home, (indices, values) in zip(fleet, columns):
+            home.update_options(indices, values, trusted=True)
+    return run
+
+
+@benchmark("ingest_pipeline")
+def bench_ingest_pipeline(size, directory):
+    """Fold a feed of option and switch reports, one per device, into a fleet."""
+    fleet = _make_fleet(size)
+    lines = []
+    for h, home in enumerate(fleet):
+        for j in range(len(home)):
+            if j % 2:
+                lines.append(encode_report(h, j, "switched_on", True))
+            else:
+                device = home.get_device(j)
+                lines.append(encode_report(h, j, device_type_of(device).option, (h + j) % 6))
+    feed = b"".join(lines)
+    async def ingest():
+        pipeline = IngestPipeline(fleet)
+        await pipeline.start()
+        chunks = [feed[i:i + CHUNK_SIZE] for i in range(0, len(feed), CHUNK_SIZE)]
+        chunks.reverse()
+        async def read():
+            return chunks.pop() if chunks else b""
+        await pipeline.ingest(read)
+        await pipeline.flush()
+        await pipeline.close()
+    def run():
+        asyncio.run(ingest())
+    return run
+
+
+def _codec_benchmarks(name):
+    """Register the encode and decode benchmarks of a store codec."""
+    codec = CODECS[name]
+    
+    @benchmark(f"codec_{name}_encode")
+    def bench_encode(size, directory):
+        """Write a fleet of 10-device homes with the codec."""
+        fleet = _make_fleet(size)
+        path = os.path.join(directory, "fleet" + codec.extension)
+        def run():
+            codec.dump(fleet, path)
+        return run
+    
+    @benchmark(f"codec_{name}_decode")
+    def bench_decode(size, directory):
+        """Read a fleet of 10-device homes with the codec."""
+        path = os.path.join(directory, "fleet" + codec.extension)
+        codec.dump(_make_fleet(size), path)
+        def run():
+            codec.load(path)
+        return run
+
+
+for _name in CODECS:
+    _codec_benchmarks(_name)
+
+
+def run_benchmarks(sizes=None, names=None, repeat=3):
+    """
+    Run the registered benchmarks.
+    
+    Each benchmark is timed repeat times per size and the fastest run is
+    kept, as it is the least disturbed by other activity on the machine.
+    
+    Args:
+        sizes (list, optional): Problem sizes (devices) to run. Defaults to
+            DEFAULT_SIZES.
+        names (list, optional): Benchmarks to run. Defaults to all of them.
+        repeat (int, optional): Timed runs per benchmark and size. Defaults to 3.
+    
+    Returns:
+        dict: Machine-readable results with environment information and a
+        "results" mapping of "name[size]" to seconds and nanoseconds per item.
+    
+    Raises:
+        KeyError: If an unknown benchmark name is requested.
+    """
+    sizes = DEFAULT_SIZES if sizes is None else sizes
+    names = list(BENCHMARKS) if names is None else names
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            factory = BENCHMARKS[name]
+            for size in sizes:
+                run = factory(size, directory)
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results[f"{name}[{size}]"] = {
+                    "seconds": best,
+                    "ns_per_item": best / size * 1e9,
+                }
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.time(),
+        "results": results,
+    }
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare benchmark results against a baseline.
+    
+    Args:
+        current (dict): Results from run_benchmarks().
+        baseline (dict): Previously saved results.
+        threshold (float, optional): Allowed slowdown as a fraction, e.g.
+            0.2 for 20%. Defaults to DEFAULT_THRESHOLD.
+    
+    Returns:
+        list: (key, baseline seconds, current seconds, ratio, regressed)
+        tuples for every benchmark present in both, slowest ratio first.
+    """
+    rows = []
+    for key, result in current["results"].items():
+        if key in baseline["results"]:
+            before = baseline["results"][key]["seconds"]
+            after = result["seconds"]
+            ratio = after / before if before else float("inf")
+            rows.append((key, before, after, ratio, ratio > 1 + threshold))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def main(argv=None):
+    """
+    Run the benchmarks from the command line.
+    
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv.
+    
+    Returns:
+        int: 1 if any benchmark regressed beyond the threshold, else 0.
+    """
+    parser = argparse.ArgumentParser(description="Smart home performance benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="problem sizes in devices (e.g. 10 1000 1000000)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument("--save", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before failing, as a fraction")
+    args = parser.parse_args(argv)
+    
+    current = run_benchmarks(args.sizes, args.only, args.repeat)
+    for key, result in current["results"].items():
+        print(f"{key:40} {result['seconds']:10.6f} s {result['ns_per_item']:12.1f} ns/item")
+    
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(current, file, indent=2)
+        print(f"Results saved to {args.save}")
+    
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        print(f"\nComparison with {args.baseline}:")
+        for key, before, after, ratio, regressed in compare_results(current, baseline, args.threshold):
+            regressions += 1 if regressed else 0
+            flag = "REGRESSION" if regressed else ""
+            print(f"{key:40} {before:10.6f} s -> {after:10.6f} s  x{ratio:5.2f} {flag}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import threading
+from collections import deque, namedtuple
+from itertools import islice
+
+# A compact delta: sequence number, home id, device index, field, new value
+Change = namedtuple("Change", ["seq", "home", "device", "field", "value"])
+
+
+class ChangeStream:
+    """
+    A sequenced log of device changes across a set of smart homes.
+    
+    Every change made through a watched SmartHome is recorded as a compact
+    Change with a monotonically increasing sequence number. Clients keep the
+    last sequence number they have seen as a cursor and resume from it; if
+    the cursor has fallen out of the retained window they are told to reset
+    and re-read the full state.
+    
+    Attributes:
+        capacity (int): Maximum number of changes retained for resuming.
+        last_seq (int): Sequence number of the most recent change (0 if none).
+    """
+    
+    def __init__(self, capacity=10000):
+        """
+        Initialize an empty ChangeStream.
+        
+        Args:
+            capacity (int, optional): Maximum number of changes retained.
+                Defaults to 10000.
+        """
+        self.capacity = capacity
+        self.last_seq = 0
+        self.__changes = deque(maxlen=capacity)
+        self.__condition = threading.Condition()
+        self.__listeners = {}
+        self.__subscribers = []
+    
+    def watch(self, home_id, home):
+        """
+        Start recording the changes of a smart home.
+        
+        Args:
+            home_id: The id reported for the home in each change.
+            home (SmartHome): The smart home to watch.
+        
+        Raises:
+            ValueError: If the home id is already being watched.
+        """
+        if home_id in self.__listeners:
+            raise ValueError(f"Smart home {home_id} is already being watched")
+        listener = lambda events: self._record(home_id, events)
+        self.__listeners[home_id] = (home, listener)
+        home.add_listener(listener)
+    
+    def unwatch(self, home_id):
+        """
+        Stop recording the changes of a smart home.
+        
+        Args:
+            home_id: The id the home was watched under.
+        
+        Raises:
+            KeyError: If the home id is not being watched.
+        """
+        home, listener = self.__listeners.pop(home_id)
+        home.remove_listener(listener)
+    
+    def subscribe(self, callback):
+        """
+        Register a callback invoked with the new last_seq after each batch.
+        
+        Args:
+            callback: A callable taking the latest sequence number.
+        """
+        self.__subscribers.append(callback)
+    
+    def unsubscribe(self, callback):
+        """
+        Unregister a callback registered with subscribe().
+        
+        Args:
+            callback: The callable to remove.
+        """
+        self.__subscribers.remove(callback)
+    
+    def _record(self, home_id, events):
+        """
+        Append the changes from a batch of device events.
+        
+        Args:
+            home_id: The id of the home the events came from.
+            events (list): The DeviceEvent objects to record.
+        """
+        with self.__condition:
+            for event in events:
+                self.last_seq += 1
+                self.__changes.append(
+                    Change(self.last_seq, home_id, event.index, event.field, event.value)
+                )
+            last_seq = self.last_seq
+            self.__condition.notify_all()
+        for callback in list(self.__subscribers):
+            callback(last_seq)
+    
+    def changes_since(self, cursor, limit=None):
+        """
+        Get the changes after a cursor without blocking.
+        
+        Args:
+            cursor (int): The last sequence number the client has seen.
+            limit (int, optional): Maximum number of changes to return.
+        
+        Returns:
+            tuple: The list of changes, the cursor to resume from, and a
+            flag that is True if changes after the cursor were discarded and
+            the client must re-read the full state.
+        
+        Raises:
+            ValueError: If the limit is negative.
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"Limit must not be negative, got {limit}")
+        with self.__condition:
+            if cursor > self.last_seq:
+                # The cursor comes from a stream this one does not continue
+                return [], self.last_seq, True
+            if cursor == self.last_seq:
+                return [], cursor, False
+            oldest = self.last_seq - len(self.__changes) + 1
+            reset = cursor < oldest - 1
+            start = max(cursor + 1, oldest) - oldest
+            stop = len(self.__changes) if limit is None else min(len(self.__changes), start + limit)
+            changes = list(islice(self.__changes, start, stop))
+            last_seq = self.last_seq
+        if changes:
+            next_cursor = changes[-1].seq
+        else:
+            # A reset with nothing retained resumes after the current state
+            next_cursor = last_seq if reset else cursor
+        return changes, next_cursor, reset
+    
+    def wait(self, cursor, timeout=None, limit=None):
+        """
+        Long-poll for changes after a cursor.
+        
+        Args:
+            cursor (int): The last sequence number the client has seen.
+            timeout (float, optional): Maximum seconds to wait. Defaults to
+                waiting indefinitely.
+            limit (int, optional): Maximum number of changes to return.
+        
+        Returns:
+            tuple: The same as changes_since(); the list of changes is empty
+            if the timeout expired.
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.last_seq != cursor, timeout)
+        return self.changes_since(cursor, limit)
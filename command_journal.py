@@ -0,0 +1,234 @@
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from device_types import device_type_of
+
+
+class CommandJournal:
+    """
+    An undo/redo journal for the commands applied to a smart home.
+    
+    Commands are applied through the journal, which records what each one
+    changed as a compact diff rather than a copy of the home: the indices
+    of the toggled devices, the old and new value of an updated option, or
+    the added or removed device. Undoing or redoing a step only touches
+    the devices the step changed, so undoing a "Turn All Off" costs time
+    proportional to the devices it switched, not to the size of the home.
+    
+    Every command is one step; commands run inside group() form a single
+    step. Only the last `limit` steps are kept.
+    """
+    
+    def __init__(self, smart_home, limit=100):
+        """
+        Initialize a CommandJournal.
+        
+        Args:
+            smart_home (SmartHome): The home the commands are applied to.
+            limit (int, optional): Maximum number of undoable steps. Defaults to 100.
+        
+        Raises:
+            ValueError: If limit is not a positive integer.
+        """
+        if not isinstance(limit, int) or limit < 1:
+            raise ValueError("Journal limit must be a positive integer")
+        self.smart_home = smart_home
+        self.__undo = deque(maxlen=limit)
+        self.__redo = []
+        self.__group = None
+    
+    @property
+    def can_undo(self):
+        """Whether there is a step to undo."""
+        return bool(self.__undo)
+    
+    @property
+    def can_redo(self):
+        """Whether there is an undone step to redo."""
+        return bool(self.__redo)
+    
+    def _record(self, entries):
+        """Store the entries of a command as a step, or in the open group."""
+        if not entries:
+            return
+        if self.__group is not None:
+            self.__group.extend(entries)
+        else:
+            self.__undo.append(entries)
+            self.__redo.clear()
+    
+    def _capture(self, function, *args):
+        """
+        Run a SmartHome method and record the toggles and device changes it made.
+        
+        Args:
+            function: The unbound SmartHome method to run.
+            *args: Its arguments after the home.
+        """
+        events = []
+        self.smart_home.add_listener(events.extend)
+        try:
+            function(self.smart_home, *args)
+        finally:
+            self.smart_home.remove_listener(events.extend)
+        
+        entries = []
+        toggled = array("l", [event.index for event in events if event.field == "switched_on"])
+        if toggled:
+            entries.append(("toggle", toggled))
+        for event in events:
+            if event.field == "added":
+                entries.append(("add", event.index, event.device))
+            elif event.field == "removed":
+                entries.append(("remove", event.index, event.device))
+        self._record(entries)
+    
+    @contextmanager
+    def group(self):
+        """
+        Group the commands run inside the with block into a single step.
+        
+        Nested groups join the outermost one.
+        """
+        if self.__group is not None:
+            yield
+            return
+        self.__group = []
+        try:
+            yield
+        finally:
+            entries, self.__group = self.__group, None
+            self._record(entries)
+    
+    def toggle_device(self, index):
+        """
+        Toggle a device.
+        
+        Args:
+            index (int): The index of the device.
+        
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        self._capture(type(self.smart_home).toggle_device, index)
+    
+    def switch_all_on(self):
+        """Turn on all devices, as one step."""
+        self._capture(type(self.smart_home).switch_all_on)
+    
+    def switch_all_off(self):
+        """Turn off all devices, as one step."""
+        self._capture(type(self.smart_home).switch_all_off)
+    
+    def add_device(self, device):
+        """
+        Add a device.
+        
+        Args:
+            device: The smart device to add.
+        
+        Raises:
+            ValueError: If the maximum number of devices has been reached.
+        """
+        self._capture(type(self.smart_home).add_device, device)
+    
+    def remove_device(self, index):
+        """
+        Remove a device.
+        
+        Args:
+            index (int): The index of the device.
+        
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        self._capture(type(self.smart_home).remove_device, index)
+    
+    def update_option(self, index, value):
+        """
+        Update the option of a device.
+        
+        Args:
+            index (int): The index of the device.
+            value (int): The new option value.
+        
+        Raises:
+            IndexError: If the index is out of range.
+            ValueError: If the value is invalid for the device.
+        """
+        device = self.smart_home.get_device(index)
+        device_type = device_type_of(device)
+        old = device_type.get_option(device) if device_type is not None else None
+        self.smart_home.update_option(index, value)
+        self._record([("option", index, old, value)])
+    
+    def _apply(self, entries, undo):
+        """
+        Apply the entries of a step, inverted when undoing.
+        
+        The step is applied as a single SmartHome.apply() batch of only the
+        entries it changed, so it is either applied whole or not at all,
+        listeners see it as one change, and steps that add or remove no
+        devices cost time proportional to the entries, not to the home.
+        
+        Args:
+            entries (list): The entries of the step.
+            undo (bool): True to revert the step, False to reapply it.
+        """
+        batch = []
+        for entry in (reversed(entries) if undo else entries):
+            kind = entry[0]
+            if kind == "toggle":
+                batch += [("toggle", index) for index in entry[1]]
+            elif kind == "option":
+                batch.append(("update_option", entry[1], entry[2] if undo else entry[3]))
+            elif (kind == "add") == undo:
+                batch.append(("remove", entry[1]))
+            else:
+                batch.append(("insert", entry[1], entry[2]))
+        self.smart_home.apply(batch)
+    
+    def undo(self):
+        """
+        Revert the last step.
+        
+        Returns:
+            bool: True if a step was undone, False if there was none.
+        
+        Raises:
+            IndexError: If the home no longer matches the step, e.g. after
+                devices were removed outside the journal; the step stays
+                undoable and the home is left unchanged.
+        """
+        if not self.__undo:
+            return False
+        entries = self.__undo.pop()
+        try:
+            self._apply(entries, undo=True)
+        except (IndexError, ValueError, AttributeError):
+            self.__undo.append(entries)
+            raise
+        self.__redo.append(entries)
+        return True
+    
+    def redo(self):
+        """
+        Reapply the last undone step.
+        
+        Returns:
+            bool: True if a step was redone, False if there was none.
+        
+        Raises:
+            IndexError: If the home no longer matches the step; the step
+                stays redoable and the home is left unchanged.
+        """
+        if not self.__redo:
+            return False
+        entries = self.__redo.pop()
+        try:
+            self._apply(entries, undo=False)
+        except (IndexError, ValueError, AttributeError):
+            self.__redo.append(entries)
+            raise
+        self.__undo.append(entries)
+        return True
@@ -0,0 +1,525 @@
+from operator import attrgetter, le
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from validation import OPTION_BOUNDS
+
+
+class DeviceType:
+    """
+    The declaration of a kind of smart device.
+    
+    Everything other modules need to know about a device type lives here,
+    so stores, the API, the GUI and SmartHome dispatch through a table
+    lookup instead of probing devices with isinstance() or hasattr().
+    
+    Attributes:
+        name (str): The type name used in stores and APIs, e.g. "SmartPlug".
+        cls: The device class.
+        option (str): The name of the device's option attribute.
+        label (str): The option label shown in the GUI.
+        minimum (int): The smallest valid option value.
+        maximum (int): The largest valid option value.
+        default (int): The option value of a new device.
+        code (int): A compact numeric code for binary formats.
+        power_model: A callable turning an option value into watts drawn
+            while the device is switched on.
+        trusted_factory: A callable creating a device from an already
+            validated option value and switch state.
+        trusted_attribute (str): The attribute a trusted option value is
+            written to; the option itself, with its checks, unless the
+            device class names the attribute storing it.
+    """
+    
+    def __init__(self, cls, option, label, minimum, maximum, default, code, power_model):
+        """
+        Initialize a DeviceType.
+        
+        Args:
+            cls: The device class; its name becomes the type name.
+            option (str): The name of the device's option attribute.
+            label (str): The option label shown in the GUI.
+            minimum (int): The smallest valid option value.
+            maximum (int): The largest valid option value.
+            default (int): The option value of a new device.
+            code (int): A compact numeric code for binary formats.
+            power_model: A callable turning an option value into watts.
+        """
+        self.name = cls.__name__
+        self.cls = cls
+        self.option = option
+        self.label = label
+        self.minimum = minimum
+        self.maximum = maximum
+        self.default = default
+        self.code = code
+        self.power_model = power_model
+        self.trusted_factory = getattr(cls, "_trusted", self.create)
+        self.trusted_attribute = getattr(cls, "_trusted_attribute", option)
+    
+    def create(self, value=None, switched_on=False):
+        """
+        Create a device of this type.
+        
+        Args:
+            value (int, optional): The option value. Defaults to the type's default.
+            switched_on (bool, optional): Whether the device starts switched on.
+        
+        Returns:
+            The new device.
+        
+        Raises:
+            ValueError: If the option value is out of range.
+        """
+        device = self.cls(self.default if value is None else value)
+        if switched_on:
+            device.toggle_switch()
+        return device
+    
+    def create_trusted(self, value, switched_on=False):
+        """
+        Create a device of this type from an already validated value.
+        
+        Device classes providing a _trusted() constructor skip their checks;
+        other classes fall back to the validating constructor.
+        
+        Args:
+            value (int): The option value, known to be within bounds.
+            switched_on (bool, optional): Whether the device starts switched on.
+        
+        Returns:
+            The new device.
+        """
+        return self.trusted_factory(value, switched_on)
+    
+    def get_option(self, device):
+        """
+        Get the option value of a device of this type.
+        
+        Args:
+            device: The smart device.
+        
+        Returns:
+            int: The value of the option attribute.
+        """
+        return getattr(device, self.option)
+    
+    def set_option(self, device, value, trusted=False):
+        """
+        Set the option value of a device of this type.
+        
+        Args:
+            device: The smart device.
+            value (int): The new option value.
+            trusted (bool, optional): Whether the value is already known to
+                be valid, e.g. from a validated store snapshot, so the
+                device's checks can be skipped. Subclasses of the type's
+                class always go through the option property, as they may
+                override it. Defaults to False.
+        
+        Raises:
+            ValueError: If the value is out of range.
+        """
+        if trusted and type(device) is self.cls:
+            setattr(device, self.trusted_attribute, value)
+        else:
+            setattr(device, self.option, value)
+    
+    def power(self, device):
+        """
+        Get the power a device of this type currently draws.
+        
+        Args:
+            device: The smart device.
+        
+        Returns:
+            float: The power in watts, 0 while the device is switched off.
+        """
+        if not device.switched_on:
+            return 0
+        return self.power_model(getattr(device, self.option))
+
+
+# Registered device types by name, in the order they are offered to users
+DEVICE_TYPES = {}
+_by_class = {}
+_by_code = {}
+
+# The attribute trusted updates write, by exact device class
+_trusted_attributes = {}
+
+# The option values from 0 to 255 that every registered type accepts, as bytes
+_shared_values = [b""]
+
+_minimum = attrgetter("minimum")
+_maximum = attrgetter("maximum")
+_option = attrgetter("option")
+
+
+def register_device_type(device_type):
+    """
+    Register a device type so every module can handle its devices.
+    
+    Args:
+        device_type (DeviceType): The device type to register.
+    
+    Raises:
+        ValueError: If the name or code is already registered.
+    """
+    if device_type.name in DEVICE_TYPES:
+        raise ValueError(f"Device type {device_type.name} is already registered")
+    if device_type.code in _by_code:
+        raise ValueError(f"Device type code {device_type.code} is already registered")
+    DEVICE_TYPES[device_type.name] = device_type
+    _by_class[device_type.cls] = device_type
+    _by_code[device_type.code] = device_type
+    _trusted_attributes[device_type.cls] = device_type.trusted_attribute
+    _update_shared_values()
+
+
+def unregister_device_type(name):
+    """
+    Remove a registered device type.
+    
+    Args:
+        name (str): The type name.
+    
+    Raises:
+        KeyError: If no device type has this name.
+    """
+    device_type = DEVICE_TYPES.pop(name)
+    del _by_code[device_type.code]
+    _trusted_attributes.pop(device_type.cls, None)
+    for cls in [cls for cls, registered in _by_class.items() if registered is device_type]:
+        del _by_class[cls]
+    _update_shared_values()
+
+
+def _update_shared_values():
+    """Recompute the option values from 0 to 255 every registered type accepts."""
+    low = max(map(_minimum, DEVICE_TYPES.values()), default=0)
+    high = min(map(_maximum, DEVICE_TYPES.values()), default=-1)
+    _shared_values[0] = bytes(range(max(low, 0), min(high, 255) + 1))
+
+
+def get_device_type(name):
+    """
+    Get a registered device type by name.
+    
+    Args:
+        name (str): The type name, e.g. "SmartOven".
+    
+    Returns:
+        DeviceType: The device type.
+    
+    Raises:
+        ValueError: If no device type has this name.
+    """
+    try:
+        return DEVICE_TYPES[name]
+    except KeyError:
+        raise ValueError(f"Unknown device type: {name}") from None
+
+
+def device_type_for_code(code):
+    """
+    Get a registered device type by its numeric code.
+    
+    Args:
+        code (int): The type code.
+    
+    Returns:
+        DeviceType: The device type.
+    
+    Raises:
+        ValueError: If no device type has this code.
+    """
+    try:
+        return _by_code[code]
+    except KeyError:
+        raise ValueError(f"Unknown device type code: {code}") from None
+
+
+def device_type_of(device):
+    """
+    Get the registered type of a device.
+    
+    Subclasses of a registered class resolve to the closest registered
+    ancestor; the result is cached so later lookups are a single dict access.
+    
+    Args:
+        device: The smart device.
+    
+    Returns:
+        DeviceType: The device type, or None if it is not registered.
+    """
+    cls = type(device)
+    device_type = _by_class.get(cls)
+    if device_type is None:
+        for base in cls.__mro__[1:]:
+            if base in _by_class:
+                device_type = _by_class[cls] = _by_class[base]
+                break
+    return device_type
+
+
+register_device_type(DeviceType(
+    SmartPlug, "consumption_rate", "Consumption Rate", *OPTION_BOUNDS["consumption_rate"][:2], 45, 1,
+    lambda rate: rate
+))
+register_device_type(DeviceType(
+    SmartOven, "temperature", "Temperature", *OPTION_BOUNDS["temperature"][:2], 150, 2,
+    lambda temperature: temperature * 10
+))
+register_device_type(DeviceType(
+    SmartHeater, "setting", "Setting", *OPTION_BOUNDS["setting"][:2], 2, 3,
+    lambda setting: setting * 400
+))
+
+
+def validate_columns(codes, values, switched_on):
+    """
+    Validate columns of device data in a single pass.
+    
+    Valid columns, the common case, are recognised by C-level bytes(),
+    sum() and set operations checking every option value against the
+    bounds of the types present and every switch state against True/False
+    (or 1/0); only columns holding an invalid row are scanned row by row
+    to report the errors.
+    
+    Args:
+        codes (list): The device type code of each row.
+        values (list): The option value of each row.
+        switched_on (list): The switch state of each row.
+    
+    Returns:
+        list: (row index, message) tuples for every invalid row, in row order.
+    
+    Raises:
+        ValueError: If the columns have different lengths.
+    """
+    if not len(codes) == len(values) == len(switched_on):
+        raise ValueError("Device columns must have the same length")
+    errors = validate_options(codes, values)
+    try:
+        # bytes() takes only integers from 0 to 255, of which only 0 and 1
+        # may remain after deleting them
+        if type(sum(switched_on)) is int and not bytes(switched_on).translate(None, b"\0\1"):
+            return errors
+    except (TypeError, ValueError):
+        pass
+    errors.extend(
+        (row, f"Switch state must be a bool, got {on!r}")
+        for row, on in enumerate(switched_on)
+        if type(on) not in (bool, int) or on not in (0, 1)
+    )
+    errors.sort(key=lambda error: error[0])
+    return errors
+
+
+def _in_bounds(device_types, values):
+    """
+    Check whether every value is an integer within its device type's range.
+    
+    The type and range checks run as C-level map() loops over the columns.
+    
+    Args:
+        device_types (list): The device type of each row.
+        values (list): The option value of each row.
+    
+    Returns:
+        bool: True if every value is valid for its row's type.
+    """
+    return (set(map(type, values)) <= {int, bool}
+            and all(map(le, map(_minimum, device_types), values))
+            and all(map(le, values, map(_maximum, device_types))))
+
+
+def _within_shared_bounds(present, values):
+    """
+    Check whether every value is an integer within the bounds shared by
+    the given device types.
+    
+    Values within the bounds shared by every registered type are
+    recognised at C speed: bytes() accepts only integers from 0 to 255,
+    and deleting the shared values from the result leaves nothing. Other
+    values are compared by a few reductions with the narrowest bounds of
+    the types present, e.g. those of a single type.
+    
+    Args:
+        present (list): The device types of the rows.
+        values (list): The option value of each row.
+    
+    Returns:
+        bool: True if every value is valid for every type present; False
+        if some value may still be valid for its own row's type.
+    """
+    try:
+        # A sum stays an int only if every value is an int or a bool
+        if type(sum(values)) is not int:
+            return False
+        if not values:
+            return True
+        try:
+            if not bytes(values).translate(None, _shared_values[0]):
+                return True
+        except ValueError:
+            pass
+        low = min(values)
+        high = max(values)
+    except TypeError:
+        return False
+    return (all(device_type.minimum <= low for device_type in present)
+            and all(high <= device_type.maximum for device_type in present))
+
+
+def _registered_in_bounds(types, values):
+    """
+    Check option values for devices of exactly the registered classes.
+    
+    Batches within the bounds shared by the classes present are recognised
+    by _within_shared_bounds(); the others are checked row by row by
+    _in_bounds().
+    
+    Args:
+        types (list): The exact, registered class of each device.
+        values (list): The option value of each row.
+    
+    Returns:
+        bool: True if every value is valid for its row's type.
+    """
+    if _within_shared_bounds([_by_class[cls] for cls in set(types)], values):
+        return True
+    return _in_bounds(list(map(_by_class.__getitem__, types)), values)
+
+
+def validate_options(codes, values):
+    """
+    Validate a batch of option values of devices of any registered types.
+    
+    Args:
+        codes (list): The device type code of each row.
+        values (list): The option value of each row.
+    
+    Returns:
+        list: (row index, message) tuples for every invalid row.
+    """
+    present = set(codes)
+    if present <= _by_code.keys():
+        if _within_shared_bounds([_by_code[code] for code in present], values):
+            return []
+        if _in_bounds(list(map(_by_code.__getitem__, codes)), values):
+            return []
+    
+    bounds = {code: (device_type.minimum, device_type.maximum) for code, device_type in _by_code.items()}
+    invalid = [
+        row for row, code, value in zip(range(len(codes)), codes, values)
+        if (limits := bounds.get(code)) is None
+        or not isinstance(value, int) or not limits[0] <= value <= limits[1]
+    ]
+    errors = []
+    for row in invalid:
+        code, value = codes[row], values[row]
+        if code not in bounds:
+            errors.append((row, f"Unknown device type: {code}"))
+        else:
+            device_type = _by_code[code]
+            errors.append((row, f"{device_type.option} must be an integer between "
+                                f"{device_type.minimum} and {device_type.maximum}, got {value!r}"))
+    return errors
+
+
+def from_columns(codes, values, switched_on):
+    """
+    Create devices in bulk from columns of type codes, option values and
+    switch states.
+    
+    The columns are validated up front with validate_columns(), and the
+    valid rows are built with the trusted constructors, so each device is
+    checked once instead of by its own constructor.
+    
+    Args:
+        codes (list): The device type code of each row.
+        values (list): The option value of each row.
+        switched_on (list): The switch state of each row.
+    
+    Returns:
+        tuple: A list of the devices built from the valid rows, in order,
+        and a list of (row index, message) tuples for the invalid rows.
+    
+    Raises:
+        ValueError: If the columns have different lengths.
+    """
+    errors = validate_columns(codes, values, switched_on)
+    factories = {code: device_type.trusted_factory for code, device_type in _by_code.items()}
+    rows = zip(codes, values, map(bool, switched_on))
+    if errors:
+        invalid = {row for row, _ in errors}
+        rows = (columns for row, columns in enumerate(rows) if row not in invalid)
+    devices = [factories[code](value, on) for code, value, on in rows]
+    return devices, errors
+
+
+def from_records(records):
+    """
+    Create devices in bulk from (type name, option value, switched on) records.
+    
+    Args:
+        records (list): The device records, e.g. ("SmartOven", 180, True).
+    
+    Returns:
+        tuple: The devices built from the valid records and a list of
+        (row index, message) tuples for the invalid ones, as from_columns().
+    """
+    codes = [DEVICE_TYPES[name].code if name in DEVICE_TYPES else name for name, _, _ in records]
+    return from_columns(codes, [value for _, value, _ in records], [on for _, _, on in records])
+
+
+def update_options(devices, values, trusted=False):
+    """
+    Set the option values of many devices in one validated pass.
+    
+    The whole batch is range-checked against the device types before any
+    device is changed, so either every value is set or, if one is invalid,
+    none is; only a batch failing the check is scanned row by row for the
+    error. Trusted batches, e.g. from a validated store snapshot, skip the
+    check. The checked values are then written straight to the attributes
+    storing them, rather than checked again by the option properties,
+    except on subclasses of the registered classes, which may override
+    the properties.
+    
+    Args:
+        devices (list): The smart devices, of any registered types.
+        values (list): The new option value of each device.
+        trusted (bool, optional): Whether the values are already known to
+            be valid. Defaults to False.
+    
+    Raises:
+        ValueError: If the lists have different lengths or a value is out
+            of range for its device.
+        AttributeError: If a device is of an unregistered type.
+    """
+    if len(devices) != len(values):
+        raise ValueError("Devices and values must have the same length")
+    types = list(map(type, devices))
+    try:
+        attributes = list(map(_trusted_attributes.__getitem__, types))
+    except KeyError:
+        attributes = None
+    if attributes is not None and (trusted or _registered_in_bounds(types, values)):
+        list(map(setattr, devices, attributes, values))
+        return
+    
+    device_types = list(map(_by_class.get, types))
+    if None in device_types:
+        device_types = [device_type_of(device) for device in devices]
+        if None in device_types:
+            raise AttributeError("Device does not have a recognized option attribute")
+    if not trusted and not _in_bounds(device_types, values):
+        errors = validate_options([device_type.code for device_type in device_types], values)
+        if errors:
+            row, message = errors[0]
+            raise ValueError(f"Row {row}: {message}")
+    attributes = [
+        device_type.trusted_attribute if cls is device_type.cls else device_type.option
+        for cls, device_type in zip(types, device_types)
+    ]
+    list(map(setattr, devices, attributes, values))
@@ -0,0 +1,240 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class _Shard:
+    """
+    A partition of the fleet owned by one worker thread.
+    
+    Attributes:
+        queue (queue.Queue): Pending (future, function, args) commands.
+        lock (threading.Lock): Held by the worker while it runs a command.
+        thread (threading.Thread): The worker thread.
+    """
+    
+    def __init__(self, number):
+        """
+        Start the worker of a shard.
+        
+        Args:
+            number (int): The shard number, used in the thread name.
+        """
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._work, name=f"shard-{number}", daemon=True)
+        self.thread.start()
+    
+    def _work(self):
+        """Run commands from the queue until the stop sentinel arrives."""
+        while True:
+            command = self.queue.get()
+            if command is None:
+                break
+            future, function, args = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self.lock:
+                    result = function(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+
+class ShardedController:
+    """
+    A controller partitioning a fleet of smart homes into shards.
+    
+    Each home belongs to the shard given by its index modulo the number of
+    shards, and every command for a home runs on the worker thread of that
+    shard. Commands for one home are therefore applied one at a time and in
+    order, while commands for homes in different shards proceed
+    independently. Fleet-wide operations are split into one command per
+    shard and run on all shards at once.
+    
+    Home ids are indices into the smart_homes list, as in the API server.
+    
+    Attributes:
+        smart_homes (list): The smart homes of the fleet.
+        shard_count (int): The number of shards.
+    """
+    
+    def __init__(self, smart_homes, shard_count=4):
+        """
+        Initialize the controller and start one worker per shard.
+        
+        Args:
+            smart_homes (list): The smart homes to control.
+            shard_count (int, optional): The number of shards. Defaults to 4.
+        
+        Raises:
+            ValueError: If shard_count is not a positive integer.
+        """
+        if not isinstance(shard_count, int) or shard_count < 1:
+            raise ValueError("Shard count must be a positive integer")
+        self.smart_homes = smart_homes
+        self.shard_count = shard_count
+        self.__shards = [_Shard(number) for number in range(shard_count)]
+        self.__closed = False
+    
+    def shard_of(self, home_id):
+        """
+        Get the shard a home belongs to.
+        
+        Args:
+            home_id (int): The index of the home.
+        
+        Returns:
+            int: The shard number.
+        """
+        return home_id % self.shard_count
+    
+    def lock(self, home_id):
+        """
+        Get the lock of the shard a home belongs to.
+        
+        Holding the lock keeps the shard's worker from running commands, so
+        code outside the controller can read a home consistently.
+        
+        Args:
+            home_id (int): The index of the home.
+        
+        Returns:
+            threading.Lock: The shard's lock.
+        """
+        return self.__shards[self.shard_of(home_id)].lock
+    
+    def _submit_to_shard(self, shard, function, *args):
+        """Queue a command on a shard and return its future."""
+        if self.__closed:
+            raise RuntimeError("Controller is closed")
+        future = Future()
+        self.__shards[shard].queue.put((future, function, args))
+        return future
+    
+    def submit(self, home_id, function, *args):
+        """
+        Queue a command for a home on its shard.
+        
+        Args:
+            home_id (int): The index of the home.
+            function: A callable taking the SmartHome and the extra arguments.
+            *args: Extra arguments for the function.
+        
+        Returns:
+            concurrent.futures.Future: The future of the function's result.
+        
+        Raises:
+            IndexError: If the home id is out of range.
+            RuntimeError: If the controller is closed.
+        """
+        if home_id < 0 or home_id >= len(self.smart_homes):
+            raise IndexError("Smart home index out of range")
+        home = self.smart_homes[home_id]
+        return self._submit_to_shard(self.shard_of(home_id), function, home, *args)
+    
+    def call(self, home_id, function, *args):
+        """
+        Run a command for a home on its shard and wait for the result.
+        
+        Must not be called from a command already running on the same
+        shard, as the shard's worker would then wait for itself.
+        
+        Args:
+            home_id (int): The index of the home.
+            function: A callable taking the SmartHome and the extra arguments.
+            *args: Extra arguments for the function.
+        
+        Returns:
+            The function's result.
+        
+        Raises:
+            IndexError: If the home id is out of range.
+            Exception: Any exception raised by the function.
+        """
+        return self.submit(home_id, function, *args).result()
+    
+    def toggle_device(self, home_id, index):
+        """
+        Toggle a device of a home.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device.
+        
+        Raises:
+            IndexError: If the home or device index is out of range.
+        """
+        self.call(home_id, lambda home: home.toggle_device(index))
+    
+    def update_option(self, home_id, index, value):
+        """
+        Update the option of a device of a home.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device.
+            value (int): The new option value.
+        
+        Raises:
+            IndexError: If the home or device index is out of range.
+            ValueError: If the value is invalid for the device.
+        """
+        self.call(home_id, lambda home: home.update_option(index, value))
+    
+    def map(self, function):
+        """
+        Run a function on every home, all shards at once.
+        
+        Each shard runs the function over its own homes in a single command.
+        
+        Args:
+            function: A callable taking a SmartHome.
+        
+        Returns:
+            list: The results, in home order.
+        """
+        homes = list(self.smart_homes)
+        
+        def run_shard(shard):
+            return [function(homes[i]) for i in range(shard, len(homes), self.shard_count)]
+        
+        futures = [self._submit_to_shard(shard, run_shard, shard) for shard in range(self.shard_count)]
+        results = [None] * len(homes)
+        for shard, future in enumerate(futures):
+            results[shard::self.shard_count] = future.result()
+        return results
+    
+    def switch_all(self, on):
+        """
+        Switch every device of the fleet on or off, all shards at once.
+        
+        Args:
+            on (bool): True to switch the devices on, False to switch them off.
+        
+        Returns:
+            int: The number of homes switched.
+        """
+        if on:
+            return len(self.map(lambda home: home.switch_all_on()))
+        return len(self.map(lambda home: home.switch_all_off()))
+    
+    def close(self):
+        """Stop the workers after the queued commands have run."""
+        if self.__closed:
+            return
+        self.__closed = True
+        for shard in self.__shards:
+            shard.queue.put(None)
+        for shard in self.__shards:
+            shard.thread.join()
+    
+    def __enter__(self):
+        """Return the controller for use in a with statement."""
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the controller at the end of a with statement."""
+        self.close()
@@ -0,0 +1,426 @@
+import tkinter as tk
+from tkinter import ttk
+from device_types import device_type_of
+
+# Sortable columns of the home rows
+COLUMNS = ("home", "devices", "on", "power")
+
+
+def _summarize(home):
+    """
+    Summarize a smart home.
+    
+    Args:
+        home (SmartHome): The smart home.
+    
+    Returns:
+        tuple: The number of devices, the number switched on and the power
+        drawn in watts.
+    """
+    on = 0
+    power = 0
+    for i in range(len(home)):
+        device = home.get_device(i)
+        if device.switched_on:
+            on += 1
+            device_type = device_type_of(device)
+            if device_type is not None:
+                power += device_type.power(device)
+    return len(home), on, power
+
+
+class FleetDataSource:
+    """
+    A paged, sorted and filtered list of the summaries of a fleet's homes.
+    
+    Summaries are kept per home and refreshed by listeners when a home
+    changes, so views only ever read the rows of the page they show. The
+    filtered and sorted order is recomputed lazily on the next read after
+    a change that can affect it. A search narrowing the previous one, such
+    as typing another character, only rescans the homes that matched before.
+    
+    A search matches the homes whose label ("home 12") and device type
+    names contain every word of it, ignoring case.
+    
+    Attributes:
+        smart_homes (list): The smart homes.
+        page_size (int): Number of home rows per page.
+        version (int): Incremented on every change, so views can tell when
+            to redraw.
+    """
+    
+    def __init__(self, smart_homes, page_size=200):
+        """
+        Initialize the data source and start listening to the homes.
+        
+        Args:
+            smart_homes (list): The smart homes.
+            page_size (int, optional): Number of home rows per page. Defaults to 200.
+        
+        Raises:
+            ValueError: If page_size is not a positive integer.
+        """
+        if not isinstance(page_size, int) or page_size < 1:
+            raise ValueError("Page size must be a positive integer")
+        self.smart_homes = smart_homes
+        self.page_size = page_size
+        self.version = 0
+        self.__columns = {"devices": [], "on": [], "power": []}
+        self.__keys = []
+        self.__listeners = []
+        self.__query = ""
+        self.__sort = ("home", False)
+        self.__matches = None
+        self.__rows = None
+        self.sync()
+    
+    def sync(self):
+        """Start listening to homes appended to the list since the last call."""
+        for i in range(len(self.__listeners), len(self.smart_homes)):
+            listener = lambda events, i=i: self._on_events(i, events)
+            self.smart_homes[i].add_listener(listener)
+            self.__listeners.append(listener)
+            self.__keys.append(None)
+            for column, value in zip(self.__columns.values(), _summarize(self.smart_homes[i])):
+                column.append(value)
+            self.__matches = self.__rows = None
+            self.version += 1
+    
+    def close(self):
+        """Stop listening to the homes."""
+        for home, listener in zip(self.smart_homes, self.__listeners):
+            home.remove_listener(listener)
+        self.__listeners = []
+    
+    def _on_events(self, index, events):
+        """
+        Refresh the summary of a changed home.
+        
+        Args:
+            index (int): The index of the home.
+            events (list): The DeviceEvent objects.
+        """
+        for column, value in zip(self.__columns.values(), _summarize(self.smart_homes[index])):
+            column[index] = value
+        if any(event.field in ("added", "removed") for event in events):
+            self.__keys[index] = None
+            self.__matches = None
+        if self.__sort[0] != "home":
+            self.__rows = None
+        self.version += 1
+    
+    def _key(self, index):
+        """Get the lowercase search text of a home."""
+        key = self.__keys[index]
+        if key is None:
+            home = self.smart_homes[index]
+            names = [type(home.get_device(j)).__name__ for j in range(len(home))]
+            key = self.__keys[index] = f"home {index + 1} " + " ".join(names).lower()
+        return key
+    
+    @property
+    def query(self):
+        """The current search text."""
+        return self.__query
+    
+    @property
+    def sort(self):
+        """The (column, descending) order of the rows."""
+        return self.__sort
+    
+    def set_query(self, query):
+        """
+        Filter the homes by a search text.
+        
+        Args:
+            query (str): The search text; empty to show every home.
+        """
+        query = query.strip().lower()
+        if query == self.__query:
+            return
+        if self.__matches is not None and query.startswith(self.__query):
+            candidates = self.__matches
+        else:
+            candidates = range(len(self.__keys))
+        self.__query = query
+        self.__matches = self._match(candidates)
+        self.__rows = None
+        self.version += 1
+    
+    def set_sort(self, column, descending=False):
+        """
+        Sort the homes by a column; ties keep home order.
+        
+        Args:
+            column (str): One of COLUMNS.
+            descending (bool, optional): Sort from largest to smallest.
+                Defaults to False.
+        
+        Raises:
+            ValueError: If the column is unknown.
+        """
+        if column not in COLUMNS:
+            raise ValueError(f"Unknown column: {column}")
+        self.__sort = (column, descending)
+        self.__rows = None
+        self.version += 1
+    
+    def _match(self, candidates):
+        """Get the candidate home indices matching the current search."""
+        words = self.__query.split()
+        if not words:
+            return list(candidates)
+        key = self._key
+        return [i for i in candidates if all(word in key(i) for word in words)]
+    
+    def _order(self):
+        """Get the indices of the matching homes in sorted order."""
+        if self.__matches is None:
+            self.__matches = self._match(range(len(self.__keys)))
+            self.__rows = None
+        if self.__rows is None:
+            column, descending = self.__sort
+            if column == "home":
+                self.__rows = self.__matches[::-1] if descending else self.__matches
+            else:
+                self.__rows = sorted(self.__matches, key=self.__columns[column].__getitem__, reverse=descending)
+        return self.__rows
+    
+    def __len__(self):
+        """Return the number of homes matching the search."""
+        return len(self._order())
+    
+    @property
+    def page_count(self):
+        """The number of pages, at least 1."""
+        return max(1, -(-len(self) // self.page_size))
+    
+    def page(self, number):
+        """
+        Get the home rows of a page.
+        
+        Args:
+            number (int): The page number, from 0.
+        
+        Returns:
+            list: (home index, devices, on, power) tuples.
+        
+        Raises:
+            IndexError: If the page number is out of range.
+        """
+        if number < 0 or number >= self.page_count:
+            raise IndexError("Page number out of range")
+        devices, on, power = self.__columns.values()
+        start = number * self.page_size
+        return [(i, devices[i], on[i], power[i]) for i in self._order()[start:start + self.page_size]]
+    
+    def devices(self, index):
+        """
+        Get the device rows of a home.
+        
+        Args:
+            index (int): The index of the home.
+        
+        Returns:
+            list: (device index, type name, option label and value, switched
+            on, power) tuples.
+        
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        home = self.smart_homes[index]
+        rows = []
+        for j in range(len(home)):
+            device = home.get_device(j)
+            device_type = device_type_of(device)
+            if device_type is None:
+                rows.append((j, type(device).__name__, "", device.switched_on, 0))
+            else:
+                option = f"{device_type.label}: {device_type.get_option(device)}"
+                rows.append((j, device_type.name, option, device.switched_on, device_type.power(device)))
+        return rows
+
+
+class FleetDashboard:
+    """
+    A fleet overview built on a ttk.Treeview fed by a FleetDataSource.
+    
+    Only one page of homes is inserted into the tree at a time, and the
+    devices of a home are inserted when its row is expanded, so the window
+    stays responsive with very large fleets. Clicking a column heading
+    sorts by it; the search box filters as you type.
+    """
+    
+    def __init__(self, root, smart_homes, open_home=None, on_close=None, page_size=200, poll_interval=500):
+        """
+        Initialize the dashboard in a window.
+        
+        Args:
+            root: The Tkinter window to fill.
+            smart_homes (list): The smart homes.
+            open_home (optional): A callable taking a home index, called
+                when a home row is double-clicked.
+            on_close (optional): A callable run after the window closes.
+            page_size (int, optional): Home rows per page. Defaults to 200.
+            poll_interval (int, optional): Milliseconds between checks for
+                changed homes. Defaults to 500.
+        """
+        self.root = root
+        self.root.title("Fleet Dashboard")
+        self.root.geometry("700x500")
+        self.source = FleetDataSource(smart_homes, page_size)
+        self.open_home = open_home
+        self.on_close = on_close
+        self.poll_interval = poll_interval
+        self.page_number = 0
+        self.__shown_version = None
+        self.__expanded = set()
+        self.__search_job = None
+        self.__poll_job = None
+        
+        self._create_widgets()
+        self._show_page()
+        self._poll()
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+    
+    def _create_widgets(self):
+        """Create the GUI widgets."""
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Search box and pager
+        control_frame = ttk.Frame(main_frame)
+        control_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(control_frame, text="Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self._on_search)
+        ttk.Entry(control_frame, textvariable=self.search_var, width=30).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(control_frame, text="Next", width=8, command=lambda: self._turn_page(1)).pack(side=tk.RIGHT)
+        self.page_label = ttk.Label(control_frame, text="")
+        self.page_label.pack(side=tk.RIGHT, padx=5)
+        ttk.Button(control_frame, text="Previous", width=8, command=lambda: self._turn_page(-1)).pack(side=tk.RIGHT)
+        
+        # Home and device rows
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.tree = ttk.Treeview(tree_frame, columns=("devices", "on", "power"), show="tree headings")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        self.tree.column("#0", width=300)
+        for column in ("devices", "on", "power"):
+            self.tree.column(column, width=100, anchor=tk.E)
+        
+        self.tree.bind("<<TreeviewOpen>>", self._on_expand)
+        self.tree.bind("<<TreeviewClose>>", self._on_collapse)
+        self.tree.bind("<Double-1>", self._on_double_click)
+    
+    def _show_headings(self):
+        """Label the column headings, marking the sort column."""
+        column, descending = self.source.sort
+        for name, heading, title in zip(COLUMNS, ("#0", "devices", "on", "power"),
+                                        ("Home", "Devices", "On", "Power (W)")):
+            if name == column:
+                title += " ▼" if descending else " ▲"
+            self.tree.heading(heading, text=title, command=lambda name=name: self._sort_by(name))
+    
+    def _show_page(self):
+        """Replace the tree rows with the current page."""
+        self.page_number = min(self.page_number, self.source.page_count - 1)
+        self.__shown_version = self.source.version
+        self.tree.delete(*self.tree.get_children())
+        for index, devices, on, power in self.source.page(self.page_number):
+            item = self.tree.insert("", tk.END, iid=f"home-{index}", text=f"Smart Home {index + 1}",
+                                    values=(devices, on, power))
+            if index in self.__expanded:
+                self._insert_devices(index)
+                self.tree.item(item, open=True)
+            elif devices:
+                # Placeholder making the row expandable until it is opened
+                self.tree.insert(item, tk.END, iid=f"home-{index}-placeholder", text="")
+        self._show_headings()
+        self.page_label.configure(
+            text=f"Page {self.page_number + 1} of {self.source.page_count} ({len(self.source)} homes)"
+        )
+    
+    def _insert_devices(self, index):
+        """Insert the device rows of a home row."""
+        item = f"home-{index}"
+        self.tree.delete(*self.tree.get_children(item))
+        for j, name, option, switched_on, power in self.source.devices(index):
+            status = "on" if switched_on else "off"
+            self.tree.insert(item, tk.END, iid=f"{item}-{j}", text=f"{j + 1}- {name} ({option})",
+                             values=("", status, power))
+    
+    def _on_expand(self, event):
+        """Insert the devices of the home row being expanded."""
+        item = self.tree.focus()
+        if item.startswith("home-") and item.count("-") == 1:
+            index = int(item.split("-")[1])
+            self.__expanded.add(index)
+            self._insert_devices(index)
+    
+    def _on_collapse(self, event):
+        """Forget that the collapsed home row was expanded."""
+        item = self.tree.focus()
+        if item.startswith("home-") and item.count("-") == 1:
+            self.__expanded.discard(int(item.split("-")[1]))
+    
+    def _on_double_click(self, event):
+        """Open the smart home of a double-clicked row."""
+        item = self.tree.identify_row(event.y)
+        if item and self.open_home is not None:
+            self.open_home(int(item.split("-")[1]))
+    
+    def _on_search(self, *args):
+        """Filter the homes shortly after the search text stops changing."""
+        if self.__search_job is not None:
+            self.root.after_cancel(self.__search_job)
+        self.__search_job = self.root.after(150, self._apply_search)
+    
+    def _apply_search(self):
+        """Filter the homes by the search text."""
+        self.__search_job = None
+        self.source.set_query(self.search_var.get())
+        self.page_number = 0
+        self._show_page()
+    
+    def _sort_by(self, column):
+        """Sort by a column, reversing the order if it is already sorted by it."""
+        current, descending = self.source.sort
+        self.source.set_sort(column, not descending if column == current else False)
+        self.page_number = 0
+        self._show_page()
+    
+    def _turn_page(self, step):
+        """Show the previous or next page."""
+        number = self.page_number + step
+        if 0 <= number < self.source.page_count:
+            self.page_number = number
+            self._show_page()
+    
+    def _poll(self):
+        """Redraw the page if the homes changed, then check again later."""
+        if self.source.version != self.__shown_version:
+            self._show_page()
+        self.__poll_job = self.root.after(self.poll_interval, self._poll)
+    
+    def refresh(self):
+        """Pick up homes appended to the fleet; the next poll redraws."""
+        self.source.sync()
+    
+    def close(self):
+        """Stop listening to the homes and close the window."""
+        for job in (self.__search_job, self.__poll_job):
+            if job is not None:
+                self.root.after_cancel(job)
+        self.source.close()
+        self.root.destroy()
+        if self.on_close is not None:
+            self.on_close()
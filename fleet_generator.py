@@ -0,0 +1,292 @@
+import argparse
+import csv
+import os
+import random
+import time
+from device_types import DEVICE_TYPES, device_type_of
+from smart_home import SmartHome, DEFAULT_MAX_ITEMS
+from smart_homes_store import export_smart_homes
+from store_codecs import CODECS, codec_for_path, compare_codecs
+
+DEFAULT_OPERATION_MIX = {"toggle": 3, "option": 1}
+
+# Store formats a generated fleet can be written in
+FORMATS = {name: codec.dump for name, codec in CODECS.items()}
+
+
+def generate_fleet(home_count, devices_per_home=(1, 10), mix=None, on_ratio=0.5, seed=0):
+    """
+    Generate a deterministic fleet of smart homes.
+    
+    The same arguments always produce the same fleet.
+    
+    Args:
+        home_count (int): Number of homes to generate.
+        devices_per_home (int or tuple, optional): Exact number of devices per
+            home, or an inclusive (minimum, maximum) range, at most
+            DEFAULT_MAX_ITEMS so the stores can load the homes back.
+            Defaults to (1, 10).
+        mix (dict, optional): Relative weight of each device type name.
+            Defaults to an even mix of every registered type.
+        on_ratio (float, optional): Probability that a device is switched on.
+            Defaults to 0.5.
+        seed (int, optional): The random seed. Defaults to 0.
+    
+    Returns:
+        list: The generated SmartHome objects.
+    
+    Raises:
+        ValueError: If the mix names an unknown device type or the device
+            counts are out of range.
+    """
+    mix = dict.fromkeys(DEVICE_TYPES, 1) if mix is None else mix
+    unknown = set(mix) - set(DEVICE_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown device type(s): {', '.join(sorted(unknown))}")
+    if isinstance(devices_per_home, int):
+        devices_per_home = (devices_per_home, devices_per_home)
+    if not 0 <= devices_per_home[0] <= devices_per_home[1] <= DEFAULT_MAX_ITEMS:
+        raise ValueError(f"Devices per home must be between 0 and {DEFAULT_MAX_ITEMS}")
+    
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    fleet = []
+    for _ in range(home_count):
+        count = rng.randint(*devices_per_home)
+        home = SmartHome()
+        for name in rng.choices(names, weights, k=count):
+            device_type = DEVICE_TYPES[name]
+            value = rng.randint(device_type.minimum, device_type.maximum)
+            home.add_device(device_type.create(value, rng.random() < on_ratio))
+        fleet.append(home)
+    return fleet
+
+
+def write_fleet(fleet, path, store_format="csv", homes_per_file=None):
+    """
+    Write a fleet in one of the supported store formats.
+    
+    Args:
+        fleet (list): The smart homes to write.
+        path (str): The store file, or the directory when sharding.
+        store_format (str, optional): The store format, "csv", "jsonl" or
+            "binary". Defaults to "csv".
+        homes_per_file (int, optional): Shard the fleet into files of this
+            many homes inside the path directory. Defaults to a single file.
+    
+    Returns:
+        list: The written file paths.
+    
+    Raises:
+        ValueError: If the store format is not supported or homes_per_file
+            is not a positive integer.
+    """
+    if store_format not in FORMATS:
+        raise ValueError(f"Store format must be one of {', '.join(FORMATS)}")
+    if homes_per_file is None:
+        FORMATS[store_format](fleet, path)
+        return [path]
+    if store_format == "csv":
+        return export_smart_homes(fleet, path, homes_per_file)
+    
+    if not isinstance(homes_per_file, int) or homes_per_file < 1:
+        raise ValueError("Homes per file must be a positive integer")
+    os.makedirs(path, exist_ok=True)
+    paths = []
+    for shard, start in enumerate(range(0, len(fleet), homes_per_file)):
+        paths.append(os.path.join(path, f"smart_homes_{shard:04d}{CODECS[store_format].extension}"))
+        FORMATS[store_format](fleet[start:start + homes_per_file], paths[-1])
+    return paths
+
+
+def generate_operations(fleet, count, mix=None, seed=0):
+    """
+    Generate a deterministic stream of device operations against a fleet.
+    
+    Args:
+        fleet (list): The smart homes the operations target.
+        count (int): Number of operations to generate.
+        mix (dict, optional): Relative weight of "toggle" and "option"
+            operations. Defaults to three toggles per option update.
+        seed (int, optional): The random seed. Defaults to 0.
+    
+    Returns:
+        list: (home index, device index, operation, value) tuples; option
+        values are always valid for the targeted device.
+    """
+    mix = DEFAULT_OPERATION_MIX if mix is None else mix
+    rng = random.Random(seed)
+    targets = [(h, d) for h, home in enumerate(fleet) for d in range(len(home))]
+    operations = []
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    for kind in rng.choices(kinds, weights, k=count if targets else 0):
+        home_index, device_index = rng.choice(targets)
+        value = None
+        if kind == "option":
+            device_type = device_type_of(fleet[home_index].get_device(device_index))
+            value = rng.randint(device_type.minimum, device_type.maximum)
+        operations.append((home_index, device_index, kind, value))
+    return operations
+
+
+def save_operations(operations, path):
+    """
+    Save an operation stream to a CSV file.
+    
+    Args:
+        operations (list): The (home, device, operation, value) tuples.
+        path (str): The file to write.
+    """
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        for home_index, device_index, kind, value in operations:
+            writer.writerow([home_index, device_index, kind, "" if value is None else value])
+
+
+def load_operations(path):
+    """
+    Load an operation stream recorded with save_operations().
+    
+    Args:
+        path (str): The file to read.
+    
+    Returns:
+        list: The (home, device, operation, value) tuples.
+    """
+    with open(path, "r", newline="") as file:
+        return [
+            (int(row[0]), int(row[1]), row[2], int(row[3]) if row[3] else None)
+            for row in csv.reader(file) if row
+        ]
+
+
+def _percentile(ordered, fraction):
+    """Get a percentile from an already sorted list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def replay(fleet, operations, rate=None, clock=time.perf_counter, sleep=time.sleep):
+    """
+    Drive an operation stream against a fleet and measure the latency.
+    
+    With a target rate, each operation has an intended start time and its
+    latency is measured from that time, so a stall that delays later
+    operations shows up in their latency instead of being hidden.
+    
+    Args:
+        fleet (list): The smart homes to apply the operations to.
+        operations (list): The (home, device, operation, value) tuples.
+        rate (float, optional): Target operations per second. Defaults to
+            running as fast as possible.
+        clock (optional): A monotonic clock in seconds. Defaults to
+            time.perf_counter.
+        sleep (optional): A function sleeping for some seconds. Defaults to
+            time.sleep.
+    
+    Returns:
+        dict: The operation and error counts, elapsed seconds, throughput
+        in operations per second, and p50/p99/p999/max latencies in seconds.
+    
+    Raises:
+        ValueError: If the target rate is not positive.
+    """
+    if rate is not None and rate <= 0:
+        raise ValueError("Target rate must be positive")
+    latencies = []
+    errors = 0
+    start = clock()
+    for i, (home_index, device_index, kind, value) in enumerate(operations):
+        if rate is None:
+            began = clock()
+        else:
+            began = start + i / rate
+            wait = began - clock()
+            if wait > 0:
+                sleep(wait)
+        try:
+            if kind == "toggle":
+                fleet[home_index].toggle_device(device_index)
+            else:
+                fleet[home_index].update_option(device_index, value)
+        except (IndexError, ValueError, AttributeError):
+            errors += 1
+        latencies.append(clock() - began)
+    elapsed = clock() - start
+    latencies.sort()
+    return {
+        "operations": len(operations),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": len(operations) / elapsed if elapsed > 0 else float("inf"),
+        "p50": _percentile(latencies, 0.50),
+        "p99": _percentile(latencies, 0.99),
+        "p999": _percentile(latencies, 0.999),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def main(argv=None):
+    """
+    Generate fleets and replay operation streams from the command line.
+    
+    Args:
+        argv (list, optional): Command-line arguments. Defaults to sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Synthetic smart home fleets and load replay")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    generate = commands.add_parser("generate", help="write a generated fleet")
+    generate.add_argument("--homes", type=int, required=True)
+    generate.add_argument("--devices", type=int, nargs=2, default=[1, 10], metavar=("MIN", "MAX"))
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    generate.add_argument("--homes-per-file", type=int)
+    generate.add_argument("--out", default="smart_homes.csv")
+    
+    run = commands.add_parser("replay", help="replay operations against a store")
+    run.add_argument("--store", default="smart_homes.csv")
+    run.add_argument("--ops", type=int, default=100000, help="number of generated operations")
+    run.add_argument("--record", help="replay this recorded operation file instead")
+    run.add_argument("--rate", type=float, help="target operations per second")
+    run.add_argument("--seed", type=int, default=0)
+    
+    codecs = commands.add_parser("codecs", help="compare store codecs on a generated fleet")
+    codecs.add_argument("--homes", type=int, default=10000)
+    codecs.add_argument("--workers", type=int, default=1, help="worker processes for decoding")
+    codecs.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    
+    if args.command == "generate":
+        if not 0 <= args.devices[0] <= args.devices[1] <= DEFAULT_MAX_ITEMS:
+            parser.error(f"--devices must be between 0 and {DEFAULT_MAX_ITEMS}")
+        fleet = generate_fleet(args.homes, tuple(args.devices), seed=args.seed)
+        paths = write_fleet(fleet, args.out, args.format, args.homes_per_file)
+        print(f"Wrote {len(fleet)} home(s) to {len(paths)} file(s)")
+    elif args.command == "codecs":
+        fleet = generate_fleet(args.homes, seed=args.seed)
+        devices = sum(len(home) for home in fleet)
+        print(f"{len(fleet)} home(s), {devices} device(s), {args.workers} decode worker(s)")
+        for name, result in compare_codecs(fleet, args.workers).items():
+            print(f"{name:<8} {result['bytes']:>12} bytes   "
+                  f"encode {devices / result['encode']:>10.0f} devices/s   "
+                  f"decode {devices / result['decode']:>10.0f} devices/s")
+    else:
+        fleet, errors = codec_for_path(args.store).load(args.store)
+        for error in errors:
+            print(f"Warning loading smart homes: {error}")
+        if args.record:
+            operations = load_operations(args.record)
+        else:
+            operations = generate_operations(fleet, args.ops, seed=args.seed)
+        report = replay(fleet, operations, args.rate)
+        print(f"{report['operations']} operations, {report['errors']} errors in {report['seconds']:.3f} s")
+        print(f"Throughput: {report['throughput']:.0f} ops/s")
+        print(f"Latency p50 {report['p50'] * 1e6:.1f} us, p99 {report['p99'] * 1e6:.1f} us, "
+              f"p999 {report['p999'] * 1e6:.1f} us, max {report['max'] * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    main()
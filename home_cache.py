@@ -0,0 +1,128 @@
+from collections import OrderedDict
+
+
+class HomeCache:
+    """
+    A bounded least-recently-used cache keyed by home id.
+    
+    Values that fall out of the cache are handed to an evict function, so
+    the owner can release what they hold, for example destroy a window.
+    
+    Attributes:
+        capacity (int): The maximum number of cached values.
+        hits (int): The number of lookups that found a cached value.
+        misses (int): The number of lookups that found none.
+    """
+    
+    def __init__(self, capacity, evict=None):
+        """
+        Initialize an empty HomeCache.
+        
+        Args:
+            capacity (int): The maximum number of cached values.
+            evict (optional): A callable taking a home id and its value when
+                the value is evicted. Defaults to None.
+        
+        Raises:
+            ValueError: If capacity is not a positive integer.
+        """
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("Cache capacity must be a positive integer")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.__evict = evict
+        self.__values = OrderedDict()
+    
+    def __len__(self):
+        """
+        Return the number of cached values.
+        
+        Returns:
+            int: The number of cached values.
+        """
+        return len(self.__values)
+    
+    def __contains__(self, home_id):
+        """
+        Check whether a home's value is cached, without touching its recency.
+        
+        Args:
+            home_id: The home id.
+        
+        Returns:
+            bool: True if the value is cached.
+        """
+        return home_id in self.__values
+    
+    def get(self, home_id, default=None):
+        """
+        Get the cached value of a home and mark it most recently used.
+        
+        Args:
+            home_id: The home id.
+            default (optional): The result if the value is not cached.
+        
+        Returns:
+            The cached value, or default.
+        """
+        if home_id not in self.__values:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.__values.move_to_end(home_id)
+        return self.__values[home_id]
+    
+    def put(self, home_id, value):
+        """
+        Cache the value of a home as the most recently used.
+        
+        A value already cached for the home is replaced without being
+        evicted. If the cache overflows, the least recently used value is
+        evicted.
+        
+        Args:
+            home_id: The home id.
+            value: The value to cache.
+        """
+        self.__values[home_id] = value
+        self.__values.move_to_end(home_id)
+        while len(self.__values) > self.capacity:
+            self._evict(*self.__values.popitem(last=False))
+    
+    def pop(self, home_id, default=None):
+        """
+        Take the value of a home out of the cache without evicting it.
+        
+        Args:
+            home_id: The home id.
+            default (optional): The result if the value is not cached.
+        
+        Returns:
+            The cached value, or default.
+        """
+        if home_id not in self.__values:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return self.__values.pop(home_id)
+    
+    def _evict(self, home_id, value):
+        """Hand a value that left the cache to the evict function."""
+        if self.__evict is not None:
+            self.__evict(home_id, value)
+    
+    def discard(self, home_id):
+        """
+        Evict the value of a home if it is cached.
+        
+        Args:
+            home_id: The home id.
+        """
+        if home_id in self.__values:
+            self._evict(home_id, self.__values.pop(home_id))
+    
+    def clear(self):
+        """Evict every cached value, least recently used first."""
+        while self.__values:
+            self._evict(*self.__values.popitem(last=False))
@@ -0,0 +1,340 @@
+import asyncio
+import json
+from device_types import device_type_of
+
+# Bytes read from a source at a time
+CHUNK_SIZE = 1 << 16
+
+
+def encode_report(home_id, index, field, value):
+    """
+    Encode a device state report as a line of a feed.
+    
+    Args:
+        home_id (int): The index of the home.
+        index (int): The index of the device in the home.
+        field (str): "switched_on" or the device's option attribute name.
+        value: The reported switch state or option value.
+    
+    Returns:
+        bytes: The report as a line of compact JSON.
+    """
+    return (json.dumps([home_id, index, field, value], separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class IngestPipeline:
+    """
+    Folds device state reports from external feeds into smart homes.
+    
+    Feeds are lines of JSON, one [home, device, field, value] report each,
+    where the field is "switched_on" or the device's option attribute name
+    and the value is the device's new state. Reports run through four
+    stages connected by bounded queues:
+    
+    1. Readers split the bytes of each source into lines.
+    2. The parser decodes a whole chunk of lines with one json.loads()
+       call and keys the reports by (home, device, field).
+    3. The coalescer merges parsed chunks while the applier is busy; the
+       last report for each key wins, so a device reported many times
+       between two applies is updated once.
+    4. The applier groups the merged reports by home and applies each
+       home's option updates with SmartHome.update_options() and its
+       switches with SmartHome.apply(), so listeners see one notification
+       per home and kind instead of one per report.
+    
+    When the applier falls behind, the queues fill up and the readers stop
+    reading, which pushes back on socket senders through TCP flow control.
+    
+    Reports naming a missing home or device, a field the device doesn't
+    have or an invalid value are rejected and counted without affecting
+    the rest of their batch. Home ids are indices into the smart_homes
+    list, as in the API server.
+    
+    Attributes:
+        smart_homes (list): The smart homes updated by the pipeline.
+        host (str): The interface the feed server listens on.
+        port (int): The port the feed server listens on (0 picks a free port).
+        received (int): Reports read from the sources.
+        malformed (int): Lines that were not a valid report.
+        superseded (int): Reports dropped because a later report for the
+            same device field arrived before they were applied.
+        applied (int): Reports applied to the homes.
+        rejected (int): Reports that could not be applied.
+    """
+    
+    def __init__(self, smart_homes, host="127.0.0.1", port=0, queue_size=8, batch_size=50000):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            smart_homes (list): The smart homes to update.
+            host (str, optional): The interface to listen on. Defaults to "127.0.0.1".
+            port (int, optional): The port to listen on. Defaults to 0.
+            queue_size (int, optional): Chunks each queue holds before its
+                producer waits. Defaults to 8.
+            batch_size (int, optional): Most distinct device fields merged
+                into one apply. Defaults to 50000.
+        
+        Raises:
+            ValueError: If the queue or batch size is not positive.
+        """
+        if queue_size < 1 or batch_size < 1:
+            raise ValueError("Queue size and batch size must be positive")
+        self.smart_homes = smart_homes
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.received = 0
+        self.malformed = 0
+        self.superseded = 0
+        self.applied = 0
+        self.rejected = 0
+        self._lines = None
+        self._reports = None
+        self._batches = None
+        self._tasks = []
+        self._server = None
+    
+    async def start(self):
+        """Start the parse, coalesce and apply stages."""
+        self._lines = asyncio.Queue(self.queue_size)
+        self._reports = asyncio.Queue(self.queue_size)
+        self._batches = asyncio.Queue(1)
+        self._tasks = [
+            asyncio.create_task(self._parse()),
+            asyncio.create_task(self._coalesce()),
+            asyncio.create_task(self._apply()),
+        ]
+    
+    async def serve(self):
+        """
+        Start accepting feed connections, one report per line.
+        
+        Raises:
+            OSError: If the address cannot be bound.
+        """
+        self._server = await asyncio.start_server(self._handle_feed, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def close(self):
+        """Stop the feed server and the stages; queued reports are dropped."""
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.close()
+            await server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def flush(self):
+        """Wait until every report read so far has been applied or rejected."""
+        await self._lines.join()
+        await self._reports.join()
+        await self._batches.join()
+    
+    async def ingest(self, read):
+        """
+        Read a source to its end, queueing its lines for parsing.
+        
+        Args:
+            read: A coroutine function returning the next chunk of bytes,
+                or b"" at the end of the source.
+        """
+        remainder = b""
+        while True:
+            chunk = await read()
+            if not chunk:
+                break
+            lines = (remainder + chunk).split(b"\n")
+            remainder = lines.pop()
+            if lines:
+                await self._lines.put(lines)
+        if remainder.strip():
+            await self._lines.put([remainder])
+    
+    async def ingest_file(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Read a feed file to its end.
+        
+        Args:
+            path (str): The file, one report per line.
+            chunk_size (int, optional): Bytes read at a time. Defaults to CHUNK_SIZE.
+        
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        with open(path, "rb") as file:
+            await self.ingest(lambda: asyncio.to_thread(file.read, chunk_size))
+    
+    async def _handle_feed(self, reader, writer):
+        """
+        Read one feed connection until the sender closes it.
+        
+        Args:
+            reader: The asyncio stream reader.
+            writer: The asyncio stream writer.
+        """
+        try:
+            await self.ingest(lambda: reader.read(CHUNK_SIZE))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    @staticmethod
+    def _decode(lines):
+        """
+        Decode a chunk of lines into reports keyed by device field.
+        
+        The whole chunk is decoded as one JSON array when every line is a
+        single flat array: each line starts with "[" and ends with "]", and
+        the chunk holds no other brackets, which C-level byte counts check.
+        Lines can then neither merge nor split when joined, so the decoded
+        elements match the lines one to one. Any other chunk, including one
+        holding a malformed line, is decoded line by line.
+        
+        Args:
+            lines (list): The lines, as bytes.
+        
+        Returns:
+            tuple: A dict of the value of the last report of each (home,
+            device, field), the number of non-blank lines and the number of
+            malformed ones.
+        """
+        if b"" in lines:
+            lines = [line for line in lines if line]
+        data = b"\n".join(lines)
+        count = len(lines)
+        if (data.startswith(b"[") and data.endswith(b"]")
+                and data.count(b"[") == data.count(b"]") == count
+                and data.count(b"\n[") == data.count(b"]\n") == count - 1):
+            try:
+                decoded = json.loads(b"[" + data.replace(b"\n", b",") + b"]")
+                if len(decoded) == count:
+                    return {(home_id, index, field): value for home_id, index, field, value in decoded}, count, 0
+            except (ValueError, TypeError):
+                pass
+        reports = {}
+        malformed = 0
+        lines = [line for line in lines if line.strip()]
+        for line in lines:
+            try:
+                home_id, index, field, value = json.loads(line)
+                reports[home_id, index, field] = value
+            except (ValueError, TypeError):
+                malformed += 1
+        return reports, len(lines), malformed
+    
+    async def _parse(self):
+        """Decode the chunks of lines queued by the readers."""
+        while True:
+            lines = await self._lines.get()
+            try:
+                reports, count, malformed = self._decode(lines)
+                self.received += count
+                self.malformed += malformed
+                self.superseded += count - malformed - len(reports)
+                if reports:
+                    await self._reports.put(reports)
+            finally:
+                self._lines.task_done()
+    
+    async def _coalesce(self):
+        """Merge decoded reports until the applier takes them, last report winning."""
+        while True:
+            pending = await self._reports.get()
+            merged = 1
+            try:
+                while len(pending) < self.batch_size and not self._reports.empty():
+                    reports = self._reports.get_nowait()
+                    merged += 1
+                    size = len(pending)
+                    pending.update(reports)
+                    self.superseded += len(reports) - (len(pending) - size)
+                await self._batches.put(pending)
+            finally:
+                for _ in range(merged):
+                    self._reports.task_done()
+    
+    async def _apply(self):
+        """Apply the merged reports handed over by the coalescer."""
+        while True:
+            pending = await self._batches.get()
+            try:
+                self.apply_reports(pending)
+            finally:
+                self._batches.task_done()
+    
+    def apply_reports(self, reports):
+        """
+        Apply reports to the smart homes, one batch per home and kind.
+        
+        A home's batch failing validation is retried report by report, so
+        only the invalid reports are rejected.
+        
+        Args:
+            reports (dict): The reported value of each (home, device, field).
+        """
+        by_home = {}
+        for key, value in reports.items():
+            updates = by_home.get(key[0])
+            if updates is None:
+                updates = by_home[key[0]] = []
+            updates.append((key[1], key[2], value))
+        for home_id, updates in by_home.items():
+            home = self._get_home(home_id)
+            if home is None:
+                self.rejected += len(updates)
+                continue
+            switches = [("set_switch", index, value) for index, field, value in updates
+                        if field == "switched_on"]
+            options = [update for update in updates if update[1] != "switched_on"]
+            if switches:
+                self._apply_switches(home, switches)
+            if options:
+                self._apply_options(home, options)
+    
+    def _get_home(self, home_id):
+        """Get the home with an id, or None if there is none."""
+        if type(home_id) is not int or not 0 <= home_id < len(self.smart_homes):
+            return None
+        return self.smart_homes[home_id]
+    
+    def _apply_switches(self, home, switches):
+        """Apply a home's reported switch states, rejecting invalid ones."""
+        try:
+            if any(type(operation[2]) is not bool for operation in switches):
+                raise ValueError("Switch states must be true or false")
+            home.apply(switches)
+            self.applied += len(switches)
+        except (IndexError, ValueError, TypeError):
+            for operation in switches:
+                try:
+                    if type(operation[2]) is not bool:
+                        raise ValueError("Switch states must be true or false")
+                    home.apply([operation])
+                    self.applied += 1
+                except (IndexError, ValueError, TypeError):
+                    self.rejected += 1
+    
+    def _apply_options(self, home, options):
+        """Apply a home's reported option values, rejecting invalid ones."""
+        indices = [index for index, _, _ in options]
+        values = [value for _, _, value in options]
+        try:
+            fields = [device_type_of(home.get_device(index)).option for index in indices]
+            if fields != [field for _, field, _ in options]:
+                raise ValueError("Reported fields do not match the devices' options")
+            home.update_options(indices, values)
+            self.applied += len(options)
+        except (IndexError, ValueError, TypeError, AttributeError):
+            for index, field, value in options:
+                try:
+                    if device_type_of(home.get_device(index)).option != field:
+                        raise ValueError(f"Device has no option {field}")
+                    home.update_option(index, value)
+                    self.applied += 1
+                except (IndexError, ValueError, TypeError, AttributeError):
+                    self.rejected += 1
@@ -0,0 +1,397 @@
+import heapq
+from itertools import count
+from device_types import device_type_of
+
+# Priority of each device type; devices with lower priorities are shed first
+DEFAULT_PRIORITIES = {"SmartPlug": 0, "SmartHeater": 1, "SmartOven": 2}
+
+
+def rated_power(device):
+    """
+    Get the power a device draws while it is switched on.
+    
+    Args:
+        device: The smart device.
+    
+    Returns:
+        float: The power in watts from its type's power model, or 0 for
+        devices of unregistered types.
+    """
+    device_type = device_type_of(device)
+    if device_type is None:
+        return 0
+    return device_type.power_model(device_type.get_option(device))
+
+
+class _HomeBudget:
+    """
+    The power accounting and priority heaps of one home.
+    
+    Heap entries are never removed in place: every change to a device gives
+    it a new stamp, and entries with an older stamp are skipped when they
+    reach the top.
+    
+    Attributes:
+        budget (float): The wattage cap of the home.
+        total (float): The power drawn by the switched-on devices.
+        devices (list): The home's devices, by index.
+        positions (dict): The index of each device, by id.
+        draw (dict): The rated power of each device, by id.
+        priorities (dict): Priorities set for single devices, by id.
+        stamps (dict): The stamp of each device's current heap entry, by id.
+        on (list): Heap of (priority, -stamp, id) for switched-on devices,
+            the next device to shed on top.
+        shed (list): Heap of (-priority, stamp, id) for devices switched
+            off by the shedder, the next device to restore on top.
+        shed_ids (set): The ids of the devices currently shed.
+        shedding (set): The ids of the devices being switched off by the
+            shedder.
+        balancing (bool): Whether the shedder is changing the home.
+        listener: The listener registered with the home.
+    """
+    
+    def __init__(self, budget):
+        """
+        Initialize empty accounting for a home.
+        
+        Args:
+            budget (float): The wattage cap of the home.
+        """
+        self.budget = budget
+        self.total = 0
+        self.devices = []
+        self.positions = {}
+        self.draw = {}
+        self.priorities = {}
+        self.stamps = {}
+        self.on = []
+        self.shed = []
+        self.shed_ids = set()
+        self.shedding = set()
+        self.balancing = False
+        self.listener = None
+
+
+class LoadShedder:
+    """
+    Keeps the power drawn by smart homes under a wattage budget.
+    
+    When the switched-on devices of a home draw more than its budget, the
+    shedder switches off devices, lowest priority first and, among equal
+    priorities, the most recently switched on first. When power frees up,
+    shed devices are switched back on, highest priority first, as long as
+    the next one fits the budget.
+    
+    Each home keeps a running power total, updated by the delta of every
+    device event, and two heaps: switched-on devices by shedding order and
+    shed devices by restoring order. Handling a change costs O(log n) heap
+    operations instead of a rescan of the home. The shedder's own switches
+    are applied with SmartHome.apply(), so listeners see each round of
+    shedding or restoring as a single change. Rebalancing after a change
+    is deferred until every listener of the home has seen that change, so
+    listeners registered after the shedder, such as an op log, receive the
+    changes in the order they happened.
+    
+    Attributes:
+        budget (float): The default budget, in watts, of watched homes.
+        priorities (dict): Device priorities by type name; higher
+            priorities are kept on longer.
+        shed_count (int): Devices switched off by the shedder.
+        restore_count (int): Devices switched back on by the shedder.
+    """
+    
+    def __init__(self, budget, priorities=None):
+        """
+        Initialize a LoadShedder.
+        
+        Args:
+            budget (float): The default budget of watched homes, in watts.
+            priorities (dict, optional): Device priorities by type name.
+                Defaults to DEFAULT_PRIORITIES; unlisted types have priority 0.
+        
+        Raises:
+            ValueError: If the budget is negative.
+        """
+        self.budget = self._check_budget(budget)
+        self.priorities = dict(DEFAULT_PRIORITIES if priorities is None else priorities)
+        self.shed_count = 0
+        self.restore_count = 0
+        self.__homes = {}
+        self.__stamp = count()
+    
+    @staticmethod
+    def _check_budget(budget):
+        """Return a budget after checking that it is a non-negative number."""
+        if not isinstance(budget, (int, float)) or budget < 0:
+            raise ValueError("Power budget must be a non-negative number of watts")
+        return budget
+    
+    def watch(self, home, budget=None):
+        """
+        Start keeping a smart home under a budget.
+        
+        Devices are shed right away if the home is already over budget.
+        
+        Args:
+            home (SmartHome): The smart home to watch.
+            budget (float, optional): The home's budget in watts. Defaults to
+                the shedder's budget.
+        
+        Raises:
+            ValueError: If the budget is negative.
+        """
+        state = _HomeBudget(self.budget if budget is None else self._check_budget(budget))
+        for i in range(len(home)):
+            self._add(state, i, home.get_device(i))
+        state.listener = lambda events: self._on_events(home, state, events)
+        self.__homes[id(home)] = (home, state)
+        home.add_listener(state.listener)
+        self._balance(home, state)
+    
+    def unwatch(self, home):
+        """
+        Stop keeping a smart home under its budget.
+        
+        Devices shed at that point stay switched off.
+        
+        Args:
+            home (SmartHome): The smart home to stop watching.
+        
+        Raises:
+            KeyError: If the home is not being watched.
+        """
+        home, state = self.__homes.pop(id(home))
+        home.remove_listener(state.listener)
+    
+    def set_budget(self, home, budget):
+        """
+        Change the budget of a watched home, shedding or restoring devices.
+        
+        Args:
+            home (SmartHome): A watched smart home.
+            budget (float): The new budget in watts.
+        
+        Raises:
+            KeyError: If the home is not being watched.
+            ValueError: If the budget is negative.
+        """
+        home, state = self.__homes[id(home)]
+        state.budget = self._check_budget(budget)
+        self._balance(home, state)
+    
+    def set_priority(self, home, index, priority):
+        """
+        Set the priority of a single device, overriding its type's priority.
+        
+        Args:
+            home (SmartHome): A watched smart home.
+            index (int): The index of the device.
+            priority (float): The new priority.
+        
+        Raises:
+            KeyError: If the home is not being watched.
+            IndexError: If the index is out of range.
+        """
+        home, state = self.__homes[id(home)]
+        device = home.get_device(index)
+        state.priorities[id(device)] = priority
+        self._push(state, device)
+        self._balance(home, state)
+    
+    def power(self, home):
+        """
+        Get the power drawn by a watched home.
+        
+        Args:
+            home (SmartHome): A watched smart home.
+        
+        Returns:
+            float: The power of its switched-on devices, in watts.
+        
+        Raises:
+            KeyError: If the home is not being watched.
+        """
+        return self.__homes[id(home)][1].total
+    
+    def shed_devices(self, home):
+        """
+        Get the devices of a watched home that are currently shed.
+        
+        Args:
+            home (SmartHome): A watched smart home.
+        
+        Returns:
+            list: The indices of the shed devices, in ascending order.
+        
+        Raises:
+            KeyError: If the home is not being watched.
+        """
+        state = self.__homes[id(home)][1]
+        return sorted(state.positions[device_id] for device_id in state.shed_ids)
+    
+    def _priority(self, state, device):
+        """Get the priority of a device."""
+        priority = state.priorities.get(id(device))
+        if priority is None:
+            device_type = device_type_of(device)
+            name = type(device).__name__ if device_type is None else device_type.name
+            priority = self.priorities.get(name, 0)
+        return priority
+    
+    def _push(self, state, device):
+        """
+        Give a device a new stamp and push it on the heap matching its state.
+        
+        Its older entries become stale, and the heaps are rebuilt from their
+        valid entries once stale ones make up most of them.
+        
+        Args:
+            state (_HomeBudget): The home's accounting.
+            device: The smart device.
+        """
+        device_id = id(device)
+        stamp = state.stamps[device_id] = next(self.__stamp)
+        priority = self._priority(state, device)
+        if device.switched_on:
+            heapq.heappush(state.on, (priority, -stamp, device_id))
+        elif device_id in state.shed_ids:
+            heapq.heappush(state.shed, (-priority, stamp, device_id))
+        if len(state.on) + len(state.shed) > 4 * len(state.devices) + 16:
+            state.on = [entry for entry in state.on if state.stamps.get(entry[2]) == -entry[1]]
+            state.shed = [entry for entry in state.shed if state.stamps.get(entry[2]) == entry[1]]
+            heapq.heapify(state.on)
+            heapq.heapify(state.shed)
+    
+    def _add(self, state, index, device):
+        """Account for a device added at an index."""
+        state.devices.insert(index, device)
+        for i in range(index, len(state.devices)):
+            state.positions[id(state.devices[i])] = i
+        state.draw[id(device)] = rated_power(device)
+        if device.switched_on:
+            state.total += state.draw[id(device)]
+        self._push(state, device)
+    
+    def _remove(self, state, index):
+        """Account for the device removed from an index."""
+        device = state.devices.pop(index)
+        device_id = id(device)
+        for i in range(index, len(state.devices)):
+            state.positions[id(state.devices[i])] = i
+        if device.switched_on:
+            state.total -= state.draw[device_id]
+        for table in (state.positions, state.draw, state.priorities, state.stamps):
+            table.pop(device_id, None)
+        state.shed_ids.discard(device_id)
+        state.shedding.discard(device_id)
+    
+    def _on_events(self, home, state, events):
+        """
+        Update the power total and heaps by the delta of each event, then
+        rebalance once the other listeners have seen the events.
+        
+        Args:
+            home (SmartHome): The home the events came from.
+            state (_HomeBudget): The home's accounting.
+            events (list): The DeviceEvent objects.
+        """
+        for event in events:
+            device = event.device
+            device_id = id(device)
+            if event.field == "added":
+                self._add(state, event.index, device)
+            elif event.field == "removed":
+                self._remove(state, event.index)
+            elif event.field == "switched_on":
+                if event.value:
+                    state.total += state.draw[device_id]
+                    state.shed_ids.discard(device_id)
+                else:
+                    state.total -= state.draw[device_id]
+                    if device_id in state.shedding:
+                        state.shedding.discard(device_id)
+                        state.shed_ids.add(device_id)
+                self._push(state, device)
+            else:
+                draw = rated_power(device)
+                if device.switched_on:
+                    state.total += draw - state.draw[device_id]
+                state.draw[device_id] = draw
+        home.defer(lambda: self._balance(home, state))
+    
+    def _balance(self, home, state):
+        """
+        Shed or restore devices until the home is balanced.
+        
+        Args:
+            home (SmartHome): The home to balance.
+            state (_HomeBudget): The home's accounting.
+        """
+        if state.balancing:
+            return
+        state.balancing = True
+        try:
+            batch = self._plan(state)
+            while batch:
+                home.apply(batch)
+                batch = self._plan(state)
+        finally:
+            state.balancing = False
+            state.shedding.clear()
+    
+    def _plan(self, state):
+        """
+        Plan the switches bringing a home under budget or restoring devices.
+        
+        Shedding pops devices in shedding order until the total fits, then
+        keeps on, in restoring order, every popped device that still fits,
+        so no device is shed only to be restored by the next plan.
+        
+        Args:
+            state (_HomeBudget): The home's accounting.
+        
+        Returns:
+            list: The set_switch operations for SmartHome.apply(); empty if
+            the home is balanced.
+        """
+        batch = []
+        total = state.total
+        if total > state.budget:
+            kept = []
+            popped = []
+            while total > state.budget and state.on:
+                entry = heapq.heappop(state.on)
+                device_id = entry[2]
+                if state.stamps.get(device_id) != -entry[1]:
+                    continue
+                if not state.draw[device_id]:
+                    kept.append(entry)
+                    continue
+                popped.append(entry)
+                total -= state.draw[device_id]
+            for entry in reversed(popped):
+                device_id = entry[2]
+                if total + state.draw[device_id] <= state.budget:
+                    kept.append(entry)
+                    total += state.draw[device_id]
+                    continue
+                state.shedding.add(device_id)
+                batch.append(("set_switch", state.positions[device_id], False))
+                self.shed_count += 1
+            for entry in kept:
+                heapq.heappush(state.on, entry)
+            batch.reverse()
+            return batch
+        
+        while state.shed:
+            _, stamp, device_id = state.shed[0]
+            if state.stamps.get(device_id) != stamp or device_id not in state.shed_ids:
+                heapq.heappop(state.shed)
+                continue
+            if total + state.draw[device_id] > state.budget:
+                break
+            heapq.heappop(state.shed)
+            batch.append(("set_switch", state.positions[device_id], True))
+            total += state.draw[device_id]
+            self.restore_count += 1
+        return batch
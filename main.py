@@ -1,8 +1,30 @@
 import tkinter as tk
 from smart_homes_app import SmartHomesApp
 from smart_home_app import SmartHomeApp
+from smart_home_server import run_server
+from test_analytics import test_analytics
+from test_benchmarks import test_benchmarks
+from test_change_stream import test_change_stream, test_change_stream_server
+from test_command_journal import test_command_journal
+from test_device_types import test_device_type_registry, test_bulk_device_factories, test_bulk_option_updates
+from test_fleet_controller import test_sharded_controller
+from test_fleet_dashboard import test_fleet_data_source
+from test_fleet_generator import test_fleet_generator
+from test_home_cache import test_home_cache
+from test_ingest import test_ingest_pipeline
+from test_load_shedding import test_load_shedding
+from test_metrics import test_metrics
+from test_replication import test_replication
+from test_rules import test_rule_engine
+from test_scheduler import test_scheduler
+from test_shared_fleet import test_shared_fleet
 from test_smart_devices import test_smart_plug, test_custom_device
 from test_smart_home import test_smart_home
+from test_smart_home_server import test_smart_home_server
+from test_telemetry import test_ring_buffer, test_telemetry_recorder
+from test_smart_homes_store import test_smart_homes_store, test_parallel_import_export
+from test_snapshot_archive import test_snapshot_archive
+from test_store_codecs import test_store_codecs
 
 def run_tests():
     """Run all test functions."""
@@ -10,6 +32,32 @@ def run_tests():
     test_smart_plug()
     test_custom_device()
     test_smart_home()
+    test_device_type_registry()
+    test_bulk_device_factories()
+    test_bulk_option_updates()
+    test_command_journal()
+    test_home_cache()
+    test_fleet_data_source()
+    test_smart_homes_store()
+    test_parallel_import_export()
+    test_analytics()
+    test_snapshot_archive()
+    test_store_codecs()
+    test_smart_home_server()
+    test_change_stream()
+    test_change_stream_server()
+    test_replication()
+    test_ingest_pipeline()
+    test_scheduler()
+    test_rule_engine()
+    test_load_shedding()
+    test_ring_buffer()
+    test_telemetry_recorder()
+    test_benchmarks()
+    test_metrics()
+    test_fleet_generator()
+    test_sharded_controller()
+    test_shared_fleet()
     print("\nAll tests completed successfully.")
 
 def run_smart_home_app():
@@ -24,13 +72,18 @@ def run_smart_homes_app():
     app = SmartHomesApp(root)
     root.mainloop()
 
+def run_api_server():
+    """Run the headless HTTP/JSON API server (multiple homes)."""
+    run_server()
+
 if __name__ == "__main__":
     print("Python Smart Home System")
     print("1. Run tests")
     print("2. Run Smart Home App (single home)")
     print("3. Run Smart Homes App (multiple homes)")
+    print("4. Run Smart Homes API server")
     
-    choice = input("Enter your choice (1-3): ")
+    choice = input("Enter your choice (1-4): ")
     
     if choice == "1":
         run_tests()
@@ -38,5 +91,7 @@ if __name__ == "__main__":
         run_smart_home_app()
     elif choice == "3":
         run_smart_homes_app()
+    elif choice == "4":
+        run_api_server()
     else:
         print("Invalid choice. Exiting.") 
\ No newline at end of file
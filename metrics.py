@@ -0,0 +1,276 @@
+import bisect
+import cProfile
+import functools
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import smart_homes_store
+from smart_home import SmartHome
+from smart_homes_store import atomic_write_text
+
+# Latency histogram bucket upper bounds, in seconds
+BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+
+# SmartHome methods taking a device index, instrumented per device type
+INDEXED_METHODS = ("toggle_device", "update_option", "remove_device")
+STORE_FUNCTIONS = ("save_smart_homes", "load_smart_homes")
+
+
+class MetricsRegistry:
+    """
+    A registry of operation counters and latency histograms.
+    
+    Each series is labelled with an operation and a device type; counts and
+    latencies are exported in the Prometheus text format.
+    """
+    
+    def __init__(self):
+        """Initialize an empty MetricsRegistry."""
+        self.__lock = threading.Lock()
+        self.__counts = {}
+        self.__buckets = {}
+        self.__sums = {}
+    
+    def observe(self, operation, device_type, seconds):
+        """
+        Record one operation and its latency.
+        
+        Args:
+            operation (str): The operation name, e.g. "toggle_device".
+            device_type (str): The device type label, e.g. "SmartPlug".
+            seconds (float): How long the operation took.
+        """
+        key = (operation, device_type)
+        with self.__lock:
+            if key not in self.__counts:
+                self.__counts[key] = 0
+                self.__buckets[key] = [0] * (len(BUCKETS) + 1)
+                self.__sums[key] = 0.0
+            self.__counts[key] += 1
+            self.__buckets[key][bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.__sums[key] += seconds
+    
+    def count(self, operation, device_type):
+        """
+        Get the number of recorded operations.
+        
+        Args:
+            operation (str): The operation name.
+            device_type (str): The device type label.
+        
+        Returns:
+            int: The number of times the operation was recorded.
+        """
+        return self.__counts.get((operation, device_type), 0)
+    
+    def reset(self):
+        """Discard every recorded metric."""
+        with self.__lock:
+            self.__counts.clear()
+            self.__buckets.clear()
+            self.__sums.clear()
+    
+    def to_prometheus(self):
+        """
+        Export the metrics in the Prometheus text exposition format.
+        
+        Returns:
+            str: The smart_home_operations_total counters and
+            smart_home_operation_seconds histograms.
+        """
+        with self.__lock:
+            keys = sorted(self.__counts)
+            lines = [
+                "# HELP smart_home_operations_total Number of SmartHome operations.",
+                "# TYPE smart_home_operations_total counter",
+            ]
+            for operation, device_type in keys:
+                labels = f'operation="{operation}",device_type="{device_type}"'
+                lines.append(f"smart_home_operations_total{{{labels}}} {self.__counts[(operation, device_type)]}")
+            
+            lines.append("# HELP smart_home_operation_seconds Latency of SmartHome operations.")
+            lines.append("# TYPE smart_home_operation_seconds histogram")
+            for operation, device_type in keys:
+                key = (operation, device_type)
+                labels = f'operation="{operation}",device_type="{device_type}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), self.__buckets[key]):
+                    cumulative += count
+                    lines.append(f'smart_home_operation_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"smart_home_operation_seconds_sum{{{labels}}} {self.__sums[key]}")
+                lines.append(f"smart_home_operation_seconds_count{{{labels}}} {self.__counts[key]}")
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path):
+        """
+        Atomically write the metrics to a file, e.g. for a textfile collector.
+        
+        Args:
+            path (str): The file to write.
+        """
+        atomic_write_text(path, self.to_prometheus())
+
+
+_originals = {}
+_wrappers = {}
+
+
+def _timed_indexed(registry, operation, method):
+    """Wrap a SmartHome method taking a device index."""
+    @functools.wraps(method)
+    def wrapper(self, index, *args, **kwargs):
+        try:
+            device_type = type(self.get_device(index)).__name__
+        except IndexError:
+            device_type = "unknown"
+        start = time.perf_counter()
+        try:
+            return method(self, index, *args, **kwargs)
+        finally:
+            registry.observe(operation, device_type, time.perf_counter() - start)
+    return wrapper
+
+
+def _timed(registry, operation, function, device_type):
+    """Wrap a function so that every call is counted and timed."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        label = device_type(args) if callable(device_type) else device_type
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            registry.observe(operation, label, time.perf_counter() - start)
+    return wrapper
+
+
+def instrument(registry):
+    """
+    Start recording SmartHome operations and store loads/saves.
+    
+    Instrumentation works by wrapping the SmartHome methods and the store
+    functions, so there is no overhead at all while it is disabled. Modules
+    that imported the store functions by name are re-pointed as well, and
+    uninstrument() also restores modules that imported the wrapped functions
+    while instrumentation was enabled.
+    
+    Args:
+        registry (MetricsRegistry): Where the metrics are recorded.
+    
+    Raises:
+        RuntimeError: If instrumentation is already enabled.
+    """
+    if _originals:
+        raise RuntimeError("Instrumentation is already enabled")
+    
+    for name in INDEXED_METHODS:
+        _originals[(SmartHome, name)] = getattr(SmartHome, name)
+        setattr(SmartHome, name, _timed_indexed(registry, name, getattr(SmartHome, name)))
+    _originals[(SmartHome, "add_device")] = SmartHome.add_device
+    SmartHome.add_device = _timed(
+        registry, "add_device", SmartHome.add_device, lambda args: type(args[1]).__name__
+    )
+    for name in ("switch_all_on", "switch_all_off"):
+        _originals[(SmartHome, name)] = getattr(SmartHome, name)
+        setattr(SmartHome, name, _timed(registry, name, getattr(SmartHome, name), "all"))
+    
+    for name in STORE_FUNCTIONS:
+        original = getattr(smart_homes_store, name)
+        wrapped = _timed(registry, name, original, "all")
+        _wrappers[name] = (original, wrapped)
+        for module in list(sys.modules.values()):
+            if getattr(module, name, None) is original:
+                _originals[(module, name)] = original
+                setattr(module, name, wrapped)
+
+
+def uninstrument():
+    """Stop recording and restore the original methods and functions."""
+    while _originals:
+        (owner, name), original = _originals.popitem()
+        setattr(owner, name, original)
+    while _wrappers:
+        name, (original, wrapped) = _wrappers.popitem()
+        for module in list(sys.modules.values()):
+            if getattr(module, name, None) is wrapped:
+                setattr(module, name, original)
+
+
+def is_instrumented():
+    """
+    Check whether instrumentation is enabled.
+    
+    Returns:
+        bool: True if instrument() is in effect.
+    """
+    return bool(_originals)
+
+
+def serve_metrics(registry, host="127.0.0.1", port=9100):
+    """
+    Serve the metrics over HTTP on a background thread.
+    
+    Args:
+        registry (MetricsRegistry): The metrics to serve.
+        host (str, optional): The interface to listen on. Defaults to "127.0.0.1".
+        port (int, optional): The port to listen on (0 picks a free port).
+            Defaults to 9100.
+    
+    Returns:
+        ThreadingHTTPServer: The running server; call shutdown() to stop it.
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@contextmanager
+def profile_session(prefix, memory=True, top=25):
+    """
+    Profile the enclosed code with cProfile and, optionally, tracemalloc.
+    
+    On exit the CPU profile is dumped to "<prefix>.prof" (readable with
+    pstats or snakeviz), and the largest allocation sites are written to
+    "<prefix>.memory.txt".
+    
+    Args:
+        prefix (str): The path prefix of the output files.
+        memory (bool, optional): Whether to trace memory allocations.
+            Defaults to True.
+        top (int, optional): Number of allocation sites to report. Defaults to 25.
+    
+    Yields:
+        cProfile.Profile: The active profiler.
+    """
+    profiler = cProfile.Profile()
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{prefix}.prof")
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            with open(f"{prefix}.memory.txt", "w") as file:
+                for stat in snapshot.statistics("lineno")[:top]:
+                    file.write(f"{stat}\n")
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import threading
+from change_stream import ChangeStream
+from device_types import device_type_for_code, device_type_of
+from snapshot_archive import snapshot_state, state_to_homes
+
+# Longest message a replica accepts; snapshots are sent as a single line
+MAX_MESSAGE_SIZE = 1 << 28
+
+
+def _encode_message(message):
+    """Encode a replication message as a line of compact JSON."""
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class OpLog(ChangeStream):
+    """
+    A change stream recording enough to replay every change on a replica.
+    
+    The changes are those of ChangeStream, except that the value of an
+    "added" change is the [type code, option value, switched on] of the new
+    device rather than only its type name.
+    """
+    
+    def _record(self, home_id, events):
+        """
+        Append the changes from a batch of device events.
+        
+        Args:
+            home_id: The id of the home the events came from.
+            events (list): The DeviceEvent objects to record.
+        """
+        described = []
+        for event in events:
+            if event.field == "added":
+                device_type = device_type_of(event.device)
+                if device_type is not None:
+                    event = event._replace(value=[
+                        device_type.code, device_type.get_option(event.device), event.device.switched_on
+                    ])
+            described.append(event)
+        super()._record(home_id, described)
+
+
+def apply_change(smart_homes, change):
+    """
+    Replay a change from an OpLog on a list of smart homes.
+    
+    Switch and option changes carry the new value and are applied as such,
+    so replaying one twice has no further effect.
+    
+    Args:
+        smart_homes (list): The smart homes, by home id.
+        change: The [seq, home, device, field, value] change.
+    
+    Raises:
+        IndexError: If the home or device index is out of range.
+        ValueError: If the change cannot be applied to the device.
+    """
+    _, home_id, index, field, value = change
+    home = smart_homes[home_id]
+    if field == "switched_on":
+        if home.get_device(index).switched_on != value:
+            home.toggle_device(index)
+    elif field == "added":
+        if not isinstance(value, list):
+            raise ValueError(f"Cannot replicate a device of unregistered type {value}")
+        code, option, switched_on = value
+        home.insert_device(index, device_type_for_code(code).create(option, switched_on))
+    elif field == "removed":
+        home.remove_device(index)
+    else:
+        home.update_option(index, value)
+
+
+class ReplicationPrimary:
+    """
+    Streams the changes of a set of smart homes to replicas over TCP.
+    
+    Each replica sends the sequence number it has applied up to. If the op
+    log still holds every change after it, the replica receives just those
+    changes; otherwise, or if it has no state yet, it first receives a
+    snapshot of every home and the sequence number the snapshot is at.
+    Afterwards changes are pushed in batches as they happen, so bandwidth
+    and lag follow the rate of change rather than the size of the fleet.
+    
+    Messages are lines of JSON: {"snapshot": state, "capacities": [max
+    items of each home], "seq": n} and
+    {"changes": [[seq, home, device, field, value], ...], "head": n}.
+    
+    Home ids are indices into the smart_homes list, as in the API server.
+    
+    Attributes:
+        smart_homes (list): The replicated smart homes.
+        log (OpLog): The op log of the homes.
+        lock (threading.RLock): Held while a snapshot is taken; code
+            changing the homes from other threads should hold it too, so
+            every snapshot matches its sequence number.
+        host (str): The interface to listen on.
+        port (int): The port to listen on (0 picks a free port).
+    """
+    
+    def __init__(self, smart_homes, host="127.0.0.1", port=0, capacity=10000, batch_size=1000):
+        """
+        Initialize the primary and start recording the homes' changes.
+        
+        Args:
+            smart_homes (list): The smart homes to replicate.
+            host (str, optional): The interface to listen on. Defaults to "127.0.0.1".
+            port (int, optional): The port to listen on. Defaults to 0.
+            capacity (int, optional): Changes retained for catching up
+                without a snapshot. Defaults to 10000.
+            batch_size (int, optional): Maximum changes per message.
+                Defaults to 1000.
+        """
+        self.smart_homes = smart_homes
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size
+        self.lock = threading.RLock()
+        self.log = OpLog(capacity)
+        for i, home in enumerate(smart_homes):
+            self.log.watch(i, home)
+        self._server = None
+        self._loop = None
+        self._changed = None
+    
+    async def start(self):
+        """Start listening for replicas."""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.log.subscribe(self._on_change)
+        self._server = await asyncio.start_server(self._handle_replica, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def close(self):
+        """Stop listening and disconnect the replicas."""
+        if self._server is not None:
+            server, self._server = self._server, None
+            self.log.unsubscribe(self._on_change)
+            server.close()
+            self._wake_waiters()
+            await server.wait_closed()
+    
+    def _on_change(self, last_seq):
+        """Wake the replica connections; safe to call from any thread."""
+        self._loop.call_soon_threadsafe(self._wake_waiters)
+    
+    def _wake_waiters(self):
+        """Release every connection waiting for changes."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    def snapshot(self):
+        """
+        Take a snapshot of every home.
+        
+        Returns:
+            tuple: The state, as returned by snapshot_state(), the
+            max_items of each home, and the sequence number of the last
+            change the state includes.
+        """
+        with self.lock:
+            capacities = [home.max_items for home in self.smart_homes]
+            return snapshot_state(self.smart_homes), capacities, self.log.last_seq
+    
+    async def _handle_replica(self, reader, writer):
+        """
+        Stream changes to one replica until it disconnects or the primary closes.
+        
+        Args:
+            reader: The asyncio stream reader.
+            writer: The asyncio stream writer.
+        """
+        try:
+            cursor = json.loads(await reader.readline())["since"]
+            reset = False
+            if cursor is not None:
+                _, _, reset = self.log.changes_since(cursor, 0)
+            while self._server is not None:
+                if cursor is None or reset:
+                    state, capacities, cursor = self.snapshot()
+                    writer.write(_encode_message({"snapshot": state, "capacities": capacities, "seq": cursor}))
+                changes, cursor, reset = self.log.changes_since(cursor, self.batch_size)
+                if changes and not reset:
+                    writer.write(_encode_message({
+                        "changes": [list(change) for change in changes], "head": self.log.last_seq,
+                    }))
+                await writer.drain()
+                if cursor == self.log.last_seq and not reset:
+                    await self._changed.wait()
+        except (ConnectionError, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            writer.close()
+
+
+class ReplicationReplica:
+    """
+    A hot standby applying the changes streamed by a ReplicationPrimary.
+    
+    The replica can start empty, from a snapshot of its own (for example a
+    store loaded from a copy of the primary's), or resume after a
+    disconnect; it tells the primary the sequence number it has applied up
+    to and catches up from there.
+    
+    Attributes:
+        smart_homes (list): The replicated smart homes; the list is updated
+            in place when a snapshot arrives.
+        last_seq (int): The sequence number of the last applied change, or
+            None before the first snapshot.
+        head (int): The latest sequence number the primary has reported.
+        bytes_received (int): Bytes received from the primary.
+        snapshots (int): Snapshots received from the primary.
+    """
+    
+    def __init__(self, host, port, smart_homes=None, last_seq=None):
+        """
+        Initialize the replica.
+        
+        Args:
+            host (str): The primary's host.
+            port (int): The primary's port.
+            smart_homes (list, optional): Homes to resume from. Defaults to
+                none, requesting a snapshot.
+            last_seq (int, optional): The sequence number smart_homes are
+                at. Defaults to None, requesting a snapshot.
+        """
+        self.host = host
+        self.port = port
+        self.smart_homes = [] if smart_homes is None else smart_homes
+        self.last_seq = last_seq if smart_homes is not None else None
+        self.head = last_seq or 0
+        self.bytes_received = 0
+        self.snapshots = 0
+        self._applied = None
+    
+    @property
+    def lag(self):
+        """The number of changes the primary has reported but not yet applied."""
+        return max(self.head - (self.last_seq or 0), 0)
+    
+    def _apply_message(self, message):
+        """Apply a snapshot or a batch of changes."""
+        if "snapshot" in message:
+            self.smart_homes[:] = state_to_homes(message["snapshot"], message.get("capacities"))
+            self.last_seq = self.head = message["seq"]
+            self.snapshots += 1
+        else:
+            for change in message["changes"]:
+                apply_change(self.smart_homes, change)
+                self.last_seq = change[0]
+            self.head = message["head"]
+        self._applied.set()
+        self._applied = asyncio.Event()
+    
+    async def run(self):
+        """
+        Connect to the primary and apply its changes until it disconnects.
+        
+        Raises:
+            ConnectionError: If the primary cannot be reached.
+            ValueError: If a change cannot be applied, in which case the
+                replica has diverged and should be restarted without state.
+        """
+        if self._applied is None:
+            self._applied = asyncio.Event()
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_MESSAGE_SIZE)
+        try:
+            writer.write(_encode_message({"since": self.last_seq}))
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.bytes_received += len(line)
+                self._apply_message(json.loads(line))
+        finally:
+            writer.close()
+    
+    async def wait_for(self, seq, timeout=None):
+        """
+        Wait until the replica has applied the changes up to a sequence number.
+        
+        Args:
+            seq (int): The sequence number to wait for.
+            timeout (float, optional): Maximum seconds to wait. Defaults to
+                waiting indefinitely.
+        
+        Raises:
+            asyncio.TimeoutError: If the timeout expires first.
+        """
+        async def caught_up():
+            while self.last_seq is None or self.last_seq < seq:
+                await self._applied.wait()
+        
+        if self._applied is None:
+            self._applied = asyncio.Event()
+        await asyncio.wait_for(caught_up(), timeout)
@@ -0,0 +1,357 @@
+import operator
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+class Aggregate:
+    """
+    A per-home aggregate over the devices of a smart home.
+    
+    Aggregates are maintained incrementally by the RuleEngine: each device
+    contributes a value, and only the contribution of a changed device is
+    recomputed when it fires an event. Comparing an aggregate with a number
+    builds a Condition, e.g. Total("consumption_rate", on_only=True) > 1000.
+    
+    Attributes:
+        key (tuple): Identifies the aggregate so rules can share it.
+        fields (set): The device event fields the aggregate depends on.
+    """
+    
+    def __init__(self, reducer, attribute=None, device_type=None, on_only=False):
+        """
+        Initialize an Aggregate.
+        
+        Args:
+            reducer (str): "sum" to add up the attribute, "count" to count devices.
+            attribute (str, optional): The device attribute to add up.
+            device_type (str, optional): Only include devices of this class name.
+            on_only (bool, optional): Only include devices that are switched on.
+        """
+        self.reducer = reducer
+        self.attribute = attribute
+        self.device_type = device_type
+        self.on_only = on_only
+        self.key = (reducer, attribute, device_type, on_only)
+        self.fields = {"added", "removed"}
+        if attribute is not None:
+            self.fields.add(attribute)
+        if on_only:
+            self.fields.add("switched_on")
+    
+    def contribution(self, device):
+        """
+        Compute what a single device contributes to the aggregate.
+        
+        Args:
+            device: The smart device.
+        
+        Returns:
+            int: The device's contribution (0 if it does not match).
+        """
+        if self.device_type is not None and type(device).__name__ != self.device_type:
+            return 0
+        if self.on_only and not device.switched_on:
+            return 0
+        if self.reducer == "count":
+            return 1
+        return getattr(device, self.attribute, 0)
+    
+    def _compare(self, symbol, threshold):
+        """Build a Condition comparing this aggregate with a threshold."""
+        return Condition([(self, symbol, threshold)])
+    
+    def __gt__(self, threshold):
+        """Build the condition aggregate > threshold."""
+        return self._compare(">", threshold)
+    
+    def __ge__(self, threshold):
+        """Build the condition aggregate >= threshold."""
+        return self._compare(">=", threshold)
+    
+    def __lt__(self, threshold):
+        """Build the condition aggregate < threshold."""
+        return self._compare("<", threshold)
+    
+    def __le__(self, threshold):
+        """Build the condition aggregate <= threshold."""
+        return self._compare("<=", threshold)
+
+
+class Total(Aggregate):
+    """An aggregate adding up a device attribute, e.g. Total("consumption_rate")."""
+    
+    def __init__(self, attribute, device_type=None, on_only=False):
+        """
+        Initialize a Total.
+        
+        Args:
+            attribute (str): The attribute to add up, e.g. "consumption_rate".
+            device_type (str, optional): Only include devices of this class name.
+            on_only (bool, optional): Only include devices that are switched on.
+        """
+        super().__init__("sum", attribute, device_type, on_only)
+
+
+class Count(Aggregate):
+    """An aggregate counting devices, e.g. Count("SmartOven", on_only=True)."""
+    
+    def __init__(self, device_type=None, on_only=False):
+        """
+        Initialize a Count.
+        
+        Args:
+            device_type (str, optional): Only count devices of this class name.
+            on_only (bool, optional): Only count devices that are switched on.
+        """
+        super().__init__("count", None, device_type, on_only)
+
+
+class Condition:
+    """
+    A conjunction of comparisons between aggregates and thresholds.
+    
+    Conditions are combined with &, and compiled into a single predicate
+    over the current aggregate values of a home.
+    
+    Attributes:
+        terms (list): The (aggregate, operator symbol, threshold) comparisons.
+    """
+    
+    def __init__(self, terms):
+        """
+        Initialize a Condition.
+        
+        Args:
+            terms (list): The (aggregate, operator symbol, threshold) comparisons.
+        """
+        self.terms = terms
+    
+    def __and__(self, other):
+        """Combine two conditions so that both must hold."""
+        return Condition(self.terms + other.terms)
+    
+    def compile(self):
+        """
+        Compile the condition into a predicate.
+        
+        Returns:
+            A callable taking a dict of aggregate key to value and returning
+            whether every comparison holds.
+        """
+        checks = [(aggregate.key, OPERATORS[symbol], threshold)
+                  for aggregate, symbol, threshold in self.terms]
+        if len(checks) == 1:
+            key, compare, threshold = checks[0]
+            return lambda values: compare(values[key], threshold)
+        return lambda values: all(compare(values[key], threshold) for key, compare, threshold in checks)
+
+
+class _HomeState:
+    """
+    The incrementally maintained aggregates and rule states of one home.
+    
+    Attributes:
+        contributions (dict): Per-device contributions for each aggregate key.
+        values (dict): The current value of each aggregate key.
+        active (set): Names of the rules whose condition currently holds.
+        listener: The listener registered with the home.
+    """
+    
+    def __init__(self, home, aggregates):
+        """
+        Compute the initial aggregates of a home with a single scan.
+        
+        Args:
+            home (SmartHome): The smart home.
+            aggregates (dict): The aggregates to maintain, by key.
+        """
+        self.contributions = {}
+        self.values = {}
+        self.active = set()
+        self.listener = None
+        for aggregate in aggregates.values():
+            self.add_aggregate(home, aggregate)
+    
+    def add_aggregate(self, home, aggregate):
+        """
+        Start maintaining a new aggregate for the home.
+        
+        Args:
+            home (SmartHome): The smart home.
+            aggregate (Aggregate): The aggregate to add.
+        """
+        contributions = [aggregate.contribution(home.get_device(i)) for i in range(len(home))]
+        self.contributions[aggregate.key] = contributions
+        self.values[aggregate.key] = sum(contributions)
+
+
+class RuleEngine:
+    """
+    An automation engine evaluating rules incrementally on device events.
+    
+    Each rule's condition is compiled into a predicate over per-home
+    aggregates. Aggregates are indexed by the device fields they read, and
+    rules by the aggregates they use, so a device event only updates the
+    affected aggregates by the changed device's delta and re-evaluates the
+    rules that read them. Evaluation cost is proportional to the change,
+    not to the size of the home or fleet.
+    
+    Rules are edge-triggered: the action runs when the condition becomes
+    true for a home, and again only after it has become false in between.
+    Actions triggered by a change run once every listener of the home has
+    seen that change, so listeners registered after the engine, such as a
+    change stream or a command journal, receive changes in order.
+    """
+    
+    def __init__(self):
+        """Initialize a RuleEngine with no rules or homes."""
+        self.__rules = {}
+        self.__aggregates = {}
+        self.__aggregates_by_field = {}
+        self.__rules_by_aggregate = {}
+        self.__homes = {}
+    
+    def add_rule(self, name, condition, action):
+        """
+        Add a rule and evaluate it against every watched home.
+        
+        Args:
+            name (str): The unique name of the rule.
+            condition (Condition): When the rule fires.
+            action: A callable taking the SmartHome the condition became true for.
+        
+        Raises:
+            ValueError: If a rule with this name already exists.
+        """
+        if name in self.__rules:
+            raise ValueError(f"A rule named {name} already exists")
+        self.__rules[name] = (condition.compile(), action)
+        
+        for aggregate, _, _ in condition.terms:
+            if aggregate.key not in self.__aggregates:
+                self.__aggregates[aggregate.key] = aggregate
+                for field in aggregate.fields:
+                    self.__aggregates_by_field.setdefault(field, []).append(aggregate)
+                for home, state in self.__homes.values():
+                    state.add_aggregate(home, aggregate)
+            self.__rules_by_aggregate.setdefault(aggregate.key, set()).add(name)
+        
+        for home, state in list(self.__homes.values()):
+            self._evaluate(home, state, [name])
+    
+    def remove_rule(self, name):
+        """
+        Remove a rule.
+        
+        Args:
+            name (str): The name of the rule.
+        
+        Raises:
+            KeyError: If no rule has this name.
+        """
+        del self.__rules[name]
+        for names in self.__rules_by_aggregate.values():
+            names.discard(name)
+        for home, state in self.__homes.values():
+            state.active.discard(name)
+    
+    def watch(self, home):
+        """
+        Start evaluating the rules against a smart home.
+        
+        Args:
+            home (SmartHome): The smart home to watch.
+        """
+        state = _HomeState(home, self.__aggregates)
+        listener = lambda events: self._on_events(home, state, events)
+        self.__homes[id(home)] = (home, state)
+        state.listener = listener
+        home.add_listener(listener)
+        self._evaluate(home, state, list(self.__rules))
+    
+    def unwatch(self, home):
+        """
+        Stop evaluating the rules against a smart home.
+        
+        Args:
+            home (SmartHome): The smart home to stop watching.
+        
+        Raises:
+            KeyError: If the home is not being watched.
+        """
+        home, state = self.__homes.pop(id(home))
+        home.remove_listener(state.listener)
+    
+    def value(self, home, aggregate):
+        """
+        Get the current value of an aggregate used by a rule for a home.
+        
+        Args:
+            home (SmartHome): A watched smart home.
+            aggregate (Aggregate): An aggregate used by one of the rules.
+        
+        Returns:
+            int: The current value of the aggregate.
+        """
+        return self.__homes[id(home)][1].values[aggregate.key]
+    
+    def _on_events(self, home, state, events):
+        """
+        Update the affected aggregates and re-evaluate the affected rules.
+        
+        Args:
+            home (SmartHome): The home the events came from.
+            state (_HomeState): The home's aggregate state.
+            events (list): The DeviceEvent objects.
+        """
+        touched = set()
+        for event in events:
+            for aggregate in self.__aggregates_by_field.get(event.field, ()):
+                key = aggregate.key
+                contributions = state.contributions[key]
+                if event.field == "added":
+                    new = aggregate.contribution(event.device)
+                    contributions.insert(event.index, new)
+                    state.values[key] += new
+                elif event.field == "removed":
+                    state.values[key] -= contributions.pop(event.index)
+                else:
+                    new = aggregate.contribution(event.device)
+                    state.values[key] += new - contributions[event.index]
+                    contributions[event.index] = new
+                touched.add(key)
+        
+        names = set()
+        for key in touched:
+            names.update(self.__rules_by_aggregate.get(key, ()))
+        if names:
+            self._evaluate(home, state, sorted(names))
+    
+    def _evaluate(self, home, state, names):
+        """
+        Evaluate rules for a home and run the actions of newly true rules,
+        deferred until the home has finished notifying its listeners.
+        
+        Args:
+            home (SmartHome): The home to evaluate.
+            state (_HomeState): The home's aggregate state.
+            names (list): The names of the rules to evaluate.
+        """
+        triggered = []
+        for name in names:
+            if name not in self.__rules:
+                continue
+            predicate, action = self.__rules[name]
+            if predicate(state.values):
+                if name not in state.active:
+                    state.active.add(name)
+                    triggered.append(action)
+            else:
+                state.active.discard(name)
+        for action in triggered:
+            home.defer(lambda action=action: action(home))
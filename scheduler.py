@@ -0,0 +1,290 @@
+import csv
+import heapq
+import io
+import threading
+import time
+from datetime import datetime, timedelta
+from smart_homes_store import atomic_write_text
+
+ACTIONS = ("toggle", "on", "off", "option")
+
+# Repeat interval of actions recurring at the same local time every day
+DAILY = "daily"
+
+
+def next_daily(hour, minute=0, now=None):
+    """
+    Get the timestamp of the next occurrence of a local time of day.
+    
+    Args:
+        hour (int): The hour of the day (0-23).
+        minute (int, optional): The minute of the hour (0-59). Defaults to 0.
+        now (float, optional): The current timestamp. Defaults to time.time().
+    
+    Returns:
+        float: The timestamp of the next occurrence, strictly after now.
+    """
+    current = datetime.fromtimestamp(time.time() if now is None else now)
+    target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= current:
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+class Scheduler:
+    """
+    A scheduler for timed actions against the devices of smart homes.
+    
+    Pending actions are kept in a binary heap ordered by due time, so each
+    tick only looks at the actions that are due: checking an idle tick is
+    O(1) and firing k actions is O(k log n), whatever the number n of
+    pending actions. Cancelled actions are dropped lazily when they reach
+    the top of the heap.
+    
+    The heap is guarded by a lock, so actions can be scheduled and
+    cancelled from other threads while run() ticks in the background.
+    Actions are applied outside the lock.
+    
+    Supported actions are "toggle", "on", "off" and "option" (which sets
+    the device's consumption rate, temperature or setting to the value).
+    
+    Attributes:
+        smart_homes (list): The smart homes the actions apply to.
+        clock: A callable returning the current timestamp.
+    """
+    
+    def __init__(self, smart_homes, clock=time.time):
+        """
+        Initialize an empty Scheduler.
+        
+        Args:
+            smart_homes (list): The smart homes the actions apply to.
+            clock (optional): A callable returning the current timestamp.
+                Defaults to time.time.
+        """
+        self.smart_homes = smart_homes
+        self.clock = clock
+        self.__heap = []
+        self.__pending = set()
+        self.__next_id = 1
+        self.__lock = threading.Lock()
+    
+    def __len__(self):
+        """
+        Return the number of pending actions.
+        
+        Returns:
+            int: The number of scheduled, not cancelled actions.
+        """
+        return len(self.__pending)
+    
+    def schedule(self, when, home_index, device_index, action, value=None, every=None):
+        """
+        Schedule an action against a device.
+        
+        Args:
+            when (float): The timestamp at which the action is due.
+            home_index (int): The index of the smart home.
+            device_index (int): The index of the device in the home.
+            action (str): One of "toggle", "on", "off" or "option".
+            value (int, optional): The new option value for "option" actions.
+            every (optional): Repeat interval in seconds for recurring
+                actions, or DAILY to repeat at the same local time of day,
+                which follows daylight saving time changes. Defaults to a
+                one-off action.
+        
+        Returns:
+            int: The id of the scheduled action.
+        
+        Raises:
+            ValueError: If the action, value or interval is invalid.
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Action must be one of {', '.join(ACTIONS)}")
+        if action == "option" and not isinstance(value, int):
+            raise ValueError("Option actions need an integer value")
+        if every is not None and every != DAILY and (not isinstance(every, (int, float)) or every <= 0):
+            raise ValueError(f"Repeat interval must be positive or {DAILY}")
+        with self.__lock:
+            action_id = self.__next_id
+            self.__next_id += 1
+            self.__pending.add(action_id)
+            heapq.heappush(
+                self.__heap,
+                (when, action_id, home_index, device_index, action, value, every)
+            )
+        return action_id
+    
+    def cancel(self, action_id):
+        """
+        Cancel a pending action.
+        
+        Args:
+            action_id (int): The id returned by schedule().
+        
+        Raises:
+            KeyError: If no pending action has this id.
+        """
+        with self.__lock:
+            if action_id not in self.__pending:
+                raise KeyError(f"No pending action with id {action_id}")
+            self.__pending.remove(action_id)
+    
+    def next_due(self):
+        """
+        Get the due time of the earliest pending action.
+        
+        Returns:
+            float: The earliest due timestamp, or None if nothing is pending.
+        """
+        with self.__lock:
+            self._drop_cancelled()
+            return self.__heap[0][0] if self.__heap else None
+    
+    def _drop_cancelled(self):
+        """Pop cancelled actions off the top of the heap; the lock must be held."""
+        while self.__heap and self.__heap[0][1] not in self.__pending:
+            heapq.heappop(self.__heap)
+    
+    def _apply(self, home_index, device_index, action, value):
+        """
+        Apply an action to a device.
+        
+        Args:
+            home_index (int): The index of the smart home.
+            device_index (int): The index of the device in the home.
+            action (str): The action to apply.
+            value (int): The option value for "option" actions.
+        
+        Raises:
+            IndexError: If the home or device index is out of range.
+            ValueError: If the option value is invalid for the device.
+        """
+        if home_index < 0 or home_index >= len(self.smart_homes):
+            raise IndexError("Smart home index out of range")
+        home = self.smart_homes[home_index]
+        if action == "option":
+            home.update_option(device_index, value)
+        elif action == "toggle" or home.get_device(device_index).switched_on != (action == "on"):
+            home.toggle_device(device_index)
+    
+    def tick(self, now=None):
+        """
+        Fire every action that is due.
+        
+        Recurring actions are rescheduled at their next occurrence after
+        now; occurrences missed while the scheduler was not ticking are
+        skipped rather than fired in a burst. DAILY actions recur at the
+        local time of day they were first due, found with next_daily().
+        
+        Args:
+            now (float, optional): The current timestamp. Defaults to the clock.
+        
+        Returns:
+            tuple: The list of fired action ids and a list of
+            (action_id, error message) pairs for actions that failed.
+        """
+        now = self.clock() if now is None else now
+        due = []
+        rescheduled = []
+        with self.__lock:
+            heap = self.__heap
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)
+                when, action_id, _, _, _, _, every = entry
+                if action_id not in self.__pending:
+                    continue
+                due.append(entry)
+                if every is None:
+                    self.__pending.discard(action_id)
+                elif every == DAILY:
+                    local = datetime.fromtimestamp(when)
+                    rescheduled.append((next_daily(local.hour, local.minute, now),) + entry[1:])
+                else:
+                    missed = int((now - when) // every) + 1
+                    rescheduled.append((when + missed * every,) + entry[1:])
+            for entry in rescheduled:
+                heapq.heappush(heap, entry)
+        
+        fired = []
+        errors = []
+        for _, action_id, home_index, device_index, action, value, _ in due:
+            try:
+                self._apply(home_index, device_index, action, value)
+                fired.append(action_id)
+            except (IndexError, ValueError, AttributeError) as e:
+                errors.append((action_id, str(e)))
+        return fired, errors
+    
+    def run(self, stop_event, interval=1.0):
+        """
+        Tick repeatedly until the stop event is set.
+        
+        Args:
+            stop_event (threading.Event): The event that stops the loop.
+            interval (float, optional): Seconds between ticks. Defaults to 1.0.
+        """
+        while not stop_event.is_set():
+            self.tick()
+            stop_event.wait(interval)
+    
+    def save(self, path):
+        """
+        Atomically save the pending actions to a CSV file.
+        
+        Args:
+            path (str): The file to write.
+        """
+        with self.__lock:
+            self._drop_cancelled()
+            entries = [entry for entry in sorted(self.__heap) if entry[1] in self.__pending]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["when", "id", "home", "device", "action", "value", "every"])
+        for entry in entries:
+            writer.writerow(["" if field is None else field for field in entry])
+        atomic_write_text(path, buffer.getvalue())
+    
+    def load(self, path):
+        """
+        Load pending actions from a CSV file written by save().
+        
+        The actions are added to those already pending and keep their ids.
+        Ids are never reused, so later actions get ids after both the loaded
+        ones and any this scheduler has handed out, including cancelled ones.
+        
+        Args:
+            path (str): The file to read.
+        
+        Raises:
+            ValueError: If a row is malformed or a loaded id is already in
+                use by this scheduler or repeated in the file.
+        """
+        with open(path, "r", newline="") as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            entries = []
+            for row in reader:
+                if len(row) != 7 or row[4] not in ACTIONS:
+                    raise ValueError(f"Malformed schedule row: {row}")
+                entries.append((
+                    float(row[0]),
+                    int(row[1]),
+                    int(row[2]),
+                    int(row[3]),
+                    row[4],
+                    int(row[5]) if row[5] else None,
+                    DAILY if row[6] == DAILY else float(row[6]) if row[6] else None,
+                ))
+        loaded_ids = [entry[1] for entry in entries]
+        if len(set(loaded_ids)) != len(loaded_ids):
+            raise ValueError("Schedule file repeats an action id")
+        with self.__lock:
+            used = self.__pending.union(entry[1] for entry in self.__heap)
+            clashes = used.intersection(loaded_ids)
+            if clashes:
+                raise ValueError(f"Action ids already in use: {sorted(clashes)}")
+            self.__heap.extend(entries)
+            heapq.heapify(self.__heap)
+            self.__pending.update(loaded_ids)
+            self.__next_id = max(self.__next_id, max(loaded_ids, default=0) + 1)
@@ -0,0 +1,453 @@
+import multiprocessing
+import queue
+from collections import namedtuple
+from multiprocessing import shared_memory
+from device_types import device_type_of, device_type_for_code, from_columns
+from smart_home import SmartHome
+
+# What another process needs to attach to a shared fleet
+FleetSpec = namedtuple("FleetSpec", ["name", "home_count", "device_count"])
+
+
+class SharedFleet:
+    """
+    The device state of a fleet held as columns in shared memory.
+    
+    The block holds, in order, the device offset of each home (int64, one
+    more than the number of homes), the option values (int32), the type
+    codes (uint8) and the switch states (uint8). Any process can attach
+    to the block by its spec and read the columns as memoryviews without
+    copying them.
+    
+    Attributes:
+        spec (FleetSpec): The name and sizes of the shared block.
+        offsets (memoryview): Device row where each home starts.
+        values (memoryview): The option value of each device.
+        codes (memoryview): The type code of each device.
+        states (memoryview): 1 for each device that is switched on, else 0.
+    """
+    
+    def __init__(self, spec, create=False):
+        """
+        Create or attach to the shared block of a fleet.
+        
+        Use SharedFleet.create() to share a fleet of SmartHome objects.
+        
+        Args:
+            spec (FleetSpec): The name and sizes of the block.
+            create (bool, optional): Whether to create the block rather than
+                attach to an existing one. Defaults to False.
+        """
+        homes, devices = spec.home_count, spec.device_count
+        size = 8 * (homes + 1) + 4 * devices + 2 * devices
+        self.__memory = shared_memory.SharedMemory(spec.name, create=create, size=max(size, 1))
+        self.spec = FleetSpec(self.__memory.name, homes, devices)
+        buffer = self.__memory.buf
+        position = 8 * (homes + 1)
+        self.offsets = buffer[:position].cast("q")
+        self.values = buffer[position:position + 4 * devices].cast("i")
+        position += 4 * devices
+        self.codes = buffer[position:position + devices].cast("B")
+        self.states = buffer[position + devices:position + 2 * devices].cast("B")
+    
+    @classmethod
+    def create(cls, smart_homes):
+        """
+        Copy the devices of a fleet into a new shared block.
+        
+        Args:
+            smart_homes (list): The smart homes to share.
+        
+        Returns:
+            SharedFleet: The shared fleet; the caller owns the block and
+            should call unlink() when done.
+        
+        Raises:
+            ValueError: If a device type is not registered.
+        """
+        device_count = sum(len(home) for home in smart_homes)
+        fleet = cls(FleetSpec(None, len(smart_homes), device_count), create=True)
+        row = 0
+        for number, home in enumerate(smart_homes):
+            fleet.offsets[number] = row
+            for i in range(len(home)):
+                device = home.get_device(i)
+                device_type = device_type_of(device)
+                if device_type is None:
+                    raise ValueError(f"Unknown device type: {type(device).__name__}")
+                fleet.codes[row] = device_type.code
+                fleet.values[row] = device_type.get_option(device)
+                fleet.states[row] = 1 if device.switched_on else 0
+                row += 1
+        fleet.offsets[len(smart_homes)] = row
+        return fleet
+    
+    def home_rows(self, home_id):
+        """
+        Get the device rows of a home.
+        
+        Args:
+            home_id (int): The index of the home.
+        
+        Returns:
+            tuple: The first device row and the row after the last.
+        
+        Raises:
+            IndexError: If the home id is out of range.
+        """
+        if home_id < 0 or home_id >= self.spec.home_count:
+            raise IndexError("Smart home index out of range")
+        return self.offsets[home_id], self.offsets[home_id + 1]
+    
+    def _row(self, home_id, index):
+        """Get the row of a device, checking both indices."""
+        start, end = self.home_rows(home_id)
+        if index < 0 or index >= end - start:
+            raise IndexError("Device index out of range")
+        return start + index
+    
+    def get_device(self, home_id, index):
+        """
+        Read a device.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device in the home.
+        
+        Returns:
+            tuple: The type name, option value and switch state.
+        
+        Raises:
+            IndexError: If either index is out of range.
+        """
+        row = self._row(home_id, index)
+        return device_type_for_code(self.codes[row]).name, self.values[row], bool(self.states[row])
+    
+    def toggle_device(self, home_id, index):
+        """
+        Toggle a device.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device in the home.
+        
+        Returns:
+            bool: The new switch state.
+        
+        Raises:
+            IndexError: If either index is out of range.
+        """
+        row = self._row(home_id, index)
+        self.states[row] ^= 1
+        return bool(self.states[row])
+    
+    def update_option(self, home_id, index, value):
+        """
+        Update the option value of a device.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device in the home.
+            value (int): The new option value.
+        
+        Raises:
+            IndexError: If either index is out of range.
+            ValueError: If the value is out of range for the device type.
+        """
+        row = self._row(home_id, index)
+        device_type = device_type_for_code(self.codes[row])
+        if not isinstance(value, int) or not device_type.minimum <= value <= device_type.maximum:
+            raise ValueError(f"{device_type.option} must be an integer between "
+                             f"{device_type.minimum} and {device_type.maximum}")
+        self.values[row] = value
+    
+    def switch_homes(self, first_home, last_home, on):
+        """
+        Switch every device of a range of homes on or off.
+        
+        Args:
+            first_home (int): The first home of the range.
+            last_home (int): The home after the last one of the range.
+            on (bool): True to switch the devices on, False to switch them off.
+        """
+        start, end = self.offsets[first_home], self.offsets[last_home]
+        self.states[start:end] = (b"\x01" if on else b"\x00") * (end - start)
+    
+    def to_homes(self):
+        """
+        Build SmartHome objects from the current state.
+        
+        Returns:
+            list: One SmartHome per home, with copies of the devices.
+        """
+        devices, _ = from_columns(list(self.codes), list(self.values), list(self.states))
+        homes = []
+        for number in range(self.spec.home_count):
+            start, end = self.offsets[number], self.offsets[number + 1]
+            home = SmartHome(max_items=max(10, end - start))
+            home.add_devices(devices[start:end])
+            homes.append(home)
+        return homes
+    
+    def close(self):
+        """Detach from the shared block; the views must not be used afterwards."""
+        for view in (self.offsets, self.values, self.codes, self.states):
+            view.release()
+        self.__memory.close()
+    
+    def unlink(self):
+        """Free the shared block once every process has closed it."""
+        self.__memory.unlink()
+
+
+# Exception types rebuilt from worker error replies; others become RuntimeError
+_WORKER_ERRORS = {error.__name__: error for error in (IndexError, ValueError, TypeError, KeyError)}
+
+# Seconds between checks that a worker is still alive while awaiting its reply
+REPLY_POLL_INTERVAL = 0.5
+
+
+def _worker(spec, first_home, last_home, commands, results):
+    """
+    Apply the commands for a range of homes in a worker process.
+    
+    Any error raised by a command is sent back as its reply, so a bad
+    command never takes the worker down.
+    
+    Args:
+        spec (FleetSpec): The shared block to attach to.
+        first_home (int): The first home owned by the worker.
+        last_home (int): The home after the last one owned by the worker.
+        commands (multiprocessing.Queue): Incoming commands, None to stop.
+        results (multiprocessing.Queue): (result, error message) replies.
+    """
+    fleet = SharedFleet(spec)
+    try:
+        while True:
+            command = commands.get()
+            if command is None:
+                break
+            name, args = command
+            try:
+                if name == "batch":
+                    errors = 0
+                    for home_id, index, kind, value in args[0]:
+                        try:
+                            if kind == "toggle":
+                                fleet.toggle_device(home_id, index)
+                            else:
+                                fleet.update_option(home_id, index, value)
+                        except Exception:
+                            errors += 1
+                    results.put((errors, None))
+                elif name == "switch_all":
+                    fleet.switch_homes(first_home, last_home, args[0])
+                    results.put((None, None))
+                elif name == "sync":
+                    results.put((None, None))
+                else:
+                    results.put((getattr(fleet, name)(*args), None))
+            except Exception as e:
+                results.put((None, f"{type(e).__name__}: {str(e)}"))
+    finally:
+        fleet.close()
+
+
+class FleetRuntime:
+    """
+    A multi-process runtime over a fleet held in shared memory.
+    
+    The homes are split into contiguous ranges, each owned by a worker
+    process that applies every update for its homes, so updates to
+    different ranges run in parallel without sharing the GIL or any lock.
+    The runtime itself acts as the coordinator: it routes commands to the
+    owning worker, broadcasts fleet-wide commands and takes snapshots
+    after every worker has drained its queue. Readers such as analytics
+    workers attach to fleet.spec and read the columns directly.
+    
+    Attributes:
+        fleet (SharedFleet): The shared device columns.
+        ranges (list): The (first home, home after the last) of each worker.
+    """
+    
+    def __init__(self, smart_homes, workers=None):
+        """
+        Share a fleet and start the worker processes.
+        
+        Args:
+            smart_homes (list): The smart homes to run.
+            workers (int, optional): Number of worker processes. Defaults to
+                the number of CPUs, and is capped at the number of homes.
+        """
+        self.fleet = SharedFleet.create(smart_homes)
+        workers = workers or multiprocessing.cpu_count()
+        workers = max(1, min(workers, len(smart_homes)))
+        size = -(-len(smart_homes) // workers)
+        self.ranges = [
+            (start, min(start + size, len(smart_homes))) for start in range(0, len(smart_homes), size)
+        ] or [(0, 0)]
+        self.__commands = []
+        self.__results = []
+        self.__processes = []
+        for first_home, last_home in self.ranges:
+            commands, results = multiprocessing.Queue(), multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker, args=(self.fleet.spec, first_home, last_home, commands, results),
+                daemon=True
+            )
+            process.start()
+            self.__commands.append(commands)
+            self.__results.append(results)
+            self.__processes.append(process)
+    
+    def worker_of(self, home_id):
+        """
+        Get the worker owning a home.
+        
+        Args:
+            home_id (int): The index of the home.
+        
+        Returns:
+            int: The worker number.
+        
+        Raises:
+            IndexError: If the home id is out of range.
+        """
+        if home_id < 0 or home_id >= self.fleet.spec.home_count:
+            raise IndexError("Smart home index out of range")
+        return home_id // (self.ranges[0][1] - self.ranges[0][0])
+    
+    def _reply(self, worker):
+        """
+        Wait for a worker's reply and raise the error it reports.
+        
+        Args:
+            worker (int): The worker number.
+        
+        Returns:
+            The result of the worker's command.
+        
+        Raises:
+            IndexError, ValueError, TypeError, KeyError: The error the
+                command raised in the worker.
+            RuntimeError: If the command raised another error, or the
+                worker process has died.
+        """
+        while True:
+            try:
+                result, error = self.__results[worker].get(timeout=REPLY_POLL_INTERVAL)
+                break
+            except queue.Empty:
+                if not self.__processes[worker].is_alive():
+                    raise RuntimeError(f"Worker {worker} has stopped") from None
+        if error is not None:
+            kind, _, message = error.partition(": ")
+            if kind in _WORKER_ERRORS:
+                raise _WORKER_ERRORS[kind](message)
+            raise RuntimeError(error)
+        return result
+    
+    def _call(self, home_id, name, *args):
+        """Run a command on the worker owning a home and wait for it."""
+        worker = self.worker_of(home_id)
+        self.__commands[worker].put((name, (home_id,) + args))
+        return self._reply(worker)
+    
+    def toggle_device(self, home_id, index):
+        """
+        Toggle a device on its worker.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device in the home.
+        
+        Returns:
+            bool: The new switch state.
+        
+        Raises:
+            IndexError: If either index is out of range.
+        """
+        return self._call(home_id, "toggle_device", index)
+    
+    def update_option(self, home_id, index, value):
+        """
+        Update the option value of a device on its worker.
+        
+        Args:
+            home_id (int): The index of the home.
+            index (int): The index of the device in the home.
+            value (int): The new option value.
+        
+        Raises:
+            IndexError: If either index is out of range.
+            ValueError: If the value is out of range for the device type.
+        """
+        self._call(home_id, "update_option", index, value)
+    
+    def apply(self, operations):
+        """
+        Apply many operations, every worker handling its share in parallel.
+        
+        Args:
+            operations (list): (home, device, "toggle" or "option", value)
+                tuples, as produced by fleet_generator.generate_operations().
+        
+        Returns:
+            int: The number of operations that failed.
+        """
+        batches = [[] for _ in self.ranges]
+        errors = 0
+        for operation in operations:
+            try:
+                batches[self.worker_of(operation[0])].append(operation)
+            except IndexError:
+                errors += 1
+        sent = []
+        for worker, batch in enumerate(batches):
+            if batch:
+                self.__commands[worker].put(("batch", (batch,)))
+                sent.append(worker)
+        return errors + sum(self._reply(worker) for worker in sent)
+    
+    def _broadcast(self, name, *args):
+        """Send a command to every worker and wait for all of them."""
+        for commands in self.__commands:
+            commands.put((name, args))
+        for worker in range(len(self.__commands)):
+            self._reply(worker)
+    
+    def switch_all(self, on):
+        """
+        Switch every device of the fleet on or off, on all workers at once.
+        
+        Args:
+            on (bool): True to switch the devices on, False to switch them off.
+        """
+        self._broadcast("switch_all", on)
+    
+    def snapshot(self):
+        """
+        Take a consistent snapshot once every queued command has run.
+        
+        Returns:
+            list: SmartHome objects copied from the shared state.
+        """
+        self._broadcast("sync")
+        return self.fleet.to_homes()
+    
+    def close(self):
+        """Stop the workers and free the shared memory."""
+        for commands in self.__commands:
+            commands.put(None)
+        for process in self.__processes:
+            process.join()
+        self.fleet.close()
+        self.fleet.unlink()
+    
+    def __enter__(self):
+        """Return the runtime for use in a with statement."""
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the runtime at the end of a with statement."""
+        self.close()
@@ -1,3 +1,11 @@
+from validation import OPTION_BOUNDS
+
+# Bounds and error messages of the device options, from the shared table
+_RATE_MIN, _RATE_MAX, _RATE_ERROR = OPTION_BOUNDS["consumption_rate"]
+_TEMPERATURE_MIN, _TEMPERATURE_MAX, _TEMPERATURE_ERROR = OPTION_BOUNDS["temperature"]
+_SETTING_MIN, _SETTING_MAX, _SETTING_ERROR = OPTION_BOUNDS["setting"]
+
+
 class SmartPlug:
     """
     A class representing a smart plug device.
@@ -7,6 +15,9 @@ class SmartPlug:
         consumption_rate (int): Power consumption in watts (0-150).
     """
     
+    # Attribute holding the validated consumption rate, written directly by trusted updates
+    _trusted_attribute = "_SmartPlug__consumption_rate"
+    
     def __init__(self, consumption_rate):
         """
         Initialize a SmartPlug with a given consumption rate.
@@ -17,11 +28,31 @@ class SmartPlug:
         Raises:
             ValueError: If consumption_rate is not between 0 and 150.
         """
-        if not isinstance(consumption_rate, int) or consumption_rate < 0 or consumption_rate > 150:
-            raise ValueError("Consumption rate must be an integer between 0 and 150")
+        if not isinstance(consumption_rate, int) or consumption_rate < _RATE_MIN or consumption_rate > _RATE_MAX:
+            raise ValueError(_RATE_ERROR)
         self.__consumption_rate = consumption_rate
         self.__switched_on = False
     
+    @classmethod
+    def _trusted(cls, consumption_rate, switched_on=False):
+        """
+        Create a SmartPlug from values that were already validated.
+        
+        This skips the constructor checks; it is meant for bulk loaders
+        that validate whole columns of values up front.
+        
+        Args:
+            consumption_rate (int): Power consumption in watts (0-150).
+            switched_on (bool, optional): Whether the plug is on. Defaults to False.
+        
+        Returns:
+            SmartPlug: The new plug.
+        """
+        plug = cls.__new__(cls)
+        plug.__consumption_rate = consumption_rate
+        plug.__switched_on = switched_on
+        return plug
+    
     @property
     def consumption_rate(self):
         """Get the current consumption rate."""
@@ -38,8 +69,8 @@ class SmartPlug:
         Raises:
             ValueError: If value is not between 0 and 150.
         """
-        if not isinstance(value, int) or value < 0 or value > 150:
-            raise ValueError("Consumption rate must be an integer between 0 and 150")
+        if not isinstance(value, int) or value < _RATE_MIN or value > _RATE_MAX:
+            raise ValueError(_RATE_ERROR)
         self.__consumption_rate = value
     
     @property
@@ -93,6 +124,9 @@ class SmartOven(SmartDevice):
         temperature (int): Temperature setting (0-260 degrees Celsius).
     """
     
+    # Attribute holding the validated temperature, written directly by trusted updates
+    _trusted_attribute = "_SmartOven__temperature"
+    
     def __init__(self, temperature=150):
         """
         Initialize a SmartOven with a given temperature.
@@ -104,10 +138,27 @@ class SmartOven(SmartDevice):
             ValueError: If temperature is not between 0 and 260.
         """
         super().__init__()
-        if not isinstance(temperature, int) or temperature < 0 or temperature > 260:
-            raise ValueError("Temperature must be an integer between 0 and 260 degrees Celsius")
+        if not isinstance(temperature, int) or temperature < _TEMPERATURE_MIN or temperature > _TEMPERATURE_MAX:
+            raise ValueError(_TEMPERATURE_ERROR)
         self.__temperature = temperature
     
+    @classmethod
+    def _trusted(cls, temperature, switched_on=False):
+        """
+        Create a SmartOven from values that were already validated.
+        
+        Args:
+            temperature (int): Temperature setting (0-260).
+            switched_on (bool, optional): Whether the oven is on. Defaults to False.
+        
+        Returns:
+            SmartOven: The new oven.
+        """
+        oven = cls.__new__(cls)
+        oven._switched_on = switched_on
+        oven.__temperature = temperature
+        return oven
+    
     @property
     def temperature(self):
         """Get the current temperature setting."""
@@ -124,8 +175,8 @@ class SmartOven(SmartDevice):
         Raises:
             ValueError: If value is not between 0 and 260.
         """
-        if not isinstance(value, int) or value < 0 or value > 260:
-            raise ValueError("Temperature must be an integer between 0 and 260 degrees Celsius")
+        if not isinstance(value, int) or value < _TEMPERATURE_MIN or value > _TEMPERATURE_MAX:
+            raise ValueError(_TEMPERATURE_ERROR)
         self.__temperature = value
     
     def __str__(self):
@@ -148,6 +199,9 @@ class SmartHeater(SmartDevice):
         setting (int): Heat setting (0-5).
     """
     
+    # Attribute holding the validated setting, written directly by trusted updates
+    _trusted_attribute = "_SmartHeater__setting"
+    
     def __init__(self, setting=2):
         """
         Initialize a SmartHeater with a given setting.
@@ -159,10 +213,27 @@ class SmartHeater(SmartDevice):
             ValueError: If setting is not between 0 and 5.
         """
         super().__init__()
-        if not isinstance(setting, int) or setting < 0 or setting > 5:
-            raise ValueError("Setting must be a whole number between 0 and 5")
+        if not isinstance(setting, int) or setting < _SETTING_MIN or setting > _SETTING_MAX:
+            raise ValueError(_SETTING_ERROR)
         self.__setting = setting
     
+    @classmethod
+    def _trusted(cls, setting, switched_on=False):
+        """
+        Create a SmartHeater from values that were already validated.
+        
+        Args:
+            setting (int): Heat setting (0-5).
+            switched_on (bool, optional): Whether the heater is on. Defaults to False.
+        
+        Returns:
+            SmartHeater: The new heater.
+        """
+        heater = cls.__new__(cls)
+        heater._switched_on = switched_on
+        heater.__setting = setting
+        return heater
+    
     @property
     def setting(self):
         """Get the current heat setting."""
@@ -179,8 +250,8 @@ class SmartHeater(SmartDevice):
         Raises:
             ValueError: If value is not between 0 and 5.
         """
-        if not isinstance(value, int) or value < 0 or value > 5:
-            raise ValueError("Setting must be a whole number between 0 and 5")
+        if not isinstance(value, int) or value < _SETTING_MIN or value > _SETTING_MAX:
+            raise ValueError(_SETTING_ERROR)
         self.__setting = value
     
     def __str__(self):
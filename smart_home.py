@@ -1,3 +1,15 @@
+from collections import deque, namedtuple
+from device_types import device_type_of, update_options
+
+# A single change to a device in a SmartHome. The field is "switched_on",
+# the option attribute name, "added" (value is the device type name) or
+# "removed" (value is None).
+DeviceEvent = namedtuple("DeviceEvent", ["home", "index", "device", "field", "value"])
+
+# Maximum number of devices of a home unless another limit is given
+DEFAULT_MAX_ITEMS = 10
+
+
 class SmartHome:
     """
     A class representing a smart home that manages a collection of smart devices.
@@ -7,7 +19,7 @@ class SmartHome:
         max_items (int): Maximum number of devices that can be added to the home.
     """
     
-    def __init__(self, max_items=10):
+    def __init__(self, max_items=DEFAULT_MAX_ITEMS):
         """
         Initialize a SmartHome with an empty collection of devices.
         
@@ -16,6 +28,90 @@ class SmartHome:
         """
         self.__devices = []
         self.__max_items = max_items
+        self.__listeners = []
+        self.__notifying = False
+        self.__deferred = deque()
+    
+    @property
+    def max_items(self):
+        """The maximum number of devices the home can hold."""
+        return self.__max_items
+    
+    def __getstate__(self):
+        """Return the state for pickling, without the change listeners."""
+        state = self.__dict__.copy()
+        state["_SmartHome__listeners"] = []
+        state["_SmartHome__notifying"] = False
+        state["_SmartHome__deferred"] = deque()
+        return state
+    
+    def add_listener(self, listener):
+        """
+        Register a listener for device changes.
+        
+        The listener is called with a list of DeviceEvent objects after each
+        operation that changes the home; bulk operations such as
+        switch_all_on() deliver all their changes in a single call.
+        
+        Args:
+            listener: A callable taking a list of DeviceEvent objects.
+        """
+        self.__listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        """
+        Unregister a listener for device changes.
+        
+        Args:
+            listener: A callable previously passed to add_listener().
+            
+        Raises:
+            ValueError: If the listener is not registered.
+        """
+        self.__listeners.remove(listener)
+    
+    def defer(self, callback):
+        """
+        Run a callback once the current change has reached every listener.
+        
+        Listeners reacting to a change by changing the home again should
+        make that change from a deferred callback, so listeners registered
+        after them see the changes in the order they happened. Outside a
+        notification the callback runs right away.
+        
+        Args:
+            callback: A callable taking no arguments.
+        """
+        if self.__notifying:
+            self.__deferred.append(callback)
+        else:
+            callback()
+    
+    def _notify(self, events):
+        """
+        Deliver device change events to the registered listeners, then run
+        the callbacks they deferred.
+        
+        Args:
+            events (list): The DeviceEvent objects to deliver.
+        """
+        if not events:
+            return
+        if self.__notifying:
+            for listener in list(self.__listeners):
+                listener(events)
+            return
+        self.__notifying = True
+        try:
+            for listener in list(self.__listeners):
+                listener(events)
+        except BaseException:
+            self.__deferred.clear()
+            raise
+        finally:
+            self.__notifying = False
+        while self.__deferred:
+            self.__deferred.popleft()()
     
     def add_device(self, device):
         """
@@ -30,6 +126,54 @@ class SmartHome:
         if len(self.__devices) >= self.__max_items:
             raise ValueError(f"Cannot add more devices. Maximum of {self.__max_items} reached.")
         self.__devices.append(device)
+        if self.__listeners:
+            self._notify([DeviceEvent(
+                self, len(self.__devices) - 1, device, "added", type(device).__name__
+            )])
+    
+    def add_devices(self, devices):
+        """
+        Add several devices to the smart home at once.
+        
+        Either all devices are added or, if they do not fit, none are;
+        listeners receive all the additions in a single call.
+        
+        Args:
+            devices (list): The smart devices to add.
+        
+        Raises:
+            ValueError: If the devices would exceed the maximum number of devices.
+        """
+        devices = list(devices)
+        start = len(self.__devices)
+        if start + len(devices) > self.__max_items:
+            raise ValueError(f"Cannot add {len(devices)} devices. Maximum of {self.__max_items} reached.")
+        self.__devices.extend(devices)
+        if self.__listeners:
+            self._notify([
+                DeviceEvent(self, start + i, device, "added", type(device).__name__)
+                for i, device in enumerate(devices)
+            ])
+    
+    def insert_device(self, index, device):
+        """
+        Insert a device before the specified index.
+        
+        Args:
+            index (int): The index the device will have; len(home) appends.
+            device: The smart device to insert.
+            
+        Raises:
+            IndexError: If the index is out of range.
+            ValueError: If the maximum number of devices has been reached.
+        """
+        if index < 0 or index > len(self.__devices):
+            raise IndexError("Device index out of range")
+        if len(self.__devices) >= self.__max_items:
+            raise ValueError(f"Cannot add more devices. Maximum of {self.__max_items} reached.")
+        self.__devices.insert(index, device)
+        if self.__listeners:
+            self._notify([DeviceEvent(self, index, device, "added", type(device).__name__)])
     
     def get_device(self, index):
         """
@@ -60,19 +204,28 @@ class SmartHome:
         """
         if index < 0 or index >= len(self.__devices):
             raise IndexError("Device index out of range")
-        self.__devices[index].toggle_switch()
+        device = self.__devices[index]
+        device.toggle_switch()
+        if self.__listeners:
+            self._notify([DeviceEvent(self, index, device, "switched_on", device.switched_on)])
     
     def switch_all_on(self):
         """Turn on all devices in the smart home."""
-        for device in self.__devices:
+        events = []
+        for i, device in enumerate(self.__devices):
             if not device.switched_on:
                 device.toggle_switch()
+                events.append(DeviceEvent(self, i, device, "switched_on", True))
+        self._notify(events)
     
     def switch_all_off(self):
         """Turn off all devices in the smart home."""
-        for device in self.__devices:
+        events = []
+        for i, device in enumerate(self.__devices):
             if device.switched_on:
                 device.toggle_switch()
+                events.append(DeviceEvent(self, i, device, "switched_on", False))
+        self._notify(events)
     
     def remove_device(self, index):
         """
@@ -86,7 +239,9 @@ class SmartHome:
         """
         if index < 0 or index >= len(self.__devices):
             raise IndexError("Device index out of range")
-        self.__devices.pop(index)
+        device = self.__devices.pop(index)
+        if self.__listeners:
+            self._notify([DeviceEvent(self, index, device, "removed", None)])
     
     def update_option(self, index, value):
         """
@@ -101,16 +256,171 @@ class SmartHome:
             AttributeError: If the device doesn't have the appropriate option attribute.
         """
         device = self.get_device(index)
-        
-        # Determine which attribute to update based on device type
-        if hasattr(device, 'consumption_rate'):
-            device.consumption_rate = value
-        elif hasattr(device, 'temperature'):
-            device.temperature = value
-        elif hasattr(device, 'setting'):
-            device.setting = value
-        else:
+        device_type = device_type_of(device)
+        if device_type is None:
             raise AttributeError("Device does not have a recognized option attribute")
+        device_type.set_option(device, value)
+        if self.__listeners:
+            self._notify([DeviceEvent(self, index, device, device_type.option, value)])
+    
+    def update_options(self, indices, values, trusted=False):
+        """
+        Update the option attributes of several devices at once.
+        
+        The values are validated together before any device is changed, so
+        either every update is applied or none is, and listeners receive all
+        the changes in a single call. This is the fast path for ingesting
+        many option updates; apply() handles mixed batches.
+        
+        Args:
+            indices (list): The indices of the devices to update.
+            values (list): The new option value of each device.
+            trusted (bool, optional): Whether the values are already known to
+                be valid, e.g. from a validated store snapshot, so they are
+                set without being checked. Defaults to False.
+        
+        Raises:
+            IndexError: If an index is out of range.
+            ValueError: If the lists have different lengths or a value is out
+                of range for its device.
+            AttributeError: If a device doesn't have a recognized option attribute.
+        """
+        if indices and min(indices) < 0:
+            raise IndexError("Device index out of range")
+        try:
+            devices = list(map(self.__devices.__getitem__, indices))
+        except IndexError:
+            raise IndexError("Device index out of range") from None
+        update_options(devices, values, trusted)
+        if self.__listeners:
+            self._notify([
+                DeviceEvent(self, index, device, device_type_of(device).option, value)
+                for index, device, value in zip(indices, devices, values)
+            ])
+    
+    def apply(self, batch, trusted=False):
+        """
+        Apply a batch of operations atomically.
+        
+        Every operation is validated against the devices as the operations
+        before it leave them, before any is applied, so either the whole
+        batch is applied or, if one operation is invalid, none is. Listeners
+        receive all the changes of the batch in a single call.
+        
+        The operations are tuples:
+            ("add", device)
+            ("insert", index, device)
+            ("remove", index)
+            ("toggle", index)
+            ("set_switch", index, on)
+            ("update_option", index, value)
+        
+        Option values are checked against the bounds of the device type
+        registry, unless the batch is trusted.
+        
+        Args:
+            batch (list): The operations to apply, in order.
+            trusted (bool, optional): Whether the option values are already
+                known to be valid, e.g. from a validated store snapshot, so
+                they are set without being checked. Defaults to False.
+        
+        Returns:
+            int: The number of changes made; a set_switch finding the device
+            already in the requested state changes nothing.
+        
+        Raises:
+            IndexError: If an operation's index is out of range.
+            ValueError: If an operation is malformed, an option value is out
+                of range or the devices would exceed the maximum number.
+            AttributeError: If an option is updated on a device without a
+                recognized option attribute.
+        """
+        # Batches without additions or removals validate against the live
+        # list and an overlay of the switch states they change; the list is
+        # only copied once an operation would shift the indices
+        devices = self.__devices
+        switched = {}
+        copied = False
+        steps = []
+        for position, operation in enumerate(batch):
+            try:
+                kind, *args = operation
+                if kind == "add":
+                    (device,) = args
+                    args = (len(devices), device)
+                    kind = "insert"
+                if kind in ("insert", "remove") and not copied:
+                    switched = [switched.get(i, device.switched_on) for i, device in enumerate(devices)]
+                    devices = list(devices)
+                    copied = True
+                if kind == "insert":
+                    index, device = args
+                    if index < 0 or index > len(devices):
+                        raise IndexError("Device index out of range")
+                    if len(devices) >= self.__max_items:
+                        raise ValueError(f"Cannot add more devices. Maximum of {self.__max_items} reached.")
+                    devices.insert(index, device)
+                    switched.insert(index, device.switched_on)
+                    steps.append((kind, index, device))
+                    continue
+                
+                if not args:
+                    raise ValueError(f"Malformed operation: {operation!r}")
+                index, *values = args
+                if index < 0 or index >= len(devices):
+                    raise IndexError("Device index out of range")
+                device = devices[index]
+                if kind == "remove" and not values:
+                    del devices[index], switched[index]
+                    steps.append((kind, index, device))
+                elif kind in ("toggle", "set_switch") and len(values) == (kind == "set_switch"):
+                    state = switched[index] if copied else switched.get(index, device.switched_on)
+                    if kind == "toggle" or bool(values[0]) != state:
+                        switched[index] = not state
+                        steps.append(("toggle", index, device))
+                elif kind == "update_option" and len(values) == 1:
+                    value = values[0]
+                    device_type = device_type_of(device)
+                    if device_type is None:
+                        raise AttributeError("Device does not have a recognized option attribute")
+                    if not trusted and (not isinstance(value, int)
+                                        or not device_type.minimum <= value <= device_type.maximum):
+                        raise ValueError(f"{device_type.option} must be an integer between "
+                                         f"{device_type.minimum} and {device_type.maximum}, got {value!r}")
+                    steps.append((kind, index, device, device_type, value))
+                else:
+                    raise ValueError(f"Malformed operation: {operation!r}")
+            except (IndexError, ValueError, AttributeError) as e:
+                raise type(e)(f"Operation {position}: {e}") from None
+            except TypeError:
+                raise ValueError(f"Operation {position}: Malformed operation: {operation!r}") from None
+        
+        events = []
+        for kind, index, device, *option in steps:
+            if kind == "insert":
+                self.__devices.insert(index, device)
+                events.append(DeviceEvent(self, index, device, "added", type(device).__name__))
+            elif kind == "remove":
+                del self.__devices[index]
+                events.append(DeviceEvent(self, index, device, "removed", None))
+            elif kind == "toggle":
+                device.toggle_switch()
+                events.append(DeviceEvent(self, index, device, "switched_on", device.switched_on))
+            else:
+                device_type, value = option
+                device_type.set_option(device, value, trusted=trusted)
+                events.append(DeviceEvent(self, index, device, device_type.option, value))
+        self._notify(events)
+        return len(events)
+    
+    def __len__(self):
+        """
+        Return the number of devices in the smart home.
+        
+        Returns:
+            int: The number of devices.
+        """
+        return len(self.__devices)
     
     def __str__(self):
         """
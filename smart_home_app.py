@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from smart_devices import SmartPlug, SmartOven, SmartHeater
+from command_journal import CommandJournal
+from device_types import DEVICE_TYPES, device_type_of, get_device_type
 from smart_home import SmartHome
 
 class SmartHomeApp:
@@ -11,24 +12,33 @@ class SmartHomeApp:
     instance, allowing users to view and control smart devices.
     """
     
-    def __init__(self, root):
+    def __init__(self, root, smart_home=None):
         """
         Initialize the SmartHomeApp with a root window.
         
         Args:
             root: The Tkinter root window.
+            smart_home (SmartHome, optional): The smart home to manage. If
+                omitted, a new home with one default device of each type is
+                created.
         """
         self.root = root
         self.root.title("Smart Home Control System")
         self.root.geometry("600x500")
         self.root.resizable(True, True)
         
-        # Create and initialize SmartHome with default devices
-        self.smart_home = SmartHome()
-        self._initialize_devices()
+        if smart_home is None:
+            # Create and initialize SmartHome with default devices
+            self.smart_home = SmartHome()
+            self._initialize_devices()
+            
+            # Print SmartHome to console for verification
+            print(self.smart_home)
+        else:
+            self.smart_home = smart_home
         
-        # Print SmartHome to console for verification
-        print(self.smart_home)
+        # Journal of the user's edits for undo and redo
+        self.journal = CommandJournal(self.smart_home)
         
         # Create the GUI layout
         self._create_widgets()
@@ -38,14 +48,9 @@ class SmartHomeApp:
     
     def _initialize_devices(self):
         """Initialize SmartHome with default devices."""
-        # Add a SmartPlug with default consumption rate of 45W
-        self.smart_home.add_device(SmartPlug(45))
-        
-        # Add a SmartOven with default temperature
-        self.smart_home.add_device(SmartOven())
-        
-        # Add a SmartHeater with default setting
-        self.smart_home.add_device(SmartHeater())
+        # Add one device of each type with its default option
+        for device_type in DEVICE_TYPES.values():
+            self.smart_home.add_device(device_type.create())
     
     def _create_widgets(self):
         """Create the GUI widgets."""
@@ -86,6 +91,25 @@ class SmartHomeApp:
             command=self._add_device
         ).pack(side=tk.RIGHT, padx=5)
         
+        self.redo_button = ttk.Button(
+            control_frame, 
+            text="Redo", 
+            width=8,
+            command=self._redo
+        )
+        self.redo_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.undo_button = ttk.Button(
+            control_frame, 
+            text="Undo", 
+            width=8,
+            command=self._undo
+        )
+        self.undo_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.root.bind("<Control-z>", lambda e: self._undo())
+        self.root.bind("<Control-y>", lambda e: self._redo())
+        
         # Create a frame for the device list
         self.devices_frame = ttk.LabelFrame(main_frame, text="Devices", padding="10")
         self.devices_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -125,12 +149,16 @@ class SmartHomeApp:
     
     def _update_device_display(self):
         """Update the device display in the GUI."""
+        # Enable undo and redo only when there is something to revert
+        self.undo_button.state(["!disabled"] if self.journal.can_undo else ["disabled"])
+        self.redo_button.state(["!disabled"] if self.journal.can_redo else ["disabled"])
+        
         # Clear existing widgets
         for widget in self.devices_container.winfo_children():
             widget.destroy()
         
         # Create a frame for each device
-        for i in range(self.smart_home.__str__().count('\n')):
+        for i in range(len(self.smart_home)):
             try:
                 device = self.smart_home.get_device(i)
                 
@@ -192,10 +220,26 @@ class SmartHomeApp:
             except IndexError:
                 break
     
+    def _undo(self):
+        """Undo the last edit."""
+        try:
+            if self.journal.undo():
+                self._update_device_display()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to undo: {str(e)}")
+    
+    def _redo(self):
+        """Redo the last undone edit."""
+        try:
+            if self.journal.redo():
+                self._update_device_display()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to redo: {str(e)}")
+    
     def _switch_all_on(self):
         """Turn on all devices."""
         try:
-            self.smart_home.switch_all_on()
+            self.journal.switch_all_on()
             self._update_device_display()
             messagebox.showinfo("Success", "All devices turned on successfully.")
         except Exception as e:
@@ -204,7 +248,7 @@ class SmartHomeApp:
     def _switch_all_off(self):
         """Turn off all devices."""
         try:
-            self.smart_home.switch_all_off()
+            self.journal.switch_all_off()
             self._update_device_display()
             messagebox.showinfo("Success", "All devices turned off successfully.")
         except Exception as e:
@@ -218,7 +262,7 @@ class SmartHomeApp:
             index (int): The index of the device to toggle.
         """
         try:
-            self.smart_home.toggle_device(index)
+            self.journal.toggle_device(index)
             self._update_device_display()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to toggle device: {str(e)}")
@@ -245,66 +289,29 @@ class SmartHomeApp:
             form_frame = ttk.Frame(edit_window, padding="20")
             form_frame.pack(fill=tk.BOTH, expand=True)
             
-            # Determine which attribute to edit based on device type
-            if isinstance(device, SmartPlug):
-                ttk.Label(form_frame, text="Consumption Rate (0-150):").pack(anchor=tk.W, pady=5)
-                value_var = tk.IntVar(value=device.consumption_rate)
-                ttk.Spinbox(
-                    form_frame, 
-                    from_=0, 
-                    to=150, 
-                    textvariable=value_var, 
-                    width=10
-                ).pack(anchor=tk.W, pady=5)
-                
-                def save_changes():
-                    try:
-                        self.smart_home.update_option(index, value_var.get())
-                        edit_window.destroy()
-                        self._update_device_display()
-                        messagebox.showinfo("Success", "Device updated successfully.")
-                    except ValueError as e:
-                        messagebox.showerror("Error", str(e))
-                
-            elif isinstance(device, SmartOven):
-                ttk.Label(form_frame, text="Temperature (0-260):").pack(anchor=tk.W, pady=5)
-                value_var = tk.IntVar(value=device.temperature)
-                ttk.Spinbox(
-                    form_frame, 
-                    from_=0, 
-                    to=260, 
-                    textvariable=value_var, 
-                    width=10
-                ).pack(anchor=tk.W, pady=5)
-                
-                def save_changes():
-                    try:
-                        self.smart_home.update_option(index, value_var.get())
-                        edit_window.destroy()
-                        self._update_device_display()
-                        messagebox.showinfo("Success", "Device updated successfully.")
-                    except ValueError as e:
-                        messagebox.showerror("Error", str(e))
-                
-            elif isinstance(device, SmartHeater):
-                ttk.Label(form_frame, text="Setting (0-5):").pack(anchor=tk.W, pady=5)
-                value_var = tk.IntVar(value=device.setting)
-                ttk.Spinbox(
-                    form_frame, 
-                    from_=0, 
-                    to=5, 
-                    textvariable=value_var, 
-                    width=10
-                ).pack(anchor=tk.W, pady=5)
-                
-                def save_changes():
-                    try:
-                        self.smart_home.update_option(index, value_var.get())
-                        edit_window.destroy()
-                        self._update_device_display()
-                        messagebox.showinfo("Success", "Device updated successfully.")
-                    except ValueError as e:
-                        messagebox.showerror("Error", str(e))
+            # Build the option field from the device type's declaration
+            device_type = device_type_of(device)
+            ttk.Label(
+                form_frame, 
+                text=f"{device_type.label} ({device_type.minimum}-{device_type.maximum}):"
+            ).pack(anchor=tk.W, pady=5)
+            value_var = tk.IntVar(value=device_type.get_option(device))
+            ttk.Spinbox(
+                form_frame, 
+                from_=device_type.minimum, 
+                to=device_type.maximum, 
+                textvariable=value_var, 
+                width=10
+            ).pack(anchor=tk.W, pady=5)
+            
+            def save_changes():
+                try:
+                    self.journal.update_option(index, value_var.get())
+                    edit_window.destroy()
+                    self._update_device_display()
+                    messagebox.showinfo("Success", "Device updated successfully.")
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e))
             
             # Add buttons
             button_frame = ttk.Frame(form_frame)
@@ -338,7 +345,7 @@ class SmartHomeApp:
                 "Confirm Deletion", 
                 f"Are you sure you want to delete {str(device).split(' is ')[0]}?"
             ):
-                self.smart_home.remove_device(index)
+                self.journal.remove_device(index)
                 self._update_device_display()
                 messagebox.showinfo("Success", "Device deleted successfully.")
         except Exception as e:
@@ -361,11 +368,11 @@ class SmartHomeApp:
             
             # Device type selection
             ttk.Label(form_frame, text="Device Type:").pack(anchor=tk.W, pady=5)
-            device_type_var = tk.StringVar(value="SmartPlug")
+            device_type_var = tk.StringVar(value=next(iter(DEVICE_TYPES)))
             device_type_combo = ttk.Combobox(
                 form_frame, 
                 textvariable=device_type_var, 
-                values=["SmartPlug", "SmartOven", "SmartHeater"], 
+                values=list(DEVICE_TYPES), 
                 state="readonly"
             )
             device_type_combo.pack(anchor=tk.W, pady=5)
@@ -374,19 +381,8 @@ class SmartHomeApp:
             options_frame = ttk.Frame(form_frame)
             options_frame.pack(fill=tk.X, pady=5)
             
-            # Variables for device options
-            option_var = tk.IntVar(value=45)  # Default for SmartPlug
-            option_label = ttk.Label(options_frame, text="Consumption Rate (0-150):")
-            option_label.pack(anchor=tk.W, pady=5)
-            
-            option_widget = ttk.Spinbox(
-                options_frame, 
-                from_=0, 
-                to=150, 
-                textvariable=option_var, 
-                width=10
-            )
-            option_widget.pack(anchor=tk.W, pady=5)
+            # Variable for the device option
+            option_var = tk.IntVar()
             
             # Update options based on device type selection
             def update_options(*args):
@@ -394,38 +390,21 @@ class SmartHomeApp:
                 for widget in options_frame.winfo_children():
                     widget.destroy()
                 
-                if device_type_var.get() == "SmartPlug":
-                    option_var.set(45)
-                    ttk.Label(options_frame, text="Consumption Rate (0-150):").pack(anchor=tk.W, pady=5)
-                    ttk.Spinbox(
-                        options_frame, 
-                        from_=0, 
-                        to=150, 
-                        textvariable=option_var, 
-                        width=10
-                    ).pack(anchor=tk.W, pady=5)
-                    
-                elif device_type_var.get() == "SmartOven":
-                    option_var.set(150)
-                    ttk.Label(options_frame, text="Temperature (0-260):").pack(anchor=tk.W, pady=5)
-                    ttk.Spinbox(
-                        options_frame, 
-                        from_=0, 
-                        to=260, 
-                        textvariable=option_var, 
-                        width=10
-                    ).pack(anchor=tk.W, pady=5)
-                    
-                elif device_type_var.get() == "SmartHeater":
-                    option_var.set(2)
-                    ttk.Label(options_frame, text="Setting (0-5):").pack(anchor=tk.W, pady=5)
-                    ttk.Spinbox(
-                        options_frame, 
-                        from_=0, 
-                        to=5, 
-                        textvariable=option_var, 
-                        width=10
-                    ).pack(anchor=tk.W, pady=5)
+                device_type = get_device_type(device_type_var.get())
+                option_var.set(device_type.default)
+                ttk.Label(
+                    options_frame, 
+                    text=f"{device_type.label} ({device_type.minimum}-{device_type.maximum}):"
+                ).pack(anchor=tk.W, pady=5)
+                ttk.Spinbox(
+                    options_frame, 
+                    from_=device_type.minimum, 
+                    to=device_type.maximum, 
+                    textvariable=option_var, 
+                    width=10
+                ).pack(anchor=tk.W, pady=5)
+            
+            update_options()
             
             # Bind the update function to the combobox selection
             device_type_var.trace_add("write", update_options)
@@ -437,16 +416,8 @@ class SmartHomeApp:
             def add_new_device():
                 try:
                     device_type = device_type_var.get()
-                    option_value = option_var.get()
-                    
-                    if device_type == "SmartPlug":
-                        new_device = SmartPlug(option_value)
-                    elif device_type == "SmartOven":
-                        new_device = SmartOven(option_value)
-                    elif device_type == "SmartHeater":
-                        new_device = SmartHeater(option_value)
-                    
-                    self.smart_home.add_device(new_device)
+                    new_device = get_device_type(device_type).create(option_var.get())
+                    self.journal.add_device(new_device)
                     add_window.destroy()
                     self._update_device_display()
                     messagebox.showinfo("Success", f"{device_type} added successfully.")
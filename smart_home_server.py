@@ -0,0 +1,610 @@
+import asyncio
+import json
+import os
+import zlib
+from urllib.parse import parse_qs, urlsplit
+from change_stream import ChangeStream
+from device_types import device_type_of, get_device_type
+from smart_homes_store import DEFAULT_STORE_PATH, load_smart_homes
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+}
+
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class HttpError(Exception):
+    """
+    An error that maps to an HTTP error response.
+    
+    Attributes:
+        status (int): The HTTP status code.
+    """
+    
+    def __init__(self, status, message):
+        """
+        Initialize an HttpError.
+        
+        Args:
+            status (int): The HTTP status code.
+            message (str): The error message returned to the client.
+        """
+        super().__init__(message)
+        self.status = status
+
+
+def _encode_json(payload):
+    """
+    Encode a payload as compact JSON.
+    
+    Args:
+        payload: The JSON-serializable payload.
+    
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+    """
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _device_state(index, device):
+    """
+    Describe a device as a JSON-serializable dictionary.
+    
+    Args:
+        index (int): The index of the device in its home.
+        device: The smart device.
+    
+    Returns:
+        dict: The device id, type, option name, option value and switch state.
+    """
+    device_type = device_type_of(device)
+    if device_type is None:
+        return {
+            "id": index,
+            "type": type(device).__name__,
+            "option": None,
+            "value": None,
+            "switched_on": device.switched_on,
+        }
+    return {
+        "id": index,
+        "type": device_type.name,
+        "option": device_type.option,
+        "value": device_type.get_option(device),
+        "switched_on": device.switched_on,
+    }
+
+
+def _decode_operation(operation):
+    """
+    Turn a JSON operation into an operation for SmartHome.apply().
+    
+    Added devices are given by type name and optional option value, e.g.
+    ["add", "SmartOven", 180] or ["insert", 0, "SmartPlug"]; the other
+    operations are passed through unchanged.
+    
+    Args:
+        operation (list): The JSON operation.
+    
+    Returns:
+        tuple: The operation.
+    
+    Raises:
+        ValueError: If the operation is not a list or names an unknown device type.
+    """
+    if not isinstance(operation, list) or not operation:
+        raise ValueError("Operations must be non-empty lists")
+    kind, *args = operation
+    if kind == "add" and args:
+        return (kind, get_device_type(args[0]).create(*args[1:]))
+    if kind == "insert" and len(args) >= 2:
+        return (kind, args[0], get_device_type(args[1]).create(*args[2:]))
+    return tuple(operation)
+
+
+class SmartHomeServer:
+    """
+    A lightweight asyncio HTTP/JSON API over a list of SmartHome objects.
+    
+    Connections are kept alive between requests, several operations can be
+    sent in a single POST /batch request, and read endpoints return an ETag
+    so polling clients get an empty 304 response while the state is unchanged.
+    
+    Endpoints:
+        GET  /homes                             List homes with device counts.
+        GET  /homes/{home}                      Get a home and its devices.
+        GET  /homes/{home}/devices/{device}     Get a single device.
+        POST /homes/{home}/devices/{device}/toggle
+                                                Toggle a device.
+        PUT  /homes/{home}/devices/{device}/option
+                                                Update the option, body {"value": n}.
+        POST /homes/{home}/switch_all           Switch all devices, body {"on": bool}.
+        POST /batch                             Apply a list of {"method", "path", "body"}.
+        GET  /changes?since={seq}&timeout={s}   Long-poll for changes after a cursor.
+        GET  /events?since={seq}                Stream changes as server-sent events.
+    
+    Attributes:
+        smart_homes (list): The smart homes served by the API.
+        changes (ChangeStream): The change stream of the served homes.
+        controller (ShardedController): Runs the commands on the homes'
+            shard workers, or None to run them on the event loop.
+        host (str): The interface to listen on.
+        port (int): The port to listen on (0 picks a free port).
+    """
+    
+    def __init__(self, smart_homes, host="127.0.0.1", port=8080, idle_timeout=60,
+                 change_stream=None, controller=None):
+        """
+        Initialize the server.
+        
+        Args:
+            smart_homes (list): The smart homes to serve.
+            host (str, optional): The interface to listen on. Defaults to "127.0.0.1".
+            port (int, optional): The port to listen on. Defaults to 8080.
+            idle_timeout (float, optional): Seconds before an idle keep-alive
+                connection is closed. Defaults to 60.
+            change_stream (ChangeStream, optional): The change stream to serve.
+                Defaults to a new stream watching every home by its index.
+            controller (ShardedController, optional): A controller over the
+                same smart homes. Requests are then handled on a thread pool
+                and each command runs on its home's shard, so clients working
+                on homes in different shards do not wait for each other.
+                Defaults to None.
+        """
+        self.smart_homes = smart_homes
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.controller = controller
+        self._server = None
+        self._loop = None
+        self._changed = None
+        
+        if change_stream is None:
+            change_stream = ChangeStream()
+            for i, home in enumerate(smart_homes):
+                change_stream.watch(i, home)
+        self.changes = change_stream
+    
+    async def start(self):
+        """Start listening for connections."""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.changes.subscribe(self._on_change)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def serve_forever(self):
+        """Start the server if needed and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def close(self):
+        """Stop the server and wait for it to close."""
+        if self._server is not None:
+            self.changes.unsubscribe(self._on_change)
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    def _on_change(self, last_seq):
+        """
+        Wake the waiting change clients; safe to call from any thread.
+        
+        Args:
+            last_seq (int): The latest sequence number of the change stream.
+        """
+        self._loop.call_soon_threadsafe(self._wake_waiters)
+    
+    def _wake_waiters(self):
+        """Release every coroutine waiting for changes."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def _wait_for_changes(self, cursor, timeout):
+        """
+        Wait until changes after a cursor exist or the timeout expires.
+        
+        Args:
+            cursor (int): The last sequence number the client has seen.
+            timeout (float): Maximum seconds to wait, or None to wait forever.
+        """
+        while self.changes.last_seq == cursor:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+    
+    async def _long_poll(self, query):
+        """
+        Answer a GET /changes long-poll request.
+        
+        Args:
+            query (dict): The parsed query string.
+        
+        Returns:
+            tuple: The status, encoded body and ETag of the response.
+        """
+        try:
+            cursor = int(query.get("since", ["0"])[0])
+            timeout = min(float(query.get("timeout", ["30"])[0]), self.idle_timeout)
+            limit = int(query["limit"][0]) if "limit" in query else None
+            if cursor < 0 or limit is not None and limit < 1:
+                raise ValueError("Cursor must not be negative and limit must be positive")
+        except ValueError:
+            return 400, _encode_json({"error": "Invalid query parameters"}), None
+        
+        await self._wait_for_changes(cursor, timeout)
+        changes, cursor, reset = self.changes.changes_since(cursor, limit)
+        return 200, _encode_json({
+            "changes": [list(change) for change in changes],
+            "cursor": cursor,
+            "reset": reset,
+        }), None
+    
+    async def _stream_events(self, query, writer):
+        """
+        Stream changes to a client as server-sent events until it disconnects.
+        
+        Each event carries the sequence number as its id and a JSON list of
+        [seq, home, device, field, value] deltas as its data; a "reset" event
+        tells the client its cursor is too old and it must re-read the state.
+        An invalid cursor is answered with a 400 response instead.
+        
+        Args:
+            query (dict): The parsed query string.
+            writer: The asyncio stream writer.
+        """
+        try:
+            cursor = int(query.get("since", ["0"])[0])
+            if cursor < 0:
+                raise ValueError("Cursor must not be negative")
+        except ValueError:
+            writer.write(self._encode_response(
+                400, _encode_json({"error": "Invalid query parameters"}), None, False
+            ))
+            await writer.drain()
+            return
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        await writer.drain()
+        while True:
+            await self._wait_for_changes(cursor, None)
+            changes, cursor, reset = self.changes.changes_since(cursor)
+            if reset:
+                writer.write(f"event: reset\nid: {cursor}\ndata: {{}}\n\n".encode("utf-8"))
+            if changes:
+                data = json.dumps([list(change) for change in changes], separators=(",", ":"))
+                writer.write(f"id: {cursor}\ndata: {data}\n\n".encode("utf-8"))
+            await writer.drain()
+    
+    async def _handle_connection(self, reader, writer):
+        """
+        Serve requests on one connection until it is closed.
+        
+        Args:
+            reader: The asyncio stream reader.
+            writer: The asyncio stream writer.
+        """
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                url = urlsplit(path)
+                if method == "GET" and url.path == "/events":
+                    await self._stream_events(parse_qs(url.query), writer)
+                    break
+                if method == "GET" and url.path == "/changes":
+                    response = await self._long_poll(parse_qs(url.query))
+                elif self.controller is not None:
+                    response = await self._loop.run_in_executor(
+                        None, self._respond, method, path, headers, body
+                    )
+                else:
+                    response = self._respond(method, path, headers, body)
+                writer.write(self._encode_response(*response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HttpError as e:
+            writer.write(self._encode_response(e.status, _encode_json({"error": str(e)}), None, False))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader):
+        """
+        Read a single HTTP request from a stream.
+        
+        Args:
+            reader: The asyncio stream reader.
+        
+        Returns:
+            tuple: The method, path, headers and body, or None at end of stream.
+        
+        Raises:
+            HttpError: If the request is malformed or too large.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HttpError(400, "Malformed request line")
+        method, path, _ = parts
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HttpError(400, "Malformed Content-Length header")
+        if length > MAX_BODY_SIZE:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+    
+    def _encode_response(self, status, body, etag, keep_alive):
+        """
+        Encode an HTTP response.
+        
+        Args:
+            status (int): The HTTP status code.
+            body (bytes): The encoded JSON body, empty for no body.
+            etag (str): The ETag header value, or None.
+            keep_alive (bool): Whether the connection stays open.
+        
+        Returns:
+            bytes: The encoded response.
+        """
+        lines = [
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: " + ("keep-alive" if keep_alive else "close"),
+        ]
+        if etag is not None:
+            lines.append(f"ETag: {etag}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+    
+    def _respond(self, method, path, headers, body):
+        """
+        Produce the response for a request, handling ETags on reads.
+        
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+            headers (dict): The lower-cased request headers.
+            body (bytes): The request body.
+        
+        Returns:
+            tuple: The status, encoded body and ETag of the response.
+        """
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            return 400, _encode_json({"error": "Request body is not valid JSON"}), None
+        
+        status, payload = self._dispatch(method, path, data)
+        encoded = _encode_json(payload)
+        if method != "GET" or status != 200:
+            return status, encoded, None
+        
+        etag = f'"{zlib.crc32(encoded):08x}"'
+        if headers.get("if-none-match") == etag:
+            return 304, b"", etag
+        return status, encoded, etag
+    
+    def _dispatch(self, method, path, data):
+        """
+        Route a request to the SmartHome model.
+        
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+            data: The decoded JSON body, or None.
+        
+        Returns:
+            tuple: The status code and JSON-serializable payload.
+        """
+        try:
+            return 200, self._route(method, path, data)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except IndexError as e:
+            return 404, {"error": str(e)}
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            return 400, {"error": str(e)}
+    
+    def _get_home(self, home_id):
+        """
+        Get a smart home by its id.
+        
+        Args:
+            home_id (str): The home id from the request path.
+        
+        Returns:
+            SmartHome: The smart home.
+        
+        Raises:
+            IndexError: If the home id is out of range.
+        """
+        index = int(home_id)
+        if index < 0 or index >= len(self.smart_homes):
+            raise IndexError("Smart home index out of range")
+        return self.smart_homes[index]
+    
+    def _with_home(self, home_id, function):
+        """
+        Run a function on a smart home, on its shard when sharded.
+        
+        Args:
+            home_id (str): The home id from the request path.
+            function: A callable taking the SmartHome.
+        
+        Returns:
+            The function's result.
+        
+        Raises:
+            IndexError: If the home id is out of range.
+        """
+        home = self._get_home(home_id)
+        if self.controller is None:
+            return function(home)
+        return self.controller.call(int(home_id), function)
+    
+    def _route(self, method, path, data):
+        """
+        Execute a request against the model.
+        
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path.
+            data: The decoded JSON body, or None.
+        
+        Returns:
+            The JSON-serializable result.
+        
+        Raises:
+            HttpError: If no endpoint matches the request.
+        """
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        
+        if parts == ["batch"]:
+            if method != "POST":
+                raise HttpError(405, "Method not allowed")
+            if not isinstance(data, list):
+                raise ValueError("Batch body must be a list of operations")
+            results = []
+            for operation in data:
+                status, payload = self._dispatch(
+                    operation.get("method", "GET"),
+                    operation.get("path", ""),
+                    operation.get("body")
+                )
+                results.append({"status": status, "body": payload})
+            return results
+        
+        if parts == ["homes"]:
+            if method != "GET":
+                raise HttpError(405, "Method not allowed")
+            summarize = lambda home: (
+                len(home), sum(1 for j in range(len(home)) if home.get_device(j).switched_on)
+            )
+            if self.controller is None:
+                summaries = [summarize(home) for home in self.smart_homes]
+            else:
+                summaries = self.controller.map(summarize)
+            return [
+                {"id": i, "devices": devices, "on": on}
+                for i, (devices, on) in enumerate(summaries)
+            ]
+        
+        if len(parts) == 2 and parts[0] == "homes":
+            if method != "GET":
+                raise HttpError(405, "Method not allowed")
+            return {
+                "id": int(parts[1]),
+                "devices": self._with_home(parts[1], lambda home: [
+                    _device_state(j, home.get_device(j)) for j in range(len(home))
+                ]),
+            }
+        
+        if len(parts) == 3 and parts[0] == "homes" and parts[2] == "switch_all":
+            if method != "POST":
+                raise HttpError(405, "Method not allowed")
+            on = data is None or data.get("on", True)
+            
+            def switch_all(home):
+                if on:
+                    home.switch_all_on()
+                else:
+                    home.switch_all_off()
+                return len(home)
+            
+            return {"id": int(parts[1]), "devices": self._with_home(parts[1], switch_all)}
+        
+        if len(parts) == 3 and parts[0] == "homes" and parts[2] == "apply":
+            if method != "POST":
+                raise HttpError(405, "Method not allowed")
+            if not isinstance(data, list):
+                raise ValueError("Apply body must be a list of operations")
+            batch = [_decode_operation(operation) for operation in data]
+            return {"id": int(parts[1]), "changes": self._with_home(parts[1], lambda home: home.apply(batch))}
+        
+        if len(parts) >= 4 and parts[0] == "homes" and parts[2] == "devices":
+            index = int(parts[3])
+            action = parts[4:]
+            
+            if action == [] and method == "GET":
+                command = None
+            elif action == ["toggle"] and method == "POST":
+                command = lambda home: home.toggle_device(index)
+            elif action == ["option"] and method == "PUT":
+                if not isinstance(data, dict) or "value" not in data:
+                    raise ValueError('Option body must be {"value": <int>}')
+                command = lambda home: home.update_option(index, data["value"])
+            elif action in ([], ["toggle"], ["option"]):
+                raise HttpError(405, "Method not allowed")
+            else:
+                raise HttpError(404, "Not found")
+            
+            def run(home):
+                if command is not None:
+                    command(home)
+                return _device_state(index, home.get_device(index))
+            
+            return self._with_home(parts[1], run)
+        
+        raise HttpError(404, "Not found")
+
+
+def run_server(host="127.0.0.1", port=8080):
+    """
+    Serve the smart homes from the default store until interrupted.
+    
+    Args:
+        host (str, optional): The interface to listen on. Defaults to "127.0.0.1".
+        port (int, optional): The port to listen on. Defaults to 8080.
+    """
+    smart_homes = []
+    if os.path.exists(DEFAULT_STORE_PATH):
+        smart_homes, errors = load_smart_homes(DEFAULT_STORE_PATH)
+        for error in errors:
+            print(f"Warning loading smart homes: {error}")
+    
+    server = SmartHomeServer(smart_homes, host, port)
+    print(f"Serving {len(smart_homes)} smart home(s) on http://{host}:{port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("Server stopped.")
+
+if __name__ == "__main__":
+    run_server()
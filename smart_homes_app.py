@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import csv
 import os
-from smart_devices import SmartPlug, SmartOven, SmartHeater
+from device_types import DEVICE_TYPES
+from fleet_dashboard import FleetDashboard
+from home_cache import HomeCache
 from smart_home import SmartHome
 from smart_home_app import SmartHomeApp
+from smart_homes_store import DEFAULT_STORE_PATH, save_smart_homes, load_smart_homes
 
 class SmartHomesApp:
     """
@@ -15,12 +17,14 @@ class SmartHomesApp:
     smart homes and their devices.
     """
     
-    def __init__(self, root):
+    def __init__(self, root, cache_size=8):
         """
         Initialize the SmartHomesApp with a root window.
         
         Args:
             root: The Tkinter root window.
+            cache_size (int, optional): Number of closed smart home windows
+                kept hidden for instant reopening. Defaults to 8.
         """
         self.root = root
         self.root.title("Smart Homes Management System")
@@ -30,6 +34,14 @@ class SmartHomesApp:
         # List to store smart homes
         self.smart_homes = []
         
+        # Open smart home windows, and closed ones kept for reopening, as
+        # (window, app) tuples by home index
+        self.open_views = {}
+        self.view_cache = HomeCache(cache_size, evict=self._destroy_home_view)
+        
+        # The open fleet dashboard, if any
+        self.dashboard = None
+        
         # Load smart homes from file
         self._load_smart_homes()
         
@@ -82,6 +94,13 @@ class SmartHomesApp:
             command=self._load_smart_homes_and_update
         ).pack(side=tk.LEFT, padx=5)
         
+        ttk.Button(
+            control_frame, 
+            text="Fleet Dashboard", 
+            width=15,
+            command=self._open_dashboard
+        ).pack(side=tk.LEFT, padx=5)
+        
         # Create a frame for the smart homes list
         self.homes_frame = ttk.LabelFrame(main_frame, text="Smart Homes", padding="10")
         self.homes_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -121,6 +140,9 @@ class SmartHomesApp:
     
     def _update_smart_homes_display(self):
         """Update the smart homes display in the GUI."""
+        if self.dashboard is not None:
+            self.dashboard.refresh()
+        
         # Clear existing widgets
         for widget in self.homes_container.winfo_children():
             widget.destroy()
@@ -152,7 +174,7 @@ class SmartHomesApp:
             ).pack(anchor=tk.W)
             
             # Count total devices and devices that are on
-            total_devices = home.__str__().count('\n')
+            total_devices = len(home)
             devices_on = 0
             for j in range(total_devices):
                 try:
@@ -199,9 +221,8 @@ class SmartHomesApp:
             new_home = SmartHome()
             
             # Add default devices
-            new_home.add_device(SmartPlug(45))
-            new_home.add_device(SmartOven())
-            new_home.add_device(SmartHeater())
+            for device_type in DEVICE_TYPES.values():
+                new_home.add_device(device_type.create())
             
             # Add to the list
             self.smart_homes.append(new_home)
@@ -225,6 +246,8 @@ class SmartHomesApp:
                 "Confirm Deletion", 
                 f"Are you sure you want to delete Smart Home {index+1}?"
             ):
+                # Windows are tied to home indices, which shift on deletion
+                self._close_home_views()
                 self.smart_homes.pop(index)
                 self._update_smart_homes_display()
                 messagebox.showinfo("Success", "Smart home deleted successfully.")
@@ -235,38 +258,98 @@ class SmartHomesApp:
         """
         Open a smart home at the specified index in a new window.
         
+        A recently closed window of the home is shown again instead of being
+        rebuilt, refreshed in case the home changed while it was hidden.
+        
         Args:
             index (int): The index of the smart home to open.
         """
         try:
-            # Create a new top-level window
-            home_window = tk.Toplevel(self.root)
-            home_window.title(f"Smart Home {index+1}")
-            home_window.geometry("600x500")
-            home_window.resizable(True, True)
-            
-            # Create a SmartHomeApp instance for this smart home
-            app = SmartHomeApp(home_window)
-            
-            # Replace the default smart home with the selected one
-            app.smart_home = self.smart_homes[index]
-            
-            # Update the device display
-            app._update_device_display()
-            
-            # Bind close event to update the main display
-            home_window.protocol(
-                "WM_DELETE_WINDOW", 
-                lambda: self._on_home_close(home_window, index, app)
-            )
+            view = self.open_views.get(index)
+            if view is None:
+                view = self.view_cache.pop(index)
+                if view is not None:
+                    view[1]._update_device_display()
+            if view is None:
+                view = self._create_home_view(index)
+            self.open_views[index] = view
             
+            window, app = view
+            window.deiconify()
+            window.lift()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open smart home: {str(e)}")
     
+    def _create_home_view(self, index):
+        """
+        Create the window of a smart home.
+        
+        Args:
+            index (int): The index of the smart home.
+        
+        Returns:
+            tuple: The new window and its SmartHomeApp instance.
+        """
+        # Create a new top-level window
+        home_window = tk.Toplevel(self.root)
+        home_window.title(f"Smart Home {index+1}")
+        home_window.geometry("600x500")
+        home_window.resizable(True, True)
+        
+        # Create a SmartHomeApp instance for the selected smart home
+        app = SmartHomeApp(home_window, self.smart_homes[index])
+        
+        # Bind close event to update the main display
+        home_window.protocol(
+            "WM_DELETE_WINDOW", 
+            lambda: self._on_home_close(home_window, index, app)
+        )
+        return home_window, app
+    
+    def _destroy_home_view(self, index, view):
+        """
+        Destroy the window of a smart home evicted from the view cache.
+        
+        Args:
+            index (int): The index of the smart home.
+            view (tuple): The window and its SmartHomeApp instance.
+        """
+        view[0].destroy()
+    
+    def _close_home_views(self):
+        """Destroy every smart home window and the dashboard, e.g. before home indices change."""
+        for window, app in self.open_views.values():
+            window.destroy()
+        self.open_views.clear()
+        self.view_cache.clear()
+        if self.dashboard is not None:
+            self.dashboard.close()
+    
+    def _open_dashboard(self):
+        """Open the fleet dashboard, or raise it if it is already open."""
+        try:
+            if self.dashboard is None:
+                self.dashboard = FleetDashboard(
+                    tk.Toplevel(self.root), 
+                    self.smart_homes, 
+                    open_home=self._open_smart_home, 
+                    on_close=self._on_dashboard_close
+                )
+            self.dashboard.root.lift()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open the fleet dashboard: {str(e)}")
+    
+    def _on_dashboard_close(self):
+        """Forget the fleet dashboard once its window is closed."""
+        self.dashboard = None
+    
     def _on_home_close(self, window, index, app):
         """
         Handle the closing of a smart home window.
         
+        The window is hidden and cached rather than destroyed, so reopening
+        the home is instant.
+        
         Args:
             window: The window to close.
             index (int): The index of the smart home.
@@ -278,8 +361,10 @@ class SmartHomesApp:
         # Update the display
         self._update_smart_homes_display()
         
-        # Close the window
-        window.destroy()
+        # Hide the window and keep it for reopening
+        window.withdraw()
+        self.open_views.pop(index, None)
+        self.view_cache.put(index, (window, app))
     
     def _on_close(self):
         """Handle the closing of the main window."""
@@ -290,46 +375,9 @@ class SmartHomesApp:
         self.root.destroy()
     
     def _save_smart_homes(self):
-        """Save smart homes to a CSV file."""
+        """Save smart homes to the CSV store."""
         try:
-            with open("smart_homes.csv", "w", newline="") as file:
-                writer = csv.writer(file)
-                
-                # Write the number of smart homes
-                writer.writerow([len(self.smart_homes)])
-                
-                # For each smart home
-                for home in self.smart_homes:
-                    # Write the number of devices in this home
-                    device_count = home.__str__().count('\n')
-                    writer.writerow([device_count])
-                    
-                    # For each device in this home
-                    for i in range(device_count):
-                        try:
-                            device = home.get_device(i)
-                            
-                            # Determine device type and option
-                            if isinstance(device, SmartPlug):
-                                device_type = "SmartPlug"
-                                option_value = device.consumption_rate
-                            elif isinstance(device, SmartOven):
-                                device_type = "SmartOven"
-                                option_value = device.temperature
-                            elif isinstance(device, SmartHeater):
-                                device_type = "SmartHeater"
-                                option_value = device.setting
-                            else:
-                                continue
-                            
-                            # Write device information
-                            writer.writerow([
-                                device_type, 
-                                option_value, 
-                                1 if device.switched_on else 0
-                            ])
-                        except IndexError:
-                            pass
+            save_smart_homes(self.smart_homes, DEFAULT_STORE_PATH)
             
             print("Smart homes saved successfully.")
             messagebox.showinfo("Success", "Smart homes saved successfully.")
@@ -338,54 +386,23 @@ class SmartHomesApp:
             messagebox.showerror("Error", f"Failed to save smart homes: {str(e)}")
     
     def _load_smart_homes(self):
-        """Load smart homes from a CSV file."""
+        """Load smart homes from the CSV store."""
         try:
-            if not os.path.exists("smart_homes.csv"):
+            if not os.path.exists(DEFAULT_STORE_PATH):
                 print("No saved smart homes found.")
                 return
             
-            with open("smart_homes.csv", "r", newline="") as file:
-                reader = csv.reader(file)
-                
-                # Read the number of smart homes
-                row = next(reader)
-                home_count = int(row[0])
-                
-                # For each smart home
-                for _ in range(home_count):
-                    # Create a new smart home
-                    home = SmartHome()
-                    
-                    # Read the number of devices in this home
-                    row = next(reader)
-                    device_count = int(row[0])
-                    
-                    # For each device in this home
-                    for _ in range(device_count):
-                        row = next(reader)
-                        device_type = row[0]
-                        option_value = int(row[1])
-                        switched_on = int(row[2]) == 1
-                        
-                        # Create the device
-                        if device_type == "SmartPlug":
-                            device = SmartPlug(option_value)
-                        elif device_type == "SmartOven":
-                            device = SmartOven(option_value)
-                        elif device_type == "SmartHeater":
-                            device = SmartHeater(option_value)
-                        else:
-                            continue
-                        
-                        # Set the switch state
-                        if switched_on:
-                            device.toggle_switch()
-                        
-                        # Add the device to the home
-                        home.add_device(device)
-                    
-                    # Add the home to the list
-                    self.smart_homes.append(home)
+            smart_homes, errors = load_smart_homes(DEFAULT_STORE_PATH)
+            self.smart_homes.extend(smart_homes)
+            
+            # Report corrupt segments instead of discarding the whole store
+            for error in errors:
+                print(f"Warning loading smart homes: {error}")
+            if errors:
+                messagebox.showwarning(
+                    "Warning", 
+                    "Some smart homes could not be loaded:\n" + "\n".join(errors)
+                )
             
             print("Smart homes loaded successfully.")
         except Exception as e:
@@ -396,7 +413,8 @@ class SmartHomesApp:
     def _load_smart_homes_and_update(self):
         """Load smart homes from a CSV file and update the display."""
         try:
-            # Clear existing smart homes
+            # Clear existing smart homes and their windows
+            self._close_home_views()
             self.smart_homes = []
             
             # Load smart homes from file
@@ -0,0 +1,521 @@
+import csv
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import tempfile
+import zlib
+from device_types import DEVICE_TYPES, device_type_of, from_columns, from_records
+from smart_home import SmartHome, DEFAULT_MAX_ITEMS
+
+DEFAULT_STORE_PATH = "smart_homes.csv"
+
+# A device as a plain record, for reading stores without building devices
+DeviceRecord = namedtuple("DeviceRecord", ["home", "type", "value", "switched_on"])
+
+
+def _device_row(device):
+    """
+    Build the CSV row describing a single device.
+    
+    Args:
+        device: The smart device to describe.
+    
+    Returns:
+        list: Device type, option value and switch state, or None if the
+        device type is not recognized.
+    """
+    device_type = device_type_of(device)
+    if device_type is None:
+        return None
+    return [device_type.name, str(device_type.get_option(device)), "1" if device.switched_on else "0"]
+
+
+def _segment_checksum(rows):
+    """
+    Compute the CRC32 checksum of a home segment.
+    
+    Args:
+        rows (list): The device rows of the segment, as lists of strings.
+    
+    Returns:
+        int: The CRC32 of the canonical text of the rows.
+    """
+    text = "\n".join(",".join(row) for row in rows)
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def _is_segment_header(row):
+    """
+    Check whether a row starts a new home segment.
+    
+    Segment headers hold the device count (and a checksum in the current
+    format); device rows always start with the device type name.
+    
+    Args:
+        row (list): The CSV row to check.
+    
+    Returns:
+        bool: True if the row is a segment header.
+    """
+    return bool(row) and row[0].strip().isdigit()
+
+
+def _switch_state(cell):
+    """
+    Parse the switch state cell of a device row.
+    
+    Args:
+        cell (str): The cell, "1" for on or "0" for off.
+    
+    Returns:
+        bool: Whether the device is switched on.
+    
+    Raises:
+        ValueError: If the cell is neither "0" nor "1".
+    """
+    if cell not in ("0", "1"):
+        raise ValueError(f"Switch state must be 0 or 1, got {cell!r}")
+    return cell == "1"
+
+
+def _build_home(rows):
+    """
+    Create a SmartHome from the device rows of a segment.
+    
+    The rows are converted to columns, validated in one pass and built with
+    the bulk device factory.
+    
+    Args:
+        rows (list): The device rows of the segment.
+    
+    Returns:
+        SmartHome: The reconstructed smart home.
+    
+    Raises:
+        ValueError: If a row is malformed or describes an invalid device.
+    """
+    for row in rows:
+        if len(row) != 3:
+            raise ValueError(f"Malformed device row: {row}")
+    devices, errors = from_records([(row[0], int(row[1]), _switch_state(row[2])) for row in rows])
+    if errors:
+        row, message = errors[0]
+        raise ValueError(f"Device row {row + 1}: {message}")
+    home = SmartHome(max_items=max(DEFAULT_MAX_ITEMS, len(devices)))
+    home.add_devices(devices)
+    return home
+
+
+def _build_homes(segments):
+    """
+    Create the SmartHomes of many segments with a single bulk device build.
+    
+    The device rows of every segment are validated and built together; only
+    if some row is invalid are the segments rebuilt one by one to find out
+    which of them to skip. Each home gets the default capacity, raised to
+    fit its devices.
+    
+    Args:
+        segments (list): (segment number, device rows) tuples of segments
+            whose rows are well-formed.
+    
+    Returns:
+        tuple: A list of (segment number, SmartHome) tuples and a list of
+        (segment number, error message) tuples for the skipped segments.
+    """
+    rows = [row for _, segment_rows in segments for row in segment_rows]
+    codes = {name: device_type.code for name, device_type in DEVICE_TYPES.items()}
+    switches = [row[2] for row in rows]
+    try:
+        if not set(switches) <= {"0", "1"}:
+            raise ValueError("Malformed switch state")
+        devices, errors = from_columns(
+            [codes.get(row[0], row[0]) for row in rows],
+            [int(row[1]) for row in rows],
+            [switch == "1" for switch in switches],
+        )
+    except ValueError:
+        errors = True
+    
+    homes = []
+    failures = []
+    start = 0
+    for number, rows in segments:
+        try:
+            if errors:
+                homes.append((number, _build_home(rows)))
+            else:
+                home = SmartHome(max_items=max(DEFAULT_MAX_ITEMS, len(rows)))
+                home.add_devices(devices[start:start + len(rows)])
+                homes.append((number, home))
+        except ValueError as e:
+            failures.append((number, str(e)))
+        start += len(rows)
+    return homes, failures
+
+
+def atomic_write_text(path, text):
+    """
+    Atomically replace a file with the given text.
+    
+    The text is written to a temporary file in the same directory, flushed
+    and fsynced, then renamed over the target, so a crash mid-write leaves
+    the previous file intact.
+    
+    Args:
+        path (str): The file to write.
+        text (str): The new contents of the file.
+    """
+    _atomic_write(path, text, binary=False)
+
+
+def atomic_write_bytes(path, data):
+    """
+    Atomically replace a file with the given bytes, as atomic_write_text().
+    
+    Args:
+        path (str): The file to write.
+        data (bytes): The new contents of the file.
+    """
+    _atomic_write(path, data, binary=True)
+
+
+def _atomic_write(path, contents, binary):
+    """Write contents to a temporary file and rename it over path."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".smart_homes-", suffix=".tmp", dir=directory)
+    try:
+        file = os.fdopen(fd, "wb") if binary else os.fdopen(fd, "w", newline="")
+        with file:
+            file.write(contents)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    # Persist the rename itself where the platform allows it
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def save_smart_homes(smart_homes, path=DEFAULT_STORE_PATH):
+    """
+    Atomically save smart homes to a CSV store.
+    
+    The store is replaced with atomic_write_text(), so a crash mid-save
+    leaves the previous store intact. Each home segment header carries its
+    device count and a CRC32 of its device rows.
+    
+    Args:
+        smart_homes (list): The smart homes to save.
+        path (str, optional): The store file. Defaults to "smart_homes.csv".
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    # Write the number of smart homes
+    writer.writerow([len(smart_homes)])
+    
+    for home in smart_homes:
+        rows = []
+        for i in range(len(home)):
+            row = _device_row(home.get_device(i))
+            if row is not None:
+                rows.append(row)
+        
+        # Segment header: device count and checksum
+        writer.writerow([len(rows), _segment_checksum(rows)])
+        writer.writerows(rows)
+    
+    atomic_write_text(path, buffer.getvalue())
+
+
+def _read_segments(reader):
+    """
+    Group the rows of a CSV store into home segments as they are read.
+    
+    Args:
+        reader: A csv reader positioned after the store header.
+    
+    Yields:
+        tuple: The header row of each segment (None for device rows found
+        before any header) and the list of its device rows.
+    """
+    header = None
+    rows = None
+    for row in reader:
+        if not row:
+            continue
+        if _is_segment_header(row):
+            if rows is not None:
+                yield header, rows
+            header, rows = row, []
+        elif rows is not None:
+            rows.append(row)
+        else:
+            header, rows = None, [row]
+    if rows is not None:
+        yield header, rows
+
+
+def _check_segment(header, rows):
+    """
+    Check the framing of a home segment.
+    
+    Args:
+        header (list): The segment header row, or None if it is missing.
+        rows (list): The device rows of the segment.
+    
+    Raises:
+        ValueError: If the header is missing, the device count or checksum
+            does not match, or a device row is malformed.
+    """
+    if header is None:
+        raise ValueError("Device rows found before any segment header")
+    device_count = int(header[0])
+    if device_count != len(rows):
+        raise ValueError(f"Expected {device_count} device(s), found {len(rows)}")
+    if len(header) > 1 and int(header[1]) != _segment_checksum(rows):
+        raise ValueError("Checksum mismatch")
+    for row in rows:
+        if len(row) != 3:
+            raise ValueError(f"Malformed device row: {row}")
+
+
+def load_smart_homes(path=DEFAULT_STORE_PATH):
+    """
+    Load smart homes from a CSV store.
+    
+    Segments are framed by their header rows rather than by the counts
+    alone, so a corrupt segment is skipped and reported while the rest of
+    the fleet still loads. Stores written before checksums were added
+    (headers without a CRC) are accepted.
+    
+    Args:
+        path (str, optional): The store file. Defaults to "smart_homes.csv".
+    
+    Returns:
+        tuple: A list of the loaded SmartHome objects and a list of error
+        messages describing skipped segments.
+    
+    Raises:
+        FileNotFoundError: If the store file does not exist.
+    """
+    with open(path, "r", newline="") as file:
+        reader = csv.reader(file)
+        
+        # Read the number of smart homes
+        try:
+            row = next(reader)
+            home_count = int(row[0])
+        except (StopIteration, IndexError, ValueError):
+            return [], ["Store header is missing or malformed"]
+        
+        # Check the framing of each segment as it is read
+        checked = []
+        failures = []
+        segment_count = 0
+        for number, (header, rows) in enumerate(_read_segments(reader), start=1):
+            segment_count = number
+            try:
+                _check_segment(header, rows)
+                checked.append((number, rows))
+            except ValueError as e:
+                failures.append((number, str(e)))
+    
+    homes, build_failures = _build_homes(checked)
+    smart_homes = [home for _, home in homes]
+    errors = [
+        f"Skipped home segment {number}: {message}"
+        for number, message in sorted(failures + build_failures)
+    ]
+    
+    if segment_count != home_count:
+        errors.append(f"Expected {home_count} home segment(s), found {segment_count}")
+    
+    return smart_homes, errors
+
+
+def iter_device_records(path=DEFAULT_STORE_PATH, errors=None, first_home=0):
+    """
+    Stream the devices of a CSV store as plain records.
+    
+    The store is read one segment at a time and no device objects are
+    created, so memory stays bounded by the largest home however big the
+    fleet is. Segments are checked as by load_smart_homes() and skipped
+    when invalid; homes are numbered as in the list load_smart_homes()
+    would return, starting from first_home.
+    
+    Args:
+        path (str, optional): The store file. Defaults to "smart_homes.csv".
+        errors (list, optional): A list collecting messages describing
+            skipped segments.
+        first_home (int, optional): The index of the first home. Defaults to 0.
+    
+    Yields:
+        DeviceRecord: The home index, device type name, option value and
+        switch state of each device.
+    
+    Returns:
+        int: The index after the last home, including homes without
+        devices, as the value of the exhausted generator.
+    
+    Raises:
+        FileNotFoundError: If the store file does not exist.
+    """
+    if errors is None:
+        errors = []
+    with open(path, "r", newline="") as file:
+        reader = csv.reader(file)
+        try:
+            int(next(reader)[0])
+        except (StopIteration, IndexError, ValueError):
+            errors.append("Store header is missing or malformed")
+            return first_home
+        
+        home = first_home
+        for number, (header, rows) in enumerate(_read_segments(reader), start=1):
+            try:
+                _check_segment(header, rows)
+                records = []
+                for row_number, row in enumerate(rows, start=1):
+                    device_type = DEVICE_TYPES.get(row[0])
+                    if device_type is None:
+                        raise ValueError(f"Device row {row_number}: Unknown device type: {row[0]}")
+                    value = int(row[1])
+                    if not device_type.minimum <= value <= device_type.maximum:
+                        raise ValueError(f"Device row {row_number}: {device_type.option} must be an integer "
+                                         f"between {device_type.minimum} and {device_type.maximum}, got {value!r}")
+                    records.append(DeviceRecord(home, row[0], value, _switch_state(row[2])))
+            except ValueError as e:
+                errors.append(f"Skipped home segment {number}: {e}")
+                continue
+            yield from records
+            home += 1
+    return home
+
+
+def _import_store_file(path):
+    """
+    Load one store file in a worker process.
+    
+    Args:
+        path (str): The store file to load.
+    
+    Returns:
+        tuple: The loaded SmartHome objects and error messages prefixed with
+        the file path.
+    """
+    try:
+        smart_homes, errors = load_smart_homes(path)
+    except OSError as e:
+        return [], [f"{path}: {str(e)}"]
+    return smart_homes, [f"{path}: {error}" for error in errors]
+
+
+def _export_store_file(job):
+    """
+    Save one shard of smart homes in a worker process.
+    
+    Args:
+        job (tuple): The shard of smart homes and the file to write.
+    
+    Returns:
+        str: The path of the written file.
+    """
+    smart_homes, path = job
+    save_smart_homes(smart_homes, path)
+    return path
+
+
+def _run_jobs(function, jobs, max_workers):
+    """
+    Run jobs across a process pool, or in-process for a single worker.
+    
+    Args:
+        function: The module-level function to run for each job.
+        jobs (list): The job arguments.
+        max_workers (int): Number of worker processes, or None for the
+            number of CPUs.
+    
+    Returns:
+        list: The results, in the same order as the jobs.
+    """
+    if max_workers == 1 or len(jobs) <= 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(function, jobs))
+
+
+def import_smart_homes(paths, max_workers=None):
+    """
+    Load many store files in parallel and merge them into one fleet.
+    
+    Each file is parsed and validated in a worker process; the homes are
+    merged in the order of the given paths.
+    
+    Args:
+        paths (list): The store files to load.
+        max_workers (int, optional): Number of worker processes. Defaults to
+            the number of CPUs.
+    
+    Returns:
+        tuple: A list of all loaded SmartHome objects and a list of error
+        messages for skipped segments or unreadable files.
+    """
+    smart_homes = []
+    errors = []
+    for homes, file_errors in _run_jobs(_import_store_file, list(paths), max_workers):
+        smart_homes.extend(homes)
+        errors.extend(file_errors)
+    return smart_homes, errors
+
+
+def export_smart_homes(smart_homes, directory, homes_per_file=100, max_workers=None):
+    """
+    Save a fleet as sharded store files, writing the shards in parallel.
+    
+    Shard files left in the directory by an earlier export of a larger
+    fleet are removed once the new shards are written, so the directory
+    holds exactly the exported fleet.
+    
+    Args:
+        smart_homes (list): The smart homes to save.
+        directory (str): The directory to write the shard files to.
+        homes_per_file (int, optional): Number of homes per shard file.
+            Defaults to 100.
+        max_workers (int, optional): Number of worker processes. Defaults to
+            the number of CPUs.
+    
+    Returns:
+        list: The paths of the written shard files, in fleet order.
+    
+    Raises:
+        ValueError: If homes_per_file is not a positive integer.
+    """
+    if not isinstance(homes_per_file, int) or homes_per_file < 1:
+        raise ValueError("Homes per file must be a positive integer")
+    
+    os.makedirs(directory, exist_ok=True)
+    jobs = []
+    for shard, start in enumerate(range(0, len(smart_homes), homes_per_file)):
+        path = os.path.join(directory, f"smart_homes_{shard:04d}.csv")
+        jobs.append((smart_homes[start:start + homes_per_file], path))
+    paths = _run_jobs(_export_store_file, jobs, max_workers)
+    
+    written = {os.path.basename(path) for path in paths}
+    for name in os.listdir(directory):
+        if (name.startswith("smart_homes_") and name.endswith(".csv")
+                and name[len("smart_homes_"):-len(".csv")].isdigit() and name not in written):
+            os.remove(os.path.join(directory, name))
+    return paths
@@ -0,0 +1,365 @@
+import json
+import lzma
+import os
+import zlib
+from analytics import home_records, store_records
+from device_types import DEVICE_TYPES, from_columns
+from smart_home import SmartHome, DEFAULT_MAX_ITEMS
+from smart_homes_store import atomic_write_text, save_smart_homes, _run_jobs
+
+MANIFEST = "manifest.json"
+
+# Compression codecs by name: (compress, decompress)
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 9), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+# Field numbers of delta changes
+_VALUE = 0
+_SWITCHED_ON = 1
+
+
+def snapshot_state(source):
+    """
+    Convert a fleet to the flat state stored in an archive.
+    
+    Args:
+        source: A list of SmartHome objects, or the path of a CSV store,
+            which is streamed without building device objects.
+    
+    Returns:
+        list: One flat list per home of type code, option value and switch
+        state (0 or 1) for each device in turn.
+    
+    Raises:
+        ValueError: If the CSV store has a corrupt or invalid segment,
+            which would otherwise be dropped and renumber later homes.
+    """
+    errors = []
+    records = store_records(source, errors) if isinstance(source, str) else home_records(source)
+    codes = {name: device_type.code for name, device_type in DEVICE_TYPES.items()}
+    state = []
+    
+    def collect():
+        # Homes without devices yield no records, so the home count comes
+        # from the exhausted generator
+        count = yield from records
+        state.extend([] for _ in range(count - len(state)))
+    
+    for record in collect():
+        while len(state) <= record.home:
+            state.append([])
+        state[record.home] += (codes[record.type], record.value, int(record.switched_on))
+    if errors:
+        raise ValueError(f"Cannot snapshot {source}: {'; '.join(errors)}")
+    return state
+
+
+def _diff(old, new):
+    """
+    Compute the delta turning one state into another.
+    
+    Homes whose devices keep their number and types are compared field by
+    field; other homes are stored whole.
+    
+    Args:
+        old (list): The previous state.
+        new (list): The next state.
+    
+    Returns:
+        dict: The home count, the homes stored whole, and the changed
+        fields as a flat list of (home, device, field, value) quadruples.
+    """
+    homes = {}
+    fields = []
+    for home, devices in enumerate(new):
+        previous = old[home] if home < len(old) else None
+        if previous == devices:
+            continue
+        if previous is None or len(previous) != len(devices) or previous[0::3] != devices[0::3]:
+            homes[home] = devices
+            continue
+        for offset in range(0, len(devices), 3):
+            if previous[offset + 1] != devices[offset + 1]:
+                fields += (home, offset // 3, _VALUE, devices[offset + 1])
+            if previous[offset + 2] != devices[offset + 2]:
+                fields += (home, offset // 3, _SWITCHED_ON, devices[offset + 2])
+    return {"count": len(new), "homes": homes, "fields": fields}
+
+
+def _patch(state, delta):
+    """
+    Apply a delta to a state in place.
+    
+    Only the homes the delta touches are copied before they are changed,
+    so states sharing untouched homes stay independent.
+    
+    Args:
+        state (list): The state to change.
+        delta (dict): The delta, as produced by _diff().
+    """
+    del state[delta["count"]:]
+    state.extend([] for _ in range(delta["count"] - len(state)))
+    for home, devices in delta["homes"].items():
+        state[int(home)] = devices
+    fields = delta["fields"]
+    copied = set()
+    for i in range(0, len(fields), 4):
+        home, device, field, value = fields[i:i + 4]
+        if home not in copied:
+            state[home] = list(state[home])
+            copied.add(home)
+        state[home][device * 3 + 1 + field] = value
+
+
+def _decode(path, codec):
+    """Read and decompress an archive file."""
+    with open(path, "rb") as file:
+        return json.loads(CODECS[codec][1](file.read()))
+
+
+def _restore_group(job):
+    """
+    Restore several days that share a keyframe.
+    
+    Module-level so it can run in a worker process.
+    
+    Args:
+        job (tuple): The codec, the file paths from the keyframe to the
+            last wanted day, and the positions in that chain of the wanted
+            days.
+    
+    Returns:
+        list: The state of each wanted day.
+    """
+    codec, paths, wanted = job
+    state = _decode(paths[0], codec)["homes"]
+    states = {0: list(state)} if 0 in wanted else {}
+    for position, path in enumerate(paths[1:], start=1):
+        _patch(state, _decode(path, codec))
+        if position in wanted:
+            states[position] = list(state)
+    return [states[position] for position in wanted]
+
+
+def state_to_homes(state, capacities=None):
+    """
+    Build smart homes from an archived state.
+    
+    Args:
+        state (list): The state, as returned by snapshot_state().
+        capacities (list, optional): The max_items of each home. Defaults
+            to the default capacity, raised to fit each home's devices.
+    
+    Returns:
+        list: The SmartHome objects.
+    """
+    flat = [field for devices in state for field in devices]
+    devices, _ = from_columns(flat[0::3], flat[1::3], [on == 1 for on in flat[2::3]])
+    homes = []
+    start = 0
+    for i, home_devices in enumerate(state):
+        count = len(home_devices) // 3
+        capacity = DEFAULT_MAX_ITEMS if capacities is None else capacities[i]
+        home = SmartHome(max_items=max(capacity, count))
+        home.add_devices(devices[start:start + count])
+        homes.append(home)
+        start += count
+    return homes
+
+
+class SnapshotArchive:
+    """
+    A compressed archive of daily fleet snapshots.
+    
+    The first day, and every keyframe_interval-th day after it, is stored
+    as a full snapshot (a keyframe); the other days store only the device
+    fields that changed since the day before. Each day is a separate
+    compressed file listed in a manifest, so the archive grows with the
+    churn of the fleet rather than with its size times the number of days.
+    
+    Restoring a day decodes its keyframe and the deltas up to it. Days
+    after different keyframes are independent and restore_days() decodes
+    them in parallel.
+    
+    Attributes:
+        directory (str): The directory holding the archive.
+        codec (str): The compression codec, "zlib" or "lzma".
+        keyframe_interval (int): The number of days per keyframe.
+    """
+    
+    def __init__(self, directory, codec="zlib", keyframe_interval=7):
+        """
+        Open an archive, creating it if the directory holds none.
+        
+        The codec and keyframe interval of an existing archive are read
+        from its manifest and the arguments are ignored.
+        
+        Args:
+            directory (str): The directory holding the archive.
+            codec (str, optional): The compression codec. Defaults to "zlib".
+            keyframe_interval (int, optional): Days per keyframe. Defaults to 7.
+        
+        Raises:
+            ValueError: If the codec is unknown or the interval is not a
+                positive integer.
+        """
+        self.directory = directory
+        manifest_path = os.path.join(directory, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                manifest = json.load(file)
+            codec = manifest["codec"]
+            keyframe_interval = manifest["keyframe_interval"]
+            self.__days = manifest["days"]
+        else:
+            self.__days = []
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        if not isinstance(keyframe_interval, int) or keyframe_interval < 1:
+            raise ValueError("Keyframe interval must be a positive integer")
+        self.codec = codec
+        self.keyframe_interval = keyframe_interval
+        self.__positions = {day: position for position, day in enumerate(self.__days)}
+        self.__last = None
+    
+    @property
+    def days(self):
+        """The archived days, oldest first."""
+        return list(self.__days)
+    
+    def _path(self, position):
+        """Get the file path of the day at a position."""
+        return os.path.join(self.directory, f"day-{position:06d}.{self.codec}")
+    
+    def _position(self, day):
+        """
+        Get the position of an archived day.
+        
+        Raises:
+            ValueError: If the day is not archived.
+        """
+        try:
+            return self.__positions[day]
+        except KeyError:
+            raise ValueError(f"Unknown day: {day}") from None
+    
+    def append(self, day, source):
+        """
+        Archive the snapshot of a new day.
+        
+        Args:
+            day (str): The label of the day, e.g. "2024-05-01".
+            source: A list of SmartHome objects, or the path of a CSV store.
+        
+        Returns:
+            int: The number of compressed bytes written for the day.
+        
+        Raises:
+            ValueError: If the day is already archived, or the CSV store
+                has a corrupt or invalid segment.
+        """
+        if day in self.__positions:
+            raise ValueError(f"Day {day} is already archived")
+        state = snapshot_state(source)
+        position = len(self.__days)
+        if position % self.keyframe_interval == 0:
+            payload = {"homes": state}
+        else:
+            if self.__last is None:
+                self.__last = self.restore_state(self.__days[-1])
+            payload = _diff(self.__last, state)
+        
+        data = CODECS[self.codec][0](json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(position), "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        
+        # The day only becomes part of the archive once the manifest lists it
+        self.__days.append(day)
+        self.__positions[day] = position
+        atomic_write_text(os.path.join(self.directory, MANIFEST), json.dumps({
+            "codec": self.codec, "keyframe_interval": self.keyframe_interval, "days": self.__days,
+        }))
+        self.__last = state
+        return len(data)
+    
+    def _job(self, positions):
+        """Build the restore job of positions sharing a keyframe."""
+        keyframe = positions[0] - positions[0] % self.keyframe_interval
+        paths = [self._path(position) for position in range(keyframe, positions[-1] + 1)]
+        return self.codec, paths, [position - keyframe for position in positions]
+    
+    def restore_state(self, day):
+        """
+        Restore the archived state of a day.
+        
+        Args:
+            day (str): The label of the day.
+        
+        Returns:
+            list: The state, as returned by snapshot_state().
+        
+        Raises:
+            ValueError: If the day is not archived.
+        """
+        return _restore_group(self._job([self._position(day)]))[0]
+    
+    def restore(self, day):
+        """
+        Restore the smart homes of a day.
+        
+        Args:
+            day (str): The label of the day.
+        
+        Returns:
+            list: The SmartHome objects.
+        
+        Raises:
+            ValueError: If the day is not archived.
+        """
+        return state_to_homes(self.restore_state(day))
+    
+    def restore_days(self, days, max_workers=None):
+        """
+        Restore the smart homes of several days, decoding in parallel.
+        
+        Days are grouped by keyframe; each group is decoded once, in its
+        own worker process.
+        
+        Args:
+            days (list): The labels of the days.
+            max_workers (int, optional): Number of worker processes.
+                Defaults to the number of CPUs; 1 decodes in-process.
+        
+        Returns:
+            dict: The SmartHome objects of each day, by label.
+        
+        Raises:
+            ValueError: If a day is not archived.
+        """
+        positions = sorted({self._position(day) for day in days})
+        groups = {}
+        for position in positions:
+            groups.setdefault(position // self.keyframe_interval, []).append(position)
+        jobs = [self._job(group) for group in groups.values()]
+        states = {}
+        for group, group_states in zip(groups.values(), _run_jobs(_restore_group, jobs, max_workers)):
+            states.update(zip(group, group_states))
+        return {day: state_to_homes(states[self.__positions[day]]) for day in days}
+    
+    def export(self, day, path):
+        """
+        Write the restored smart homes of a day to a CSV store.
+        
+        Args:
+            day (str): The label of the day.
+            path (str): The store file to write.
+        
+        Raises:
+            ValueError: If the day is not archived.
+        """
+        save_smart_homes(self.restore(day), path)
@@ -0,0 +1,419 @@
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+from device_types import DEVICE_TYPES, device_type_for_code, device_type_of, from_columns
+from smart_home import SmartHome, DEFAULT_MAX_ITEMS
+from smart_homes_store import atomic_write_bytes, save_smart_homes, load_smart_homes, _run_jobs
+
+
+def _home_rows(home):
+    """
+    Get the (type code, option value, switched on) rows of a home.
+    
+    Devices of unregistered types are left out, as by the CSV store.
+    """
+    rows = []
+    for i in range(len(home)):
+        device = home.get_device(i)
+        device_type = device_type_of(device)
+        if device_type is not None:
+            rows.append((device_type.code, device_type.get_option(device), device.switched_on))
+    return rows
+
+
+def _build_homes(records):
+    """
+    Create SmartHomes from decoded records with a single bulk device build.
+    
+    Each home gets the default capacity, raised to fit its devices.
+    
+    Args:
+        records (list): (byte offset, rows) tuples, the rows being
+            (type code, option value, switched on) tuples.
+    
+    Returns:
+        tuple: The SmartHome objects of the valid records and (byte offset,
+        message) tuples describing the skipped ones.
+    """
+    rows = [row for _, home_rows in records for row in home_rows]
+    devices, invalid = from_columns(
+        [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+    )
+    messages = dict(invalid)
+    homes = []
+    errors = []
+    row = 0
+    built = 0
+    for offset, home_rows in records:
+        bad = [messages[i] for i in range(row, row + len(home_rows)) if i in messages]
+        count = len(home_rows) - len(bad)
+        try:
+            if bad:
+                raise ValueError(bad[0])
+            home = SmartHome(max_items=max(DEFAULT_MAX_ITEMS, count))
+            home.add_devices(devices[built:built + count])
+            homes.append(home)
+        except ValueError as e:
+            errors.append((offset, str(e)))
+        row += len(home_rows)
+        built += count
+    return homes, errors
+
+
+class Codec:
+    """
+    A file format for a fleet of smart homes.
+    
+    Self-delimiting formats store one record per home, so a file can be
+    split at record boundaries and its parts decoded independently, in
+    parallel worker processes. Subclasses implement encode_home(),
+    decode_range() and boundaries(); formats that cannot be split override
+    dump() and load() instead.
+    
+    Attributes:
+        name (str): The codec name, e.g. "jsonl".
+        extension (str): The file extension, e.g. ".jsonl".
+        splittable (bool): Whether files can be split for parallel decoding.
+    """
+    
+    name = None
+    extension = None
+    splittable = True
+    header = b""
+    
+    def encode_home(self, rows):
+        """
+        Encode the record of one home.
+        
+        Args:
+            rows (list): The (type code, option value, switched on) rows.
+        
+        Returns:
+            bytes: The record.
+        """
+        raise NotImplementedError
+    
+    def decode_range(self, data, offset):
+        """
+        Decode the records of a part of a file.
+        
+        Args:
+            data (bytes): The part, starting and ending at record boundaries.
+            offset (int): The byte offset of the part in the file.
+        
+        Returns:
+            tuple: (byte offset, rows) tuples for the decoded records and
+            (byte offset, message) tuples for the records that could not
+            be decoded.
+        """
+        raise NotImplementedError
+    
+    def boundaries(self, file, size, parts):
+        """
+        Find record boundaries splitting a file into roughly equal parts.
+        
+        Args:
+            file: The file, opened in binary mode.
+            size (int): The size of the file.
+            parts (int): The number of parts wanted.
+        
+        Returns:
+            list: Sorted byte offsets of record starts inside the file.
+        """
+        raise NotImplementedError
+    
+    def dump(self, smart_homes, path):
+        """
+        Atomically write smart homes to a file.
+        
+        Args:
+            smart_homes (list): The smart homes to write.
+            path (str): The file to write.
+        """
+        atomic_write_bytes(path, self.header + b"".join(self.encode_home(_home_rows(home)) for home in smart_homes))
+    
+    def split(self, path, parts):
+        """
+        Split a file into byte ranges starting and ending at record boundaries.
+        
+        Args:
+            path (str): The file.
+            parts (int): The number of ranges wanted.
+        
+        Returns:
+            list: (start, end) byte ranges covering every record, at most
+            parts of them.
+        
+        Raises:
+            ValueError: If the file does not start with the format's header.
+        """
+        size = os.path.getsize(path)
+        with open(path, "rb") as file:
+            if file.read(len(self.header)) != self.header:
+                raise ValueError(f"Not a {self.name} file: {path}")
+            offsets = [len(self.header)]
+            if self.splittable and parts > 1:
+                offsets += self.boundaries(file, size, parts)
+        offsets = sorted(set(offsets) - {size})
+        return list(zip(offsets, offsets[1:] + [size]))
+    
+    def load(self, path, max_workers=1):
+        """
+        Load smart homes from a file, decoding its parts in parallel.
+        
+        Args:
+            path (str): The file to load.
+            max_workers (int, optional): Number of worker processes, or None
+                for the number of CPUs. Defaults to 1, decoding in-process.
+        
+        Returns:
+            tuple: A list of the loaded SmartHome objects and a list of error
+            messages describing skipped records.
+        
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file does not start with the format's header.
+        """
+        parts = os.cpu_count() if max_workers is None else max_workers
+        jobs = [(self.name, path, start, end) for start, end in self.split(path, parts)]
+        smart_homes = []
+        errors = []
+        for homes, part_errors in _run_jobs(_load_range, jobs, max_workers):
+            smart_homes += homes
+            errors += [f"Skipped home record at byte {offset}: {message}" for offset, message in part_errors]
+        return smart_homes, errors
+
+
+def _load_range(job):
+    """
+    Load the smart homes of a byte range of a file.
+    
+    Module-level so it can run in a worker process.
+    
+    Args:
+        job (tuple): The codec name, the file path and the byte range.
+    
+    Returns:
+        tuple: The SmartHome objects and (byte offset, message) tuples for
+        the skipped records, in file order.
+    """
+    name, path, start, end = job
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    records, errors = CODECS[name].decode_range(data, start)
+    homes, build_errors = _build_homes(records)
+    return homes, sorted(errors + build_errors)
+
+
+class CsvCodec(Codec):
+    """
+    The legacy count-prefixed CSV store.
+    
+    Each device row belongs to the segment header before it, so files are
+    read whole by load_smart_homes() rather than split.
+    """
+    
+    name = "csv"
+    extension = ".csv"
+    splittable = False
+    
+    def dump(self, smart_homes, path):
+        """Atomically write smart homes with save_smart_homes()."""
+        save_smart_homes(smart_homes, path)
+    
+    def load(self, path, max_workers=1):
+        """Load smart homes with load_smart_homes(); max_workers is ignored."""
+        return load_smart_homes(path)
+
+
+class JsonLinesCodec(Codec):
+    """
+    One JSON array per line and home, e.g. [["SmartPlug",45,1]].
+    
+    Any newline ends a record, so a file splits at the first newline after
+    each target offset.
+    """
+    
+    name = "jsonl"
+    extension = ".jsonl"
+    
+    def encode_home(self, rows):
+        """Encode a home as a line of [type name, option value, 0 or 1] rows."""
+        names = [device_type_for_code(code).name for code, _, _ in rows]
+        return (json.dumps(
+            [[name, value, int(on)] for name, (_, value, on) in zip(names, rows)], separators=(",", ":")
+        ) + "\n").encode("utf-8")
+    
+    def decode_range(self, data, offset):
+        """Decode the lines of a part of a file."""
+        codes = {name: device_type.code for name, device_type in DEVICE_TYPES.items()}
+        records = []
+        errors = []
+        for line in data.splitlines(keepends=True):
+            try:
+                rows = []
+                for row in json.loads(line):
+                    name, value, on = row
+                    if name not in codes:
+                        raise ValueError(f"Unknown device type: {name}")
+                    if type(on) is not int or on not in (0, 1):
+                        raise ValueError(f"Switch state must be 0 or 1, got {on!r}")
+                    rows.append((codes[name], value, on == 1))
+                records.append((offset, rows))
+            except (ValueError, TypeError) as e:
+                errors.append((offset, str(e)))
+            offset += len(line)
+        return records, errors
+    
+    def boundaries(self, file, size, parts):
+        """Find the line starts following evenly spaced offsets."""
+        offsets = []
+        for part in range(1, parts):
+            file.seek(max(size * part // parts - 1, 0))
+            file.readline()
+            offsets.append(file.tell())
+        return offsets
+
+
+class BinaryCodec(Codec):
+    """
+    A compact length-prefixed binary format.
+    
+    After a 4-byte magic header, each home is a record of its payload
+    length and CRC32 followed by one (type code, option value, switched on)
+    entry per device. The lengths let a reader skip from record to record
+    without decoding payloads, which is how files are split.
+    """
+    
+    name = "binary"
+    extension = ".shb"
+    header = b"SHB\x01"
+    RECORD = struct.Struct("<II")
+    DEVICE = struct.Struct("<BiB")
+    
+    def encode_home(self, rows):
+        """Encode a home as a length- and checksum-prefixed record."""
+        pack = self.DEVICE.pack
+        payload = b"".join([pack(code, value, on) for code, value, on in rows])
+        return self.RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+    
+    def decode_range(self, data, offset):
+        """Decode the records of a part of a file."""
+        records = []
+        errors = []
+        position = 0
+        view = memoryview(data)
+        while position < len(data):
+            start = offset + position
+            if len(data) - position < self.RECORD.size:
+                errors.append((start, "Truncated record header"))
+                break
+            length, checksum = self.RECORD.unpack_from(data, position)
+            payload = view[position + self.RECORD.size:position + self.RECORD.size + length]
+            position += self.RECORD.size + length
+            if len(payload) != length:
+                errors.append((start, "Truncated record"))
+            elif length % self.DEVICE.size or zlib.crc32(payload) != checksum:
+                errors.append((start, "Checksum mismatch"))
+            else:
+                rows = list(self.DEVICE.iter_unpack(payload))
+                bad = [on for _, _, on in rows if on > 1]
+                if bad:
+                    errors.append((start, f"Switch state must be 0 or 1, got {bad[0]}"))
+                else:
+                    records.append((start, [(code, value, on == 1) for code, value, on in rows]))
+        return records, errors
+    
+    def boundaries(self, file, size, parts):
+        """Walk the record lengths and keep the first start past each target."""
+        targets = [size * part // parts for part in range(1, parts)]
+        offsets = []
+        position = len(self.header)
+        while targets and position < size:
+            if position >= targets[0]:
+                offsets.append(position)
+                while targets and targets[0] <= position:
+                    targets.pop(0)
+            file.seek(position)
+            header = file.read(self.RECORD.size)
+            if len(header) < self.RECORD.size:
+                break
+            position += self.RECORD.size + self.RECORD.unpack(header)[0]
+        return offsets
+
+
+# Registered codecs by name
+CODECS = {codec.name: codec for codec in (CsvCodec(), JsonLinesCodec(), BinaryCodec())}
+
+
+def get_codec(name):
+    """
+    Get a codec by name.
+    
+    Args:
+        name (str): The codec name, e.g. "binary".
+    
+    Returns:
+        Codec: The codec.
+    
+    Raises:
+        ValueError: If no codec has this name.
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}") from None
+
+
+def codec_for_path(path):
+    """
+    Get the codec of a file from its extension.
+    
+    Args:
+        path (str): The file path.
+    
+    Returns:
+        Codec: The codec; CSV for unknown extensions.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for codec in CODECS.values():
+        if codec.extension == extension:
+            return codec
+    return CODECS["csv"]
+
+
+def compare_codecs(smart_homes, max_workers=1, repeat=3):
+    """
+    Measure the encode and decode speed and the file size of every codec.
+    
+    Args:
+        smart_homes (list): The fleet to encode.
+        max_workers (int, optional): Worker processes for decoding.
+            Defaults to 1.
+        repeat (int, optional): Runs per measurement; the best is kept.
+            Defaults to 3.
+    
+    Returns:
+        dict: For each codec name, the "bytes" written and the best
+        "encode" and "decode" times in seconds.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, codec in CODECS.items():
+            path = os.path.join(directory, "fleet" + codec.extension)
+            timings = {}
+            for label, run in (("encode", lambda: codec.dump(smart_homes, path)),
+                               ("decode", lambda: codec.load(path, max_workers))):
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[label] = best
+            results[name] = {"bytes": os.path.getsize(path), **timings}
+    return results
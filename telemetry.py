@@ -0,0 +1,521 @@
+import csv
+import io
+import os
+import time
+from array import array
+from device_types import device_type_of
+
+RESOLUTIONS = {"minute": 60, "hour": 3600}
+
+# Finished rollup rows held in memory per resolution before they are
+# appended to the rollup file in one write
+WRITE_BUFFER_ROWS = 256
+
+
+class RingBuffer:
+    """
+    A fixed-size buffer of timestamped samples backed by arrays.
+    
+    Attributes:
+        capacity (int): Maximum number of samples kept.
+    """
+    
+    def __init__(self, capacity):
+        """
+        Initialize an empty RingBuffer.
+        
+        Args:
+            capacity (int): Maximum number of samples kept.
+        
+        Raises:
+            ValueError: If capacity is not a positive integer.
+        """
+        if not isinstance(capacity, int) or capacity < 1:
+            raise ValueError("Capacity must be a positive integer")
+        self.capacity = capacity
+        self.__times = array("d", bytes(8 * capacity))
+        self.__values = array("d", bytes(8 * capacity))
+        self.__start = 0
+        self.__size = 0
+    
+    def __len__(self):
+        """
+        Return the number of samples in the buffer.
+        
+        Returns:
+            int: The number of samples.
+        """
+        return self.__size
+    
+    def append(self, timestamp, value):
+        """
+        Add a sample, evicting the oldest one if the buffer is full.
+        
+        Args:
+            timestamp (float): The time of the sample.
+            value (float): The sampled value.
+        
+        Returns:
+            tuple: The evicted (timestamp, value), or None if nothing was evicted.
+        """
+        evicted = None
+        if self.__size == self.capacity:
+            evicted = (self.__times[self.__start], self.__values[self.__start])
+            self.__times[self.__start] = timestamp
+            self.__values[self.__start] = value
+            self.__start = (self.__start + 1) % self.capacity
+        else:
+            position = (self.__start + self.__size) % self.capacity
+            self.__times[position] = timestamp
+            self.__values[position] = value
+            self.__size += 1
+        return evicted
+    
+    def samples(self, start=None, end=None):
+        """
+        Get the samples in a time range, oldest first.
+        
+        Args:
+            start (float, optional): The earliest timestamp to include.
+            end (float, optional): The latest timestamp to include.
+        
+        Returns:
+            list: The (timestamp, value) samples in the range.
+        """
+        result = []
+        for i in range(self.__size):
+            position = (self.__start + i) % self.capacity
+            timestamp = self.__times[position]
+            if (start is None or timestamp >= start) and (end is None or timestamp <= end):
+                result.append((timestamp, self.__values[position]))
+        return result
+    
+    def drain(self):
+        """
+        Remove and return every sample, oldest first.
+        
+        Returns:
+            list: The (timestamp, value) samples.
+        """
+        result = self.samples()
+        self.__start = 0
+        self.__size = 0
+        return result
+
+
+class Rollup:
+    """
+    A downsampled aggregate of the samples in one time bucket.
+    
+    Attributes:
+        start (float): The start timestamp of the bucket.
+        count (int): Number of samples folded in.
+        minimum (float): Smallest sample value.
+        maximum (float): Largest sample value.
+        total (float): Sum of the sample values.
+        last (float): Value of the latest sample.
+    """
+    
+    def __init__(self, start):
+        """
+        Initialize an empty Rollup.
+        
+        Args:
+            start (float): The start timestamp of the bucket.
+        """
+        self.start = start
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.last = None
+    
+    def add(self, value, count=1, minimum=None, maximum=None, total=None):
+        """
+        Fold a sample, or another rollup's summary, into this rollup.
+        
+        Args:
+            value (float): The sample value (or the last value of a rollup).
+            count (int, optional): Number of samples represented. Defaults to 1.
+            minimum (float, optional): Smallest value represented. Defaults to value.
+            maximum (float, optional): Largest value represented. Defaults to value.
+            total (float, optional): Sum of the values represented. Defaults to value.
+        """
+        minimum = value if minimum is None else minimum
+        maximum = value if maximum is None else maximum
+        self.count += count
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+        self.total += value if total is None else total
+        self.last = value
+    
+    def row(self, label, field):
+        """
+        Describe the rollup as a CSV row.
+        
+        Args:
+            label (str): The device label.
+            field (str): The recorded field.
+        
+        Returns:
+            list: The label, field, start, count, minimum, maximum, total and last value.
+        """
+        return [label, field, self.start, self.count, self.minimum, self.maximum, self.total, self.last]
+
+
+class _Series:
+    """The raw samples and in-progress rollups of one device field."""
+    
+    def __init__(self, capacity):
+        """
+        Initialize an empty series.
+        
+        Args:
+            capacity (int): The ring buffer capacity.
+        """
+        self.buffer = RingBuffer(capacity)
+        self.rollups = {"minute": None, "hour": None}
+
+
+class TelemetryRecorder:
+    """
+    Records the history of device state into bounded per-device buffers.
+    
+    Every switch change and option update of a watched SmartHome is stored
+    in a fixed-size RingBuffer per device and field. Samples evicted from a
+    ring buffer are folded into minute rollups, and finished minute rollups
+    into hour rollups; finished rollups are buffered and appended to CSV
+    files in the telemetry directory in batches, and the byte offset of
+    each row is indexed by device field so queries read only that field's
+    rows. Memory per device is therefore bounded no matter how long the
+    process runs.
+    
+    Devices are identified by a stable label "<home id>/<n>", where n counts
+    the devices seen in that home, so history survives index shifts when
+    other devices are removed.
+    
+    Attributes:
+        capacity (int): Samples kept in memory per device and field.
+        directory (str): Where rollups are written, or None to discard them.
+        clock: A callable returning the current timestamp.
+    """
+    
+    def __init__(self, capacity=1024, directory=None, clock=time.time):
+        """
+        Initialize a TelemetryRecorder.
+        
+        Args:
+            capacity (int, optional): Samples kept per device and field.
+                Defaults to 1024.
+            directory (str, optional): Where rollups are written. Defaults to
+                None, which discards them.
+            clock (optional): A callable returning the current timestamp.
+                Defaults to time.time.
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.clock = clock
+        self.__series = {}
+        self.__fields = {}
+        self.__labels = {}
+        self.__counters = {}
+        self.__homes = {}
+        self.__pending = {resolution: [] for resolution in RESOLUTIONS}
+        self.__offsets = {resolution: None for resolution in RESOLUTIONS}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+    
+    def __len__(self):
+        """
+        Return the number of series held in memory.
+        
+        Returns:
+            int: The number of recorded (device label, field) series.
+        """
+        return len(self.__series)
+    
+    def watch(self, home_id, home):
+        """
+        Start recording a smart home, sampling the current state of its devices.
+        
+        Args:
+            home_id: The id used in the labels of the home's devices.
+            home (SmartHome): The smart home to record.
+        
+        Raises:
+            ValueError: If the home id is already being recorded.
+        """
+        if home_id in self.__homes:
+            raise ValueError(f"Smart home {home_id} is already being recorded")
+        listener = lambda events: self._on_events(home_id, events)
+        self.__homes[home_id] = (home, listener)
+        self.__counters.setdefault(home_id, 0)
+        now = self.clock()
+        for i in range(len(home)):
+            self._sample_device(home_id, home.get_device(i), now)
+        home.add_listener(listener)
+    
+    def unwatch(self, home_id):
+        """
+        Stop recording a smart home, forgetting the labels of its devices.
+        
+        The series of its devices are retired as for removed devices: their
+        buffered samples and unfinished rollups are written out and dropped.
+        
+        A home watched again under the same id labels its devices afresh,
+        continuing the count, so labels are never reused within a home id.
+        
+        Args:
+            home_id: The id the home is recorded under.
+        
+        Raises:
+            KeyError: If the home is not being recorded.
+        """
+        home, listener = self.__homes.pop(home_id)
+        home.remove_listener(listener)
+        for i in range(len(home)):
+            label = self.__labels.pop(id(home.get_device(i)), None)
+            if label is not None:
+                self._retire(label)
+        self.flush()
+    
+    def label(self, home_id, index):
+        """
+        Get the label of the device currently at an index of a watched home.
+        
+        Args:
+            home_id: The id the home is recorded under.
+            index (int): The index of the device.
+        
+        Returns:
+            str: The device label.
+        
+        Raises:
+            KeyError: If the home is not being recorded.
+            IndexError: If the index is out of range.
+        """
+        home = self.__homes[home_id][0]
+        return self.__labels[id(home.get_device(index))]
+    
+    def _label_for(self, home_id, device):
+        """Get or assign the label of a device."""
+        key = id(device)
+        if key not in self.__labels:
+            self.__labels[key] = f"{home_id}/{self.__counters[home_id]}"
+            self.__counters[home_id] += 1
+        return self.__labels[key]
+    
+    def _sample_device(self, home_id, device, timestamp):
+        """Record the switch state and option value of a device."""
+        label = self._label_for(home_id, device)
+        self._record(label, "switched_on", timestamp, 1 if device.switched_on else 0)
+        device_type = device_type_of(device)
+        if device_type is not None:
+            self._record(label, device_type.option, timestamp, device_type.get_option(device))
+    
+    def _on_events(self, home_id, events):
+        """
+        Record a batch of device events.
+        
+        Args:
+            home_id: The id of the home the events came from.
+            events (list): The DeviceEvent objects.
+        """
+        now = self.clock()
+        for event in events:
+            if event.field == "added":
+                self._sample_device(home_id, event.device, now)
+            elif event.field == "removed":
+                label = self.__labels.pop(id(event.device), None)
+                if label is not None:
+                    self._retire(label)
+            else:
+                label = self._label_for(home_id, event.device)
+                value = 1 if event.value is True else 0 if event.value is False else event.value
+                self._record(label, event.field, now, value)
+    
+    def _record(self, label, field, timestamp, value):
+        """
+        Append a sample, rolling up whatever the ring buffer evicts.
+        
+        Args:
+            label (str): The device label.
+            field (str): The recorded field.
+            timestamp (float): The time of the sample.
+            value (float): The sampled value.
+        """
+        series = self.__series.get((label, field))
+        if series is None:
+            series = self.__series[(label, field)] = _Series(self.capacity)
+            self.__fields.setdefault(label, []).append(field)
+        evicted = series.buffer.append(timestamp, value)
+        if evicted is not None:
+            self._roll_up(label, field, series, *evicted)
+    
+    def _roll_up(self, label, field, series, timestamp, value):
+        """Fold an evicted sample into the minute rollup, flushing finished buckets."""
+        start = timestamp - timestamp % RESOLUTIONS["minute"]
+        minute = series.rollups["minute"]
+        if minute is not None and minute.start != start:
+            self._finish(label, field, series, "minute")
+            minute = None
+        if minute is None:
+            minute = series.rollups["minute"] = Rollup(start)
+        minute.add(value)
+    
+    def _finish(self, label, field, series, resolution):
+        """Write a finished rollup and fold minute rollups into the hour rollup."""
+        rollup = series.rollups[resolution]
+        series.rollups[resolution] = None
+        self._write(resolution, rollup.row(label, field))
+        if resolution != "minute":
+            return
+        
+        start = rollup.start - rollup.start % RESOLUTIONS["hour"]
+        hour = series.rollups["hour"]
+        if hour is not None and hour.start != start:
+            self._finish(label, field, series, "hour")
+            hour = None
+        if hour is None:
+            hour = series.rollups["hour"] = Rollup(start)
+        hour.add(rollup.last, rollup.count, rollup.minimum, rollup.maximum, rollup.total)
+    
+    def _retire(self, label):
+        """Roll up and drop every series of a removed device."""
+        for field in self.__fields.pop(label, ()):
+            series = self.__series.pop((label, field))
+            for timestamp, value in series.buffer.drain():
+                self._roll_up(label, field, series, timestamp, value)
+            if series.rollups["minute"] is not None:
+                self._finish(label, field, series, "minute")
+            if series.rollups["hour"] is not None:
+                self._finish(label, field, series, "hour")
+    
+    def _path(self, resolution):
+        """Get the rollup file of a resolution."""
+        return os.path.join(self.directory, f"telemetry_{resolution}s.csv")
+    
+    def _write(self, resolution, row):
+        """Buffer a rollup row for the file of its resolution."""
+        if self.directory is None:
+            return
+        pending = self.__pending[resolution]
+        pending.append(row)
+        if len(pending) >= WRITE_BUFFER_ROWS:
+            self._flush(resolution)
+    
+    def _flush(self, resolution):
+        """Append the buffered rows of a resolution, indexing their offsets."""
+        pending = self.__pending[resolution]
+        if not pending:
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        lines = []
+        for row in pending:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(row)
+            lines.append(buffer.getvalue().encode("utf-8"))
+        with open(self._path(resolution), "ab") as file:
+            offset = file.tell()
+            file.write(b"".join(lines))
+        offsets = self.__offsets[resolution]
+        if offsets is not None:
+            for row, line in zip(pending, lines):
+                offsets.setdefault((row[0], row[1]), []).append(offset)
+                offset += len(line)
+        pending.clear()
+    
+    def _index(self, resolution):
+        """
+        Get the byte offsets of the rows of each device field in a rollup file.
+        
+        The file is scanned once, on the first query; rows appended later
+        are indexed as they are written.
+        
+        Args:
+            resolution (str): "minute" or "hour".
+        
+        Returns:
+            dict: Lists of row offsets keyed by (device label, field).
+        """
+        offsets = self.__offsets[resolution]
+        if offsets is None:
+            offsets = self.__offsets[resolution] = {}
+            path = self._path(resolution)
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    offset = 0
+                    for line in file:
+                        row = next(csv.reader([line.decode("utf-8")]), None)
+                        if row:
+                            offsets.setdefault((row[0], row[1]), []).append(offset)
+                        offset += len(line)
+        return offsets
+    
+    def flush(self):
+        """Append every buffered rollup row to the rollup files."""
+        if self.directory is None:
+            return
+        for resolution in RESOLUTIONS:
+            self._flush(resolution)
+    
+    def query(self, label, field, start=None, end=None):
+        """
+        Get the raw samples of a device field still held in memory.
+        
+        Args:
+            label (str): The device label.
+            field (str): The field, e.g. "switched_on" or "temperature".
+            start (float, optional): The earliest timestamp to include.
+            end (float, optional): The latest timestamp to include.
+        
+        Returns:
+            list: The (timestamp, value) samples, oldest first.
+        """
+        series = self.__series.get((label, field))
+        return [] if series is None else series.buffer.samples(start, end)
+    
+    def query_rollups(self, label, field, resolution="minute", start=None, end=None):
+        """
+        Get the downsampled history of a device field.
+        
+        Buffered rows are written out first; only the rows of this field
+        are then read from the rollup file, through the offset index.
+        
+        Args:
+            label (str): The device label.
+            field (str): The field, e.g. "switched_on" or "temperature".
+            resolution (str, optional): "minute" or "hour". Defaults to "minute".
+            start (float, optional): The earliest bucket start to include.
+            end (float, optional): The latest bucket start to include.
+        
+        Returns:
+            list: Rollup objects ordered by bucket start, including the
+            bucket still in progress.
+        
+        Raises:
+            ValueError: If the resolution is not supported.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Resolution must be one of {', '.join(RESOLUTIONS)}")
+        rollups = []
+        if self.directory is not None:
+            self._flush(resolution)
+            offsets = self._index(resolution).get((label, field))
+            if offsets:
+                with open(self._path(resolution), "rb") as file:
+                    for offset in offsets:
+                        file.seek(offset)
+                        row = next(csv.reader([file.readline().decode("utf-8")]))
+                        rollup = Rollup(float(row[2]))
+                        rollup.add(float(row[7]), int(row[3]), float(row[4]), float(row[5]), float(row[6]))
+                        rollups.append(rollup)
+        series = self.__series.get((label, field))
+        if series is not None and series.rollups[resolution] is not None:
+            rollups.append(series.rollups[resolution])
+        return [
+            rollup for rollup in sorted(rollups, key=lambda rollup: rollup.start)
+            if (start is None or rollup.start >= start) and (end is None or rollup.start <= end)
+        ]
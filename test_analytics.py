@@ -0,0 +1,109 @@
+import os
+import tempfile
+from analytics import home_records, store_records, analyze, GroupedAggregate, Histogram, TopHomes
+from device_types import DEVICE_TYPES
+from fleet_generator import generate_fleet, write_fleet
+from smart_homes_store import load_smart_homes
+
+def _devices(home):
+    """Get the devices of a home in order."""
+    return [home.get_device(i) for i in range(len(home))]
+
+def test_analytics():
+    """
+    Test the functionality of the energy analytics reports.
+    
+    This function tests:
+    1. Streaming records from in-memory homes and from stores
+    2. Grouped aggregates per home and per device type
+    3. Histograms of option values
+    4. Top-k homes by power
+    5. Skipping corrupt segments while streaming a store
+    6. Rejecting invalid report arguments
+    """
+    print("\n=== Testing Analytics ===")
+    
+    fleet = generate_fleet(50, seed=11)
+    devices = [device for home in fleet for device in _devices(home)]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        # Test record sources
+        print("\nStreaming records from memory and from store shards:")
+        paths = write_fleet(fleet, os.path.join(directory, "shards"), homes_per_file=20)
+        from_memory = list(home_records(fleet))
+        from_store = list(store_records(paths))
+        assert from_memory == from_store
+        assert len(from_store) == len(devices)
+        print(f"Streamed {len(from_store)} records from {len(paths)} shards")
+        
+        # Test grouped aggregates
+        print("\nAggregating plug power per home and device counts per type:")
+        results = analyze(
+            store_records(paths),
+            plugs=GroupedAggregate("home", "power", where=lambda r: r.type == "SmartPlug"),
+            types=GroupedAggregate("type", "option"),
+            hot_ovens=GroupedAggregate("type", where=lambda r: r.type == "SmartOven" and r.value > 200),
+            heaters=Histogram("option", where=lambda r: r.type == "SmartHeater"),
+            ovens=Histogram("option", width=100, where=lambda r: r.type == "SmartOven"),
+            top=TopHomes(5),
+        )
+        for home_index, home in enumerate(fleet):
+            plugs = [d for d in _devices(home) if type(d).__name__ == "SmartPlug"]
+            if plugs:
+                watts = [d.consumption_rate if d.switched_on else 0 for d in plugs]
+                group = results["plugs"][home_index]
+                assert group["count"] == len(plugs) and group["total"] == sum(watts)
+                assert group["min"] == min(watts) and group["max"] == max(watts)
+            else:
+                assert home_index not in results["plugs"]
+        assert sum(group["count"] for group in results["types"].values()) == len(devices)
+        hot = sum(1 for d in devices if type(d).__name__ == "SmartOven" and d.temperature > 200)
+        assert results["hot_ovens"].get("SmartOven", {"count": 0})["count"] == hot
+        print(f"Ovens above 200 degrees: {hot}")
+        
+        # Test histograms
+        print("\nHeater setting distribution:")
+        print(results["heaters"])
+        settings = [d.setting for d in devices if type(d).__name__ == "SmartHeater"]
+        assert results["heaters"] == {s: settings.count(s) for s in sorted(set(settings))}
+        assert sum(results["ovens"].values()) == sum(1 for d in devices if type(d).__name__ == "SmartOven")
+        assert all(bound % 100 == 0 for bound in results["ovens"])
+        
+        # Test top-k
+        print("\nTop 5 homes by power:")
+        power = [sum(DEVICE_TYPES[type(d).__name__].power(d) for d in _devices(home)) for home in fleet]
+        expected = sorted(range(len(fleet)), key=lambda i: (-power[i], i))[:5]
+        print(results["top"])
+        assert results["top"] == [(i, power[i]) for i in expected]
+        
+        # Test corrupt segments
+        print("\nStreaming a store with a corrupt segment:")
+        path = paths[0]
+        with open(path) as file:
+            lines = file.read().splitlines()
+        # The checksum is dropped, as in legacy stores, so the rows themselves are checked
+        lines[1] = lines[1].split(",")[0]
+        for corrupt in ("SmartOven,999,1", "SmartOven,150,yes"):
+            lines[2] = corrupt
+            with open(path, "w") as file:
+                file.write("\n".join(lines) + "\n")
+            errors = []
+            records = list(store_records(path, errors))
+            loaded, load_errors = load_smart_homes(path)
+            print(f"Error caught: {errors[0]}")
+            assert len(errors) == 1 and errors == load_errors
+            assert records == list(home_records(loaded))
+    
+    # Test invalid arguments
+    print("\nCreating reports with invalid arguments:")
+    for create in (lambda: GroupedAggregate("room"), lambda: Histogram(width=0), lambda: TopHomes(0)):
+        try:
+            create()
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    
+    print("\nAnalytics testing completed successfully.")
+
+if __name__ == "__main__":
+    test_analytics()
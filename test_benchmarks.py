@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+from benchmarks import BENCHMARKS, run_benchmarks, compare_results, main
+
+def test_benchmarks():
+    """
+    Test the benchmark suite at a small size.
+    
+    This function tests:
+    1. Running every benchmark and producing machine-readable results
+    2. Flagging regressions against a baseline
+    3. The command line saving and comparing results
+    """
+    print("\n=== Testing Benchmark Suite ===")
+    
+    # Test running the suite
+    print("\nRunning every benchmark with 10 devices:")
+    current = run_benchmarks(sizes=[10], repeat=1)
+    assert sorted(current["results"]) == sorted(f"{name}[10]" for name in BENCHMARKS)
+    json.dumps(current)
+    
+    # Test regression comparison
+    print("\nComparing against a baseline twice as fast:")
+    baseline = {"results": {
+        key: {"seconds": result["seconds"] / 2} for key, result in current["results"].items()
+    }}
+    rows = compare_results(current, baseline, threshold=0.2)
+    print(rows[0])
+    assert all(regressed for *_, regressed in rows)
+    assert not any(regressed for *_, regressed in compare_results(current, current))
+    
+    # Test the command line
+    print("\nRunning the command line with --save and --baseline:")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "baseline.json")
+        assert main(["--sizes", "10", "--repeat", "1", "--only", "home_str", "--save", path]) == 0
+        assert main(["--sizes", "10", "--repeat", "1", "--only", "home_str", 
+                     "--baseline", path, "--threshold", "100"]) == 0
+    
+    print("\nBenchmark suite testing completed successfully.")
+
+if __name__ == "__main__":
+    test_benchmarks()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from smart_home_server import SmartHomeServer
+from change_stream import ChangeStream
+
+def _make_home():
+    """Create a smart home with one device of each type."""
+    home = SmartHome()
+    home.add_device(SmartPlug(45))
+    home.add_device(SmartOven())
+    home.add_device(SmartHeater())
+    return home
+
+def test_change_stream():
+    """
+    Test the functionality of the ChangeStream class.
+    
+    This function tests:
+    1. Recording toggles, option updates, additions and removals
+    2. Resuming from a cursor
+    3. Reporting a reset when the cursor falls out of the window
+    4. Rejecting a negative limit
+    5. Long-polling with a timeout
+    """
+    print("\n=== Testing ChangeStream Class ===")
+    
+    home = _make_home()
+    stream = ChangeStream(capacity=5)
+    stream.watch("home-1", home)
+    
+    # Test recording changes
+    print("\nTesting recorded changes:")
+    home.toggle_device(0)
+    home.update_option(1, 200)
+    home.add_device(SmartPlug(10))
+    home.remove_device(2)
+    changes, cursor, reset = stream.changes_since(0)
+    for change in changes:
+        print(change)
+    assert [tuple(change) for change in changes] == [
+        (1, "home-1", 0, "switched_on", True),
+        (2, "home-1", 1, "temperature", 200),
+        (3, "home-1", 3, "added", "SmartPlug"),
+        (4, "home-1", 2, "removed", None),
+    ]
+    assert cursor == 4 and not reset
+    
+    # Test resuming from a cursor
+    print("\nTesting resuming from cursor 4 after switch_all_on():")
+    home.switch_all_on()
+    changes, cursor, reset = stream.changes_since(4)
+    print(changes)
+    assert [change.device for change in changes] == [1, 2] and cursor == 6
+    
+    # Test reset when the cursor is too old
+    print("\nTesting a cursor older than the retained window:")
+    changes, cursor, reset = stream.changes_since(0)
+    print(f"Reset: {reset}, oldest change: {changes[0].seq}")
+    assert reset and changes[0].seq == 2
+    
+    # Test a negative cursor on an empty stream
+    print("\nTesting a negative cursor on an empty stream:")
+    empty = ChangeStream()
+    assert empty.changes_since(-1) == ([], 0, True)
+    assert empty.changes_since(0) == ([], 0, False)
+    
+    # Test a negative limit
+    try:
+        stream.changes_since(4, limit=-1)
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    # Test long-poll timeout
+    print("\nTesting wait() with no new changes:")
+    changes, cursor, reset = stream.wait(6, timeout=0.01)
+    assert changes == [] and cursor == 6
+    
+    # Test unwatch
+    stream.unwatch("home-1")
+    home.toggle_device(0)
+    assert stream.last_seq == 6
+    
+    print("\nChangeStream testing completed successfully.")
+
+async def _long_poll_server():
+    """Long-poll the server while another request changes a device."""
+    home = _make_home()
+    server = SmartHomeServer([home], port=0)
+    await server.start()
+    try:
+        async def poll():
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(b"GET /changes?since=0&timeout=5 HTTP/1.1\r\nConnection: close\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            return json.loads(response.split(b"\r\n\r\n", 1)[1])
+        
+        poll_task = asyncio.create_task(poll())
+        await asyncio.sleep(0.05)
+        home.toggle_device(2)
+        result = await asyncio.wait_for(poll_task, 5)
+        print(result)
+        assert result == {"changes": [[1, 0, 2, "switched_on", True]], "cursor": 1, "reset": False}
+        
+        # Test invalid cursors
+        for path in (b"/changes?since=abc", b"/events?since=abc", b"/changes?since=0&limit=-1",
+                     b"/changes?since=0&limit=0", b"/changes?since=-1", b"/events?since=-1"):
+            print(f"\nRequesting {path.decode()}:")
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(b"GET " + path + b" HTTP/1.1\r\nConnection: close\r\n\r\n")
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            print(response.split(b"\r\n", 1)[0].decode())
+            assert response.startswith(b"HTTP/1.1 400 ")
+    finally:
+        await server.close()
+
+def test_change_stream_server():
+    """
+    Test the long-poll change endpoint of the SmartHome server.
+    
+    This function tests:
+    1. A pending long-poll returning as soon as a device changes
+    2. Rejecting an invalid or negative cursor on the long-poll and event
+       stream endpoints
+    3. Rejecting a limit below 1 on the long-poll endpoint
+    """
+    print("\n=== Testing Change Stream Long-Poll ===")
+    asyncio.run(_long_poll_server())
+    print("\nChange stream long-poll testing completed successfully.")
+
+if __name__ == "__main__":
+    test_change_stream()
+    test_change_stream_server()
@@ -0,0 +1,123 @@
+from command_journal import CommandJournal
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+
+def test_command_journal():
+    """
+    Test the functionality of the CommandJournal class.
+    
+    This function tests:
+    1. Undoing and redoing toggles and option updates
+    2. Undoing a switch-all as one step touching only the changed devices
+    3. Undoing device removal and addition at the right index
+    4. Grouping several commands into one step
+    5. Discarding redo steps after a new command and bounding the history
+    6. Keeping a step that fails to undo
+    """
+    print("\n=== Testing Command Journal ===")
+    
+    home = SmartHome(max_items=1000)
+    home.add_device(SmartPlug(45))
+    home.add_device(SmartOven())
+    home.add_device(SmartHeater())
+    journal = CommandJournal(home)
+    assert not journal.can_undo and not journal.undo()
+    
+    # Test toggles and option updates
+    print("\nToggling a plug and updating an oven, then undoing both:")
+    journal.toggle_device(0)
+    journal.update_option(1, 200)
+    print(home)
+    assert journal.undo() and home.get_device(1).temperature == 150
+    assert journal.undo() and not home.get_device(0).switched_on
+    assert not journal.can_undo and journal.can_redo
+    assert journal.redo() and home.get_device(0).switched_on
+    assert journal.redo() and home.get_device(1).temperature == 200
+    print(home)
+    
+    # Test invalid updates are not recorded
+    print("\nUpdating an option out of range:")
+    try:
+        journal.update_option(2, 10)
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    assert journal.undo() and home.get_device(1).temperature == 150
+    
+    # Test switch-all as one step
+    print("\nTurning all off in a home of 1000 devices, then undoing:")
+    big = SmartHome(max_items=1000)
+    for i in range(1000):
+        big.add_device(SmartPlug(i % 151))
+        if i % 10 == 0:
+            big.toggle_device(i)
+    big_journal = CommandJournal(big)
+    toggled = []
+    big.add_listener(toggled.append)
+    big_journal.switch_all_off()
+    assert not any(big.get_device(i).switched_on for i in range(1000))
+    before = len(toggled)
+    big_journal.undo()
+    touched = sum(len(events) for events in toggled[before:])
+    print(f"Undo touched {touched} devices")
+    assert touched == 100
+    assert [i for i in range(1000) if big.get_device(i).switched_on] == list(range(0, 1000, 10))
+    
+    # Test removal and addition
+    print("\nRemoving the oven and adding a heater, then undoing:")
+    oven = home.get_device(1)
+    journal.remove_device(1)
+    journal.add_device(SmartHeater(5))
+    print(home)
+    journal.undo()
+    journal.undo()
+    print(home)
+    assert len(home) == 3 and home.get_device(1) is oven
+    
+    # Test grouping
+    print("\nGrouping three commands into one step:")
+    with journal.group():
+        journal.toggle_device(2)
+        journal.update_option(2, 4)
+        journal.remove_device(0)
+    assert len(home) == 2
+    journal.undo()
+    print(home)
+    assert len(home) == 3 and not home.get_device(2).switched_on and home.get_device(2).setting == 2
+    
+    # Test redo is discarded by a new command
+    print("\nDiscarding redo after a new command:")
+    assert journal.can_redo
+    journal.toggle_device(1)
+    assert not journal.can_redo and not journal.redo()
+    
+    # Test the history limit
+    print("\nKeeping only the last 5 steps:")
+    short = CommandJournal(home, limit=5)
+    for _ in range(8):
+        short.toggle_device(0)
+    undone = 0
+    while short.undo():
+        undone += 1
+    assert undone == 5
+    try:
+        CommandJournal(home, limit=0)
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    # Test a failed undo keeps the step
+    print("\nUndoing a toggle of a device removed outside the journal:")
+    home.add_device(SmartPlug(5))
+    failing = CommandJournal(home)
+    failing.toggle_device(len(home) - 1)
+    home.remove_device(len(home) - 1)
+    try:
+        failing.undo()
+        assert False, "Expected an IndexError"
+    except IndexError as e:
+        print(f"Error caught: {e}")
+    assert failing.can_undo and not failing.can_redo
+    
+    print("\nCommand journal testing completed successfully.")
+
+if __name__ == "__main__":
+    test_command_journal()
@@ -0,0 +1,296 @@
+from device_types import (
+    DEVICE_TYPES, DeviceType, register_device_type, unregister_device_type,
+    get_device_type, device_type_for_code, device_type_of, from_columns, from_records, update_options
+)
+from smart_devices import SmartDevice, SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+
+class SmartLamp(SmartDevice):
+    """A dimmable lamp used to test registering a new device type."""
+    
+    def __init__(self, brightness=50):
+        super().__init__()
+        if not isinstance(brightness, int) or brightness < 0 or brightness > 100:
+            raise ValueError("Brightness must be an integer between 0 and 100")
+        self.brightness = brightness
+
+class FastOven(SmartOven):
+    """An oven subclass that is not registered itself."""
+
+class RecordingOven(SmartOven):
+    """An oven subclass overriding the temperature setter."""
+    
+    @property
+    def temperature(self):
+        return SmartOven.temperature.fget(self)
+    
+    @temperature.setter
+    def temperature(self, value):
+        SmartOven.temperature.fset(self, value)
+        self.recorded = value
+
+def test_device_type_registry():
+    """
+    Test the functionality of the device type registry.
+    
+    This function tests:
+    1. Looking up device types by name, code and device
+    2. Resolving an unregistered subclass to its registered ancestor
+    3. Creating devices and computing their power draw
+    4. Registering, using and unregistering a new device type
+    5. Handling unknown and duplicate device types
+    """
+    print("\n=== Testing Device Type Registry ===")
+    
+    # Test lookups
+    print("\nLooking up the built-in device types:")
+    for name, device_type in DEVICE_TYPES.items():
+        print(f"{name}: {device_type.option} {device_type.minimum}-{device_type.maximum}, "
+              f"default {device_type.default}, code {device_type.code}")
+        assert get_device_type(name) is device_type
+        assert device_type_for_code(device_type.code) is device_type
+    assert device_type_of(SmartPlug(45)).option == "consumption_rate"
+    assert device_type_of(SmartHeater()).option == "setting"
+    assert device_type_of(FastOven()) is get_device_type("SmartOven")
+    assert device_type_of(object()) is None
+    
+    # Test creating devices and power
+    print("\nCreating devices and computing their power draw:")
+    plug = get_device_type("SmartPlug").create()
+    heater = get_device_type("SmartHeater").create(3, switched_on=True)
+    oven = get_device_type("SmartOven").create(200, switched_on=True)
+    print(plug, heater, oven, sep="\n")
+    assert plug.consumption_rate == 45 and not plug.switched_on
+    assert device_type_of(plug).power(plug) == 0
+    assert device_type_of(heater).power(heater) == 1200
+    assert device_type_of(oven).power(oven) == 2000
+    
+    # Test registering a new device type
+    print("\nRegistering a SmartLamp device type:")
+    register_device_type(DeviceType(SmartLamp, "brightness", "Brightness", 0, 100, 50, 99, lambda b: b * 0.1))
+    try:
+        home = SmartHome()
+        home.add_device(get_device_type("SmartLamp").create())
+        home.update_option(0, 80)
+        assert home.get_device(0).brightness == 80
+        
+        print("\nRegistering SmartLamp twice:")
+        try:
+            register_device_type(DeviceType(SmartLamp, "brightness", "Brightness", 0, 100, 50, 98, abs))
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    finally:
+        unregister_device_type("SmartLamp")
+    assert "SmartLamp" not in DEVICE_TYPES and device_type_of(SmartLamp()) is None
+    
+    # Test updating an unregistered device
+    print("\nUpdating the option of an unregistered device:")
+    home.remove_device(0)
+    home.add_device(SmartLamp())
+    try:
+        home.update_option(0, 10)
+        assert False, "Expected an AttributeError"
+    except AttributeError as e:
+        print(f"Error caught: {e}")
+    
+    # Test unknown names and codes
+    print("\nLooking up unknown device types:")
+    for lookup, key in ((get_device_type, "SmartFridge"), (device_type_for_code, 0)):
+        try:
+            lookup(key)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    
+    print("\nDevice type registry testing completed successfully.")
+
+def test_bulk_device_factories():
+    """
+    Test the functionality of the bulk device factories.
+    
+    This function tests:
+    1. Building devices from columns of type codes, values and switch states
+    2. Reporting invalid rows while building the valid ones
+    3. Building devices from records
+    4. Rejecting invalid switch states
+    5. Adding devices to a home in bulk with a single notification
+    6. Rejecting a bulk add that exceeds the home's capacity
+    """
+    print("\n=== Testing Bulk Device Factories ===")
+    
+    # Test building from columns
+    print("\nBuilding a plug, an oven and a heater from columns:")
+    devices, errors = from_columns([1, 2, 3], [100, 200, 4], [True, False, True])
+    for device in devices:
+        print(device)
+    assert not errors
+    assert [str(device) for device in devices] == [
+        "SmartPlug is on with a consumption rate of 100",
+        "SmartOven is off with a temperature of 200",
+        "SmartHeater is on with a setting of 4",
+    ]
+    devices[1].temperature = 220
+    assert devices[1].temperature == 220
+    
+    # Test row errors
+    print("\nBuilding from columns with invalid rows:")
+    devices, errors = from_columns([1, 2, 9, 3, 3], [151, 260, 1, "2", 5], [0, 1, 0, 0, 1])
+    for row, message in errors:
+        print(f"Error caught: row {row}: {message}")
+    assert [row for row, _ in errors] == [0, 2, 3]
+    assert [str(device) for device in devices] == [
+        "SmartOven is on with a temperature of 260",
+        "SmartHeater is on with a setting of 5",
+    ]
+    
+    # Test invalid switch states
+    print("\nBuilding from columns and records with invalid switch states:")
+    devices, errors = from_columns([1, 2, 3], [10, 20, 3], ['0', 'off', True])
+    print(errors)
+    assert [row for row, _ in errors] == [0, 1] and len(devices) == 1
+    devices, errors = from_records([("SmartPlug", 10, 2), ("SmartPlug", 900, None)])
+    print(errors)
+    assert devices == [] and [row for row, _ in errors] == [0, 1, 1]
+    
+    # Test mismatched columns
+    try:
+        from_columns([1, 2], [1], [0, 0])
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    # Test building from records
+    print("\nBuilding from records:")
+    devices, errors = from_records([("SmartHeater", 1, False), ("SmartFridge", 3, True)])
+    print(errors)
+    assert len(devices) == 1 and errors == [(1, "Unknown device type: SmartFridge")]
+    
+    # Test bulk add
+    print("\nAdding 3 devices to a home in bulk:")
+    home = SmartHome(max_items=4)
+    notifications = []
+    home.add_listener(notifications.append)
+    devices, _ = from_columns([1, 2, 3], [10, 20, 3], [0, 0, 0])
+    home.add_devices(devices)
+    print(home)
+    assert len(home) == 3 and len(notifications) == 1
+    assert [(event.index, event.value) for event in notifications[0]] == [
+        (0, "SmartPlug"), (1, "SmartOven"), (2, "SmartHeater")
+    ]
+    
+    # Test exceeding capacity
+    print("\nAdding 2 more devices to a home with room for 1:")
+    try:
+        home.add_devices([SmartPlug(1), SmartPlug(2)])
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    assert len(home) == 3 and len(notifications) == 1
+    
+    print("\nBulk device factories testing completed successfully.")
+
+def test_bulk_option_updates():
+    """
+    Test the functionality of bulk option updates.
+    
+    This function tests:
+    1. Updating the options of devices of mixed types in one batch
+    2. Rejecting a batch with an invalid value without changing any device
+    3. Checking bools, values above 255 and values within one type's bounds only
+    4. Skipping validation for trusted batches and single updates
+    5. Updating devices of unregistered subclasses and rejecting unknown types
+    6. Going through overridden option setters of subclasses, even when trusted
+    7. Validating a type with a very wide option range
+    """
+    print("\n=== Testing Bulk Option Updates ===")
+    
+    # Test a valid batch
+    print("\nUpdating a plug, an oven and a heater:")
+    devices = [SmartPlug(10), SmartOven(100), SmartHeater(1)]
+    update_options(devices, [150, 0, 5])
+    for device in devices:
+        print(device)
+    assert [device_type_of(device).get_option(device) for device in devices] == [150, 0, 5]
+    
+    # Test an invalid batch
+    print("\nUpdating with an out-of-range heater setting:")
+    for values in ([20, 30, 6], [20, "30", 4], [20, 30, 4.0], [1, 2]):
+        try:
+            update_options(devices, values)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    assert [device_type_of(device).get_option(device) for device in devices] == [150, 0, 5]
+    
+    # Test the shared, per-type and row-by-row bound checks
+    print("\nUpdating with bools, values above 255 and values past one type's bounds:")
+    update_options(devices, [True, False, 1])
+    assert (devices[0].consumption_rate, devices[1].temperature) == (1, 0)
+    update_options(devices[1:2], [258])
+    assert devices[1].temperature == 258
+    update_options(devices, [150, 260, 5])
+    for values in ([151, 200, 5], [-1, 200, 5], [20, 261, 5]):
+        try:
+            update_options(devices, values)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    assert [device_type_of(device).get_option(device) for device in devices] == [150, 260, 5]
+    
+    # Test trusted updates
+    print("\nUpdating from a trusted source:")
+    update_options(devices, [1, 2, 3], trusted=True)
+    assert (devices[0].consumption_rate, devices[1].temperature, devices[2].setting) == (1, 2, 3)
+    get_device_type("SmartOven").set_option(devices[1], 250, trusted=True)
+    assert devices[1].temperature == 250
+    
+    # Test subclasses and unknown types
+    print("\nUpdating an unregistered oven subclass and a lamp:")
+    oven = FastOven(100)
+    update_options([oven, devices[0]], [260, 0])
+    assert oven.temperature == 260 and devices[0].consumption_rate == 0
+    try:
+        update_options([oven, SmartLamp()], [200, 60])
+        assert False, "Expected an AttributeError"
+    except AttributeError as e:
+        print(f"Error caught: {e}")
+    assert oven.temperature == 260
+    
+    # Test overridden setters
+    print("\nUpdating an oven subclass with its own temperature setter:")
+    recording = RecordingOven(100)
+    update_options([recording], [180])
+    assert recording.recorded == 180
+    update_options([recording, devices[1]], [190, 10], trusted=True)
+    assert recording.recorded == 190 and devices[1].temperature == 10
+    get_device_type("SmartOven").set_option(recording, 200, trusted=True)
+    assert recording.recorded == 200
+    home = SmartHome()
+    home.add_device(recording)
+    home.apply([("update_option", 0, 210)], trusted=True)
+    home.update_options([0], [220])
+    assert recording.recorded == 220
+    
+    # Test a wide option range
+    print("\nRegistering a lamp with a range of ten million values:")
+    register_device_type(DeviceType(SmartLamp, "brightness", "Brightness", 0, 10 ** 7, 50, 99, abs))
+    try:
+        lamps = [SmartLamp(), SmartLamp()]
+        update_options(lamps, [10 ** 7, 0])
+        assert lamps[0].brightness == 10 ** 7
+        try:
+            update_options(lamps, [1, 10 ** 7 + 1])
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        assert lamps[1].brightness == 0
+    finally:
+        unregister_device_type("SmartLamp")
+    
+    print("\nBulk option updates testing completed successfully.")
+
+if __name__ == "__main__":
+    test_device_type_registry()
+    test_bulk_device_factories()
+    test_bulk_option_updates()
\ No newline at end of file
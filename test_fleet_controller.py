@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from fleet_controller import ShardedController
+from fleet_generator import generate_fleet
+from smart_home_server import SmartHomeServer
+from test_smart_home_server import _request
+
+def test_sharded_controller():
+    """
+    Test the functionality of the ShardedController class.
+    
+    This function tests:
+    1. Routing homes to shards and running commands on them
+    2. Applying concurrent commands from many threads without losing updates
+    3. Running fleet-wide operations on every shard
+    4. Propagating errors from commands
+    5. Serving the API through the controller
+    6. Rejecting commands after closing
+    """
+    print("\n=== Testing Sharded Controller ===")
+    
+    fleet = generate_fleet(10, devices_per_home=4, on_ratio=0.0, seed=1)
+    controller = ShardedController(fleet, shard_count=3)
+    try:
+        # Test routing
+        print("\nRouting homes to shards:")
+        print([controller.shard_of(i) for i in range(len(fleet))])
+        assert controller.shard_of(4) == 1
+        names = controller.map(lambda home: threading.current_thread().name)
+        assert names[0] == names[3] == "shard-0" and names[2] == "shard-2"
+        assert controller.call(5, len) == 4
+        
+        # Test concurrent commands
+        print("\nIncrementing per-home counters from 8 threads at once:")
+        counters = [0] * len(fleet)
+        def increment(home, home_id):
+            value = counters[home_id]
+            time.sleep(0)
+            counters[home_id] = value + 1
+        def increment_many(thread_number):
+            for i in range(100):
+                controller.call((thread_number + i) % 10, increment, (thread_number + i) % 10)
+        threads = [threading.Thread(target=increment_many, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(counters)
+        assert counters == [80] * 10
+        
+        # Test fleet-wide operations
+        print("\nSwitching the whole fleet on:")
+        assert controller.switch_all(True) == 10
+        assert all(controller.map(lambda home: all(
+            home.get_device(i).switched_on for i in range(len(home))
+        )))
+        controller.switch_all(False)
+        assert sum(controller.map(lambda home: sum(
+            home.get_device(i).switched_on for i in range(len(home))
+        ))) == 0
+        
+        # Test error propagation
+        print("\nUpdating an option out of range:")
+        try:
+            controller.update_option(0, 0, 1000)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        try:
+            controller.call(10, len)
+            assert False, "Expected an IndexError"
+        except IndexError as e:
+            print(f"Error caught: {e}")
+        
+        # Test serving through the controller
+        print("\nServing the API through the controller:")
+        async def exercise():
+            server = SmartHomeServer(fleet, port=0, controller=controller)
+            await server.start()
+            try:
+                reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+                status, _, body = await _request(reader, writer, "POST", "/homes/4/devices/1/toggle")
+                assert status == 200 and body["switched_on"] is True
+                status, _, body = await _request(reader, writer, "GET", "/homes")
+                assert status == 200 and body[4] == {"id": 4, "devices": 4, "on": 1}
+                status, _, body = await _request(reader, writer, "GET", "/homes/12")
+                print(status, body)
+                assert status == 404
+                writer.close()
+            finally:
+                await server.close()
+        asyncio.run(exercise())
+        assert fleet[4].get_device(1).switched_on
+    finally:
+        controller.close()
+    
+    # Test closed controller
+    print("\nSubmitting to a closed controller:")
+    try:
+        controller.call(0, len)
+        assert False, "Expected a RuntimeError"
+    except RuntimeError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nSharded controller testing completed successfully.")
+
+if __name__ == "__main__":
+    test_sharded_controller()
@@ -0,0 +1,140 @@
+import time
+from fleet_dashboard import FleetDataSource
+from fleet_generator import generate_fleet
+from smart_devices import SmartOven
+
+def _indices(source):
+    """Get the home indices of every page of a data source."""
+    return [row[0] for page in range(source.page_count) for row in source.page(page)]
+
+def test_fleet_data_source():
+    """
+    Test the functionality of the FleetDataSource class.
+    
+    This function tests:
+    1. Paging home summaries
+    2. Sorting by device count, on-count and power
+    3. Searching by home label and device type, and narrowing a search
+    4. Refreshing summaries and search keys when homes change
+    5. Listing the devices of a home
+    6. Picking up appended homes
+    7. Handling 100,000 homes
+    8. Rejecting invalid pages, columns and page sizes
+    """
+    print("\n=== Testing FleetDataSource Class ===")
+    
+    fleet = generate_fleet(50, seed=3)
+    source = FleetDataSource(fleet, page_size=20)
+    
+    # Test paging
+    print("\nPaging 50 homes by 20:")
+    assert len(source) == 50 and source.page_count == 3
+    first = source.page(0)
+    assert [row[0] for row in first] == list(range(20))
+    assert len(source.page(2)) == 10
+    index, devices, on, power = first[0]
+    assert devices == len(fleet[0])
+    assert on == sum(1 for j in range(len(fleet[0])) if fleet[0].get_device(j).switched_on)
+    print(f"First row: {first[0]}")
+    
+    # Test sorting
+    print("\nSorting by power, largest first:")
+    source.set_sort("power", descending=True)
+    powers = [row[3] for page in range(source.page_count) for row in source.page(page)]
+    assert powers == sorted(powers, reverse=True)
+    print(f"Top rows: {source.page(0)[:3]}")
+    source.set_sort("devices")
+    counts = [row[1] for row in source.page(0)]
+    assert counts == sorted(counts)
+    source.set_sort("home", descending=True)
+    assert source.page(0)[0][0] == 49
+    
+    # Test searching
+    print("\nSearching for homes with an oven:")
+    source.set_sort("home")
+    source.set_query("Oven")
+    ovens = _indices(source)
+    assert ovens and all(
+        any(isinstance(fleet[i].get_device(j), SmartOven) for j in range(len(fleet[i]))) for i in ovens
+    )
+    source.set_query("oven home 1")
+    assert set(_indices(source)) <= set(ovens)
+    print(f"Narrowed to homes {_indices(source)}")
+    source.set_query("no such device")
+    assert len(source) == 0 and source.page_count == 1 and source.page(0) == []
+    source.set_query("")
+    assert len(source) == 50
+    
+    # Test refreshing on changes
+    print("\nChanging a home:")
+    version = source.version
+    fleet[3].switch_all_off()
+    fleet[3].add_device(SmartOven(200))
+    fleet[3].toggle_device(len(fleet[3]) - 1)
+    assert source.version > version
+    assert source.page(0)[3][1:] == (len(fleet[3]), 1, 2000)
+    source.set_query("oven")
+    assert 3 in _indices(source)
+    source.set_sort("power", descending=True)
+    print(f"Top rows: {source.page(0)[:3]}")
+    
+    # Test device rows
+    print("\nListing the devices of home 3:")
+    rows = source.devices(3)
+    assert rows[-1] == (len(fleet[3]) - 1, "SmartOven", "Temperature: 200", True, 2000)
+    for row in rows:
+        print(row)
+    
+    # Test appended homes
+    print("\nAppending homes:")
+    fleet += generate_fleet(5, seed=4)
+    source.set_query("")
+    assert len(source) == 50
+    source.sync()
+    assert len(source) == 55
+    
+    # Test closing
+    source.close()
+    version = source.version
+    fleet[0].toggle_device(0)
+    assert source.version == version
+    
+    # Test a large fleet
+    print("\nSorting and searching 100,000 homes:")
+    large = generate_fleet(100000, seed=5)
+    start = time.perf_counter()
+    large_source = FleetDataSource(large)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    large_source.set_sort("on", descending=True)
+    large_source.page(0)
+    large_source.set_query("heater")
+    large_source.set_query("heater plug")
+    page = large_source.page(large_source.page_count - 1)
+    queried = time.perf_counter() - start
+    print(f"Summaries: {built:.3f} s, sort and search: {queried:.3f} s, {len(large_source)} matches")
+    assert page and len(large_source) < 100000
+    large_source.close()
+    
+    # Test invalid arguments
+    print("\nRequesting an invalid page, column and page size:")
+    try:
+        large_source.page(-1)
+        assert False, "Expected an IndexError"
+    except IndexError as e:
+        print(f"Error caught: {e}")
+    try:
+        large_source.set_sort("name")
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    try:
+        FleetDataSource(fleet, page_size=0)
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nFleetDataSource testing completed successfully.")
+
+if __name__ == "__main__":
+    test_fleet_data_source()
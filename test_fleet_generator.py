@@ -0,0 +1,134 @@
+import os
+import tempfile
+from fleet_generator import (
+    generate_fleet, write_fleet, generate_operations, save_operations, load_operations, replay
+)
+from smart_homes_store import load_smart_homes, import_smart_homes
+from store_codecs import CODECS
+
+class FakeClock:
+    """A clock that only advances when sleep() is called."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_fleet_generator():
+    """
+    Test the functionality of the fleet generator and load-replay harness.
+    
+    This function tests:
+    1. Generating the same fleet from the same seed
+    2. Honouring the device count and type mix, and rejecting counts the
+       stores cannot load back
+    3. Writing a fleet to a single store and to shards
+    4. Generating, recording and reloading an operation stream
+    5. Replaying operations and reporting throughput and latency
+    6. Pacing a replay at a target rate, and rejecting rates that are not positive
+    """
+    print("\n=== Testing Fleet Generator ===")
+    
+    # Test determinism
+    print("\nGenerating two fleets with the same seed:")
+    first = generate_fleet(20, seed=7)
+    second = generate_fleet(20, seed=7)
+    assert [str(home) for home in first] == [str(home) for home in second]
+    assert [str(home) for home in first] != [str(home) for home in generate_fleet(20, seed=8)]
+    print(f"Generated {len(first)} homes with {sum(len(home) for home in first)} devices")
+    
+    # Test device count and mix
+    print("\nGenerating ovens only, 10 per home:")
+    ovens = generate_fleet(3, devices_per_home=10, mix={"SmartOven": 1})
+    assert all(len(home) == 10 for home in ovens)
+    assert all(type(home.get_device(i)).__name__ == "SmartOven" for home in ovens for i in range(10))
+    
+    # Test device counts beyond a home's capacity
+    print("\nGenerating 12 to 15 devices per home:")
+    try:
+        generate_fleet(3, devices_per_home=(12, 15))
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    # Test unknown device type
+    print("\nGenerating an unknown device type:")
+    try:
+        generate_fleet(1, mix={"SmartFridge": 1})
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        # Test writing a single store
+        print("\nWriting the fleet to one store file:")
+        path = os.path.join(directory, "fleet.csv")
+        assert write_fleet(first, path) == [path]
+        loaded, errors = load_smart_homes(path)
+        assert not errors
+        assert [str(home) for home in loaded] == [str(home) for home in first]
+        
+        # Test a round trip through every store format
+        print("\nWriting full homes in every store format:")
+        full = generate_fleet(5, devices_per_home=(9, 10), seed=4)
+        for store_format, codec in CODECS.items():
+            store = os.path.join(directory, "full" + codec.extension)
+            write_fleet(full, store, store_format)
+            loaded, errors = codec.load(store)
+            assert not errors, errors
+            assert [str(home) for home in loaded] == [str(home) for home in full]
+        
+        # Test writing shards
+        print("\nWriting the fleet to shards of 8 homes:")
+        paths = write_fleet(first, os.path.join(directory, "shards"), homes_per_file=8)
+        assert len(paths) == 3
+        loaded, errors = import_smart_homes(paths, max_workers=1)
+        assert len(loaded) == 20 and not errors
+        
+        # Test unsupported format
+        print("\nWriting an unsupported store format:")
+        try:
+            write_fleet(first, path, store_format="xml")
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        
+        # Test operation streams
+        print("\nGenerating and recording 500 operations:")
+        operations = generate_operations(first, 500, seed=3)
+        assert operations == generate_operations(first, 500, seed=3)
+        assert {kind for _, _, kind, _ in operations} == {"toggle", "option"}
+        record = os.path.join(directory, "operations.csv")
+        save_operations(operations, record)
+        assert load_operations(record) == operations
+    
+    # Test replay
+    print("\nReplaying the operations as fast as possible:")
+    report = replay(first, operations)
+    print(f"{report['throughput']:.0f} ops/s, p50 {report['p50'] * 1e6:.1f} us, p99 {report['p99'] * 1e6:.1f} us")
+    assert report["operations"] == 500 and report["errors"] == 0
+    assert report["p50"] <= report["p99"] <= report["p999"] <= report["max"]
+    
+    # Test paced replay
+    print("\nReplaying 10 operations at 100 ops/s on a fake clock:")
+    clock = FakeClock()
+    report = replay(first, operations[:10], rate=100, clock=clock, sleep=clock.sleep)
+    assert abs(report["seconds"] - 0.09) < 1e-9
+    assert report["max"] == 0.0
+    
+    # Test invalid rates
+    for rate in (0, -5):
+        try:
+            replay(first, operations[:10], rate=rate)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    
+    print("\nFleet generator testing completed successfully.")
+
+if __name__ == "__main__":
+    test_fleet_generator()
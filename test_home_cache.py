@@ -0,0 +1,67 @@
+from home_cache import HomeCache
+
+def test_home_cache():
+    """
+    Test the functionality of the HomeCache class.
+    
+    This function tests:
+    1. Caching values and counting hits and misses
+    2. Evicting the least recently used value on overflow
+    3. Refreshing recency on lookup
+    4. Taking values out without evicting them
+    5. Discarding and clearing
+    6. Rejecting an invalid capacity
+    """
+    print("\n=== Testing HomeCache ===")
+    
+    evicted = []
+    cache = HomeCache(2, evict=lambda home_id, value: evicted.append((home_id, value)))
+    
+    # Test put and get
+    print("\nCaching two homes:")
+    cache.put(0, "view 0")
+    cache.put(1, "view 1")
+    assert len(cache) == 2 and 0 in cache
+    assert cache.get(0) == "view 0"
+    assert cache.get(5) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    
+    # Test eviction of the least recently used value
+    print("\nCaching a third home evicts the least recently used:")
+    cache.put(2, "view 2")
+    assert evicted == [(1, "view 1")]
+    assert 1 not in cache and 0 in cache and 2 in cache
+    print(f"Evicted: {evicted}")
+    
+    # Test replacing a value
+    print("\nReplacing a cached value:")
+    cache.put(2, "view 2b")
+    assert cache.get(2) == "view 2b" and len(evicted) == 1
+    
+    # Test pop
+    print("\nTaking a value out of the cache:")
+    assert cache.pop(0) == "view 0"
+    assert 0 not in cache and len(evicted) == 1
+    assert cache.pop(0, "missing") == "missing"
+    
+    # Test discard and clear
+    print("\nDiscarding and clearing:")
+    cache.put(3, "view 3")
+    cache.discard(2)
+    cache.discard(2)
+    assert evicted[-1] == (2, "view 2b")
+    cache.clear()
+    assert len(cache) == 0 and evicted[-1] == (3, "view 3")
+    
+    # Test invalid capacity
+    print("\nCreating a cache with capacity 0:")
+    try:
+        HomeCache(0)
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nHomeCache testing completed successfully.")
+
+if __name__ == "__main__":
+    test_home_cache()
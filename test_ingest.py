@@ -0,0 +1,175 @@
+import asyncio
+import os
+import tempfile
+import time
+from device_types import device_type_of
+from fleet_generator import generate_fleet, generate_operations
+from ingest import IngestPipeline, encode_report
+
+def _reports(fleet, operations):
+    """Turn generated operations into state reports, applying them to the fleet."""
+    lines = []
+    for home_index, device_index, kind, value in operations:
+        home = fleet[home_index]
+        device = home.get_device(device_index)
+        if kind == "toggle":
+            home.toggle_device(device_index)
+            lines.append(encode_report(home_index, device_index, "switched_on", device.switched_on))
+        else:
+            home.update_option(device_index, value)
+            lines.append(encode_report(home_index, device_index, device_type_of(device).option, value))
+    return lines
+
+def _same(fleet, expected):
+    """Check whether two fleets are in the same state."""
+    return [str(home) for home in fleet] == [str(home) for home in expected]
+
+async def _ingest():
+    """Feed reports to a pipeline from a file and over a socket."""
+    fleet = generate_fleet(50, seed=8)
+    expected = generate_fleet(50, seed=8)
+    notifications = []
+    fleet[0].add_listener(notifications.append)
+    pipeline = IngestPipeline(fleet, queue_size=2, batch_size=100)
+    await pipeline.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # Test a file source
+            print("\nIngesting 2000 reports from a file:")
+            path = os.path.join(directory, "feed.jsonl")
+            lines = _reports(expected, generate_operations(expected, 2000, seed=8))
+            with open(path, "wb") as file:
+                file.write(b"".join(lines))
+            await pipeline.ingest_file(path, chunk_size=1000)
+            await pipeline.flush()
+            print(f"Received {pipeline.received}, superseded {pipeline.superseded}, "
+                  f"applied {pipeline.applied}")
+            assert _same(fleet, expected)
+            assert pipeline.received == 2000 and pipeline.rejected == 0 and pipeline.malformed == 0
+            assert pipeline.superseded + pipeline.applied == 2000
+            
+            # Test coalescing
+            print("\nReporting one device 1000 times in one chunk:")
+            applied = pipeline.applied
+            notified = len(notifications)
+            lines = [encode_report(0, 0, "switched_on", i % 2 == 0) for i in range(1000)]
+            await pipeline.ingest(_chunks([b"".join(lines)]))
+            await pipeline.flush()
+            assert pipeline.applied == applied + 1 and not fleet[0].get_device(0).switched_on
+            assert len(notifications) <= notified + 1
+        
+        # Test invalid reports
+        print("\nIngesting malformed and invalid reports:")
+        option = device_type_of(fleet[1].get_device(0)).option
+        feed = b"".join([
+            b"not json\n",
+            b"\n",
+            b"[1, 2]\n",
+            encode_report(99, 0, "switched_on", True),
+            encode_report(1, 99, "switched_on", True),
+            encode_report(1, 0, "switched_on", "yes"),
+            encode_report(1, 0, "brightness", 3),
+            encode_report(1, 0, option, -1),
+            encode_report(1, 0, option, 1),
+            encode_report(2, 0, "switched_on", True),
+        ])
+        received, rejected, superseded = pipeline.received, pipeline.rejected, pipeline.superseded
+        await pipeline.ingest(_chunks([feed[:25], feed[25:]]))
+        await pipeline.flush()
+        print(f"Malformed {pipeline.malformed}, rejected {pipeline.rejected - rejected}")
+        assert pipeline.received == received + 9 and pipeline.malformed == 2
+        assert pipeline.rejected == rejected + 4 and pipeline.superseded == superseded + 1
+        assert device_type_of(fleet[1].get_device(0)).get_option(fleet[1].get_device(0)) == 1
+        assert fleet[2].get_device(0).switched_on
+        
+        # Test lines that only form reports when joined
+        print("\nIngesting reports split across lines:")
+        received, malformed = pipeline.received, pipeline.malformed
+        await pipeline.ingest(_chunks([
+            b'[0,0,"switched_on",true],[0,1\n"switched_on",true]\n',
+            b'[1,[2]\n[3]]\n[4,0,"switched_on",true],[5,0,"switched_on",true]\n',
+        ]))
+        await pipeline.flush()
+        print(f"Malformed {pipeline.malformed - malformed}")
+        assert pipeline.received == received + 5 and pipeline.malformed == malformed + 5
+        
+        # Test a socket source
+        print("\nIngesting reports over two connections:")
+        await pipeline.serve()
+        lines = _reports(expected, generate_operations(expected, 3000, seed=9))
+        received = pipeline.received
+        for part in (lines[:1500], lines[1500:]):
+            _, writer = await asyncio.open_connection("127.0.0.1", pipeline.port)
+            writer.write(b"".join(part))
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+            while pipeline.received < received + len(part):
+                await asyncio.sleep(0.01)
+            received += len(part)
+        await pipeline.flush()
+        assert [str(home) for home in fleet[3:]] == [str(home) for home in expected[3:]]
+    finally:
+        await pipeline.close()
+
+def _chunks(chunks):
+    """Make a coroutine function returning chunks one by one, then b""."""
+    chunks = list(chunks)
+    async def read():
+        return chunks.pop(0) if chunks else b""
+    return read
+
+async def _throughput():
+    """Ingest 200,000 reports into 10,000 homes from a file."""
+    fleet = generate_fleet(10000, seed=10)
+    expected = generate_fleet(10000, seed=10)
+    lines = _reports(expected, generate_operations(expected, 200000, seed=10))
+    pipeline = IngestPipeline(fleet)
+    await pipeline.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "feed.jsonl")
+            with open(path, "wb") as file:
+                file.write(b"".join(lines))
+            start = time.perf_counter()
+            await pipeline.ingest_file(path)
+            await pipeline.flush()
+            elapsed = time.perf_counter() - start
+        print(f"{len(lines) / elapsed:,.0f} reports per second")
+        assert _same(fleet, expected)
+    finally:
+        await pipeline.close()
+
+def test_ingest_pipeline():
+    """
+    Test the functionality of the IngestPipeline class.
+    
+    This function tests:
+    1. Ingesting state reports from a file in chunks split mid-line
+    2. Coalescing repeated reports of a device field, last report winning
+    3. Counting malformed and rejecting invalid reports without losing valid ones,
+       including lines that are only valid when joined with their neighbours
+    4. Ingesting reports over socket connections
+    5. Sustaining a high report rate into a large fleet
+    6. Rejecting invalid queue and batch sizes
+    """
+    print("\n=== Testing IngestPipeline Class ===")
+    
+    asyncio.run(_ingest())
+    
+    # Test throughput
+    print("\nIngesting 200,000 reports into 10,000 homes:")
+    asyncio.run(_throughput())
+    
+    # Test invalid sizes
+    print("\nCreating a pipeline with an empty queue:")
+    try:
+        IngestPipeline([], queue_size=0)
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nIngestPipeline testing completed successfully.")
+
+if __name__ == "__main__":
+    test_ingest_pipeline()
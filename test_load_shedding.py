@@ -0,0 +1,144 @@
+from fleet_generator import generate_fleet, generate_operations
+from load_shedding import LoadShedder, rated_power
+from replication import OpLog, apply_change
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+
+def _drawn(home):
+    """Add up the power of a home's switched-on devices by rescanning it."""
+    return sum(rated_power(home.get_device(i)) for i in range(len(home)) if home.get_device(i).switched_on)
+
+def test_load_shedding():
+    """
+    Test the functionality of the LoadShedder class.
+    
+    This function tests:
+    1. Keeping a running power total over device events
+    2. Shedding the lowest-priority, most recently switched-on devices first
+    3. Restoring shed devices when power frees up
+    4. Delivering each round of shedding as one notification
+    5. Changing budgets and device priorities
+    6. Shedding only the devices whose removal is needed, without flapping
+    7. Logging shed events after the events that triggered them
+    8. Staying under budget across a fleet of random operations
+    9. Rejecting invalid budgets
+    """
+    print("\n=== Testing LoadShedder Class ===")
+    
+    home = SmartHome()
+    home.add_devices([SmartPlug(100), SmartHeater(3), SmartOven(150), SmartPlug(50)])
+    notifications = []
+    home.add_listener(notifications.append)
+    shedder = LoadShedder(2000)
+    shedder.watch(home)
+    assert shedder.power(home) == 0
+    
+    # Test the running total
+    print("\nSwitching on the oven and a plug:")
+    home.toggle_device(2)
+    home.toggle_device(0)
+    print(f"Power: {shedder.power(home)} W")
+    assert shedder.power(home) == 1600 and shedder.shed_devices(home) == []
+    
+    # Test shedding
+    print("\nSwitching on the heater over the 2000 W budget:")
+    home.toggle_device(1)
+    print(f"Power: {shedder.power(home)} W, shed: {shedder.shed_devices(home)}")
+    assert shedder.shed_devices(home) == [1] and shedder.power(home) == 1600
+    assert len(notifications) == 4
+    assert [(event.index, event.value) for event in notifications[-1]] == [(1, False)]
+    
+    # Test restoring
+    print("\nSwitching the oven off:")
+    home.toggle_device(2)
+    print(f"Power: {shedder.power(home)} W, shed: {shedder.shed_devices(home)}")
+    assert shedder.shed_devices(home) == [] and shedder.power(home) == 1300
+    assert (shedder.shed_count, shedder.restore_count) == (1, 1)
+    
+    # Test option updates
+    print("\nRaising the heater setting to 5:")
+    home.update_option(1, 5)
+    print(f"Power: {shedder.power(home)} W, shed: {shedder.shed_devices(home)}")
+    assert shedder.power(home) == 2000 and shedder.shed_devices(home) == [0]
+    
+    # Test budgets and priorities
+    print("\nRaising the budget to 3000 W:")
+    shedder.set_budget(home, 3000)
+    assert shedder.shed_devices(home) == [] and shedder.power(home) == 2100
+    
+    print("\nGiving the first plug top priority and switching on everything:")
+    shedder.set_priority(home, 0, 10)
+    home.switch_all_on()
+    print(f"Power: {shedder.power(home)} W, shed: {shedder.shed_devices(home)}")
+    assert shedder.shed_devices(home) == [1] and shedder.power(home) == 1650
+    
+    # Test additions and removals
+    print("\nRemoving a shed device and adding an oven:")
+    home.remove_device(3)
+    home.add_device(SmartOven(100))
+    home.toggle_device(3)
+    assert shedder.power(home) == _drawn(home) <= 3000
+    assert shedder.shed_devices(home) == [1]
+    
+    # Test unwatching
+    print("\nUnwatching the home and switching the heater back on:")
+    shedder.unwatch(home)
+    home.toggle_device(1)
+    assert home.get_device(1).switched_on and _drawn(home) > 3000
+    
+    # Test that only the needed devices are shed
+    print("\nSwitching on a 150 W and a 10 W plug together under a 100 W budget:")
+    plugs = SmartHome()
+    plugs.add_devices([SmartPlug(150), SmartPlug(10)])
+    plug_shedder = LoadShedder(100)
+    plug_shedder.watch(plugs)
+    plugs.apply([("toggle", 0), ("toggle", 1)])
+    print(f"Power: {plug_shedder.power(plugs)} W, shed: {plug_shedder.shed_devices(plugs)}")
+    assert plug_shedder.shed_devices(plugs) == [0] and plug_shedder.power(plugs) == 10
+    assert (plug_shedder.shed_count, plug_shedder.restore_count) == (1, 0)
+    
+    # Test event order for listeners registered after the shedder
+    print("\nReplaying an op log registered after the shedder:")
+    logged = SmartHome()
+    logged.add_device(SmartOven(200))
+    LoadShedder(1000).watch(logged)
+    log = OpLog()
+    log.watch(0, logged)
+    logged.toggle_device(0)
+    changes, _, _ = log.changes_since(0)
+    print([(change[3], change[4]) for change in changes])
+    assert [change[4] for change in changes] == [True, False]
+    replica = SmartHome()
+    replica.add_device(SmartOven(200))
+    for change in changes:
+        apply_change([replica], change)
+    assert str(replica) == str(logged) and not logged.get_device(0).switched_on
+    
+    # Test a fleet
+    print("\nReplaying 5000 operations on 200 homes with a 1500 W budget:")
+    fleet = generate_fleet(200, seed=7)
+    fleet_shedder = LoadShedder(1500)
+    for smart_home in fleet:
+        fleet_shedder.watch(smart_home)
+    for home_index, device_index, kind, value in generate_operations(fleet, 5000, seed=7):
+        smart_home = fleet[home_index]
+        if kind == "toggle":
+            smart_home.toggle_device(device_index)
+        else:
+            smart_home.update_option(device_index, value)
+        assert fleet_shedder.power(smart_home) == _drawn(smart_home) <= 1500
+    print(f"Shed {fleet_shedder.shed_count} and restored {fleet_shedder.restore_count} devices")
+    assert fleet_shedder.shed_count > 0
+    
+    # Test invalid budgets
+    print("\nCreating a shedder with a negative budget:")
+    try:
+        LoadShedder(-1)
+        assert False, "Expected a ValueError"
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nLoadShedder testing completed successfully.")
+
+if __name__ == "__main__":
+    test_load_shedding()
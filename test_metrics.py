@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import types
+import urllib.request
+import smart_homes_app
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from smart_homes_store import save_smart_homes
+from metrics import (
+    MetricsRegistry, 
+    instrument, 
+    uninstrument, 
+    is_instrumented, 
+    serve_metrics, 
+    profile_session
+)
+
+def test_metrics():
+    """
+    Test the instrumentation hooks and metrics registry.
+    
+    This function tests:
+    1. Counting operations per operation and device type while enabled
+    2. Restoring the original methods when disabled
+    3. Instrumenting store functions imported by other modules, including
+       modules imported while instrumentation is enabled
+    4. Exporting the Prometheus text format to a file and over HTTP
+    5. Profiling a session with cProfile and tracemalloc
+    """
+    print("\n=== Testing Metrics and Instrumentation ===")
+    
+    registry = MetricsRegistry()
+    original_toggle = SmartHome.toggle_device
+    home = SmartHome()
+    home.add_device(SmartPlug(45))
+    home.add_device(SmartOven())
+    
+    with tempfile.TemporaryDirectory() as directory:
+        # Test counting while enabled
+        print("\nRecording operations while instrumented:")
+        instrument(registry)
+        try:
+            assert is_instrumented()
+            home.toggle_device(0)
+            home.toggle_device(0)
+            home.update_option(1, 200)
+            home.update_option(index=1, value=210)
+            home.add_device(SmartHeater())
+            home.switch_all_on()
+            smart_homes_app.save_smart_homes([home], os.path.join(directory, "homes.csv"))
+            late = sys.modules["late_importer"] = types.ModuleType("late_importer")
+            late.save_smart_homes = smart_homes_app.save_smart_homes
+        finally:
+            uninstrument()
+            sys.modules.pop("late_importer", None)
+        
+        assert registry.count("toggle_device", "SmartPlug") == 2
+        assert registry.count("update_option", "SmartOven") == 2
+        assert registry.count("add_device", "SmartHeater") == 1
+        assert registry.count("switch_all_on", "all") == 1
+        assert registry.count("save_smart_homes", "all") == 1
+        
+        # Test disabling
+        print("\nRecording nothing once disabled:")
+        assert not is_instrumented() and SmartHome.toggle_device is original_toggle
+        assert smart_homes_app.save_smart_homes is save_smart_homes
+        assert late.save_smart_homes is save_smart_homes
+        home.toggle_device(0)
+        assert registry.count("toggle_device", "SmartPlug") == 2
+        
+        # Test Prometheus export
+        print("\nExporting in Prometheus text format:")
+        text = registry.to_prometheus()
+        print(text.splitlines()[2])
+        assert 'smart_home_operations_total{operation="toggle_device",device_type="SmartPlug"} 2' in text
+        assert 'smart_home_operation_seconds_bucket{operation="toggle_device",device_type="SmartPlug",le="+Inf"} 2' in text
+        path = os.path.join(directory, "metrics.prom")
+        registry.write_prometheus(path)
+        with open(path) as file:
+            assert file.read() == text
+        
+        server = serve_metrics(registry, port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                assert response.read().decode("utf-8") == text
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        # Test profiling
+        print("\nProfiling a session:")
+        prefix = os.path.join(directory, "session")
+        with profile_session(prefix):
+            for _ in range(100):
+                home.switch_all_off()
+                home.switch_all_on()
+        assert os.path.exists(prefix + ".prof") and os.path.exists(prefix + ".memory.txt")
+    
+    print("\nMetrics testing completed successfully.")
+
+if __name__ == "__main__":
+    test_metrics()
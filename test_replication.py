@@ -0,0 +1,151 @@
+import asyncio
+import os
+import tempfile
+from fleet_generator import generate_fleet
+from replication import ReplicationPrimary, ReplicationReplica, apply_change
+from smart_devices import SmartOven, SmartPlug
+from smart_home import SmartHome
+from smart_homes_store import save_smart_homes, load_smart_homes
+
+def _same(replica, fleet):
+    """Check whether a replica's homes match the primary's."""
+    return [str(home) for home in replica.smart_homes] == [str(home) for home in fleet]
+
+async def _replicate():
+    """Replicate a fleet to replicas joining empty, resuming and from a store."""
+    fleet = generate_fleet(300, seed=2)
+    primary = ReplicationPrimary(fleet, capacity=50)
+    await primary.start()
+    try:
+        # Test the initial snapshot
+        print("\nStarting an empty replica:")
+        replica = ReplicationReplica("127.0.0.1", primary.port)
+        task = asyncio.create_task(replica.run())
+        await replica.wait_for(0, timeout=5)
+        assert _same(replica, fleet) and replica.snapshots == 1
+        snapshot_bytes = replica.bytes_received
+        print(f"Snapshot: {snapshot_bytes} bytes")
+        
+        # Test streaming changes
+        print("\nStreaming toggles, option updates and device changes:")
+        fleet[0].toggle_device(0)
+        fleet[1].add_device(SmartOven(180))
+        fleet[2].remove_device(0)
+        fleet[3].switch_all_on()
+        fleet[4].update_option(0, 3)
+        for home in fleet[4:10]:
+            home.toggle_device(len(home) - 1)
+        await replica.wait_for(primary.log.last_seq, timeout=5)
+        assert _same(replica, fleet) and replica.lag == 0
+        change_bytes = replica.bytes_received - snapshot_bytes
+        print(f"{primary.log.last_seq} changes: {change_bytes} bytes")
+        assert change_bytes * 10 < snapshot_bytes
+        
+        # Test changes from another thread
+        print("\nChanging homes from another thread:")
+        def change():
+            with primary.lock:
+                for home in fleet[10:20]:
+                    home.switch_all_off()
+        await asyncio.to_thread(change)
+        await replica.wait_for(primary.log.last_seq, timeout=5)
+        assert _same(replica, fleet)
+        
+        # Test resuming from a sequence number
+        print("\nResuming a disconnected replica:")
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        for home in fleet[:5]:
+            home.toggle_device(0)
+        resumed = ReplicationReplica("127.0.0.1", primary.port, replica.smart_homes, replica.last_seq)
+        task = asyncio.create_task(resumed.run())
+        await resumed.wait_for(primary.log.last_seq, timeout=5)
+        assert _same(resumed, fleet) and resumed.snapshots == 0
+        print(f"Caught up with {resumed.bytes_received} bytes")
+        
+        # Test falling out of the retained window
+        print("\nResuming after more changes than the op log retains:")
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        for _ in range(30):
+            fleet[0].toggle_device(0)
+            fleet[1].toggle_device(0)
+        stale = ReplicationReplica("127.0.0.1", primary.port, resumed.smart_homes, resumed.last_seq)
+        task = asyncio.create_task(stale.run())
+        await stale.wait_for(primary.log.last_seq, timeout=5)
+        assert _same(stale, fleet) and stale.snapshots == 1
+        
+        # Test catching up from a store copy
+        print("\nCatching up from a copy of the store:")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "smart_homes.csv")
+            with primary.lock:
+                save_smart_homes(fleet, path)
+                seq = primary.log.last_seq
+            fleet[5].update_option(0, 2)
+            homes, errors = load_smart_homes(path)
+        assert not errors
+        standby = ReplicationReplica("127.0.0.1", primary.port, homes, seq)
+        standby_task = asyncio.create_task(standby.run())
+        await standby.wait_for(primary.log.last_seq, timeout=5)
+        assert _same(standby, fleet) and standby.snapshots == 0
+        
+        # Test shutting down
+        print("\nClosing the primary:")
+    finally:
+        await primary.close()
+    await asyncio.wait_for(asyncio.gather(task, standby_task), 5)
+
+async def _replicate_capacity():
+    """Grow a large home on the primary past the default capacity."""
+    big = SmartHome(max_items=30)
+    big.add_device(SmartPlug(10))
+    primary = ReplicationPrimary([big])
+    await primary.start()
+    try:
+        replica = ReplicationReplica("127.0.0.1", primary.port)
+        task = asyncio.create_task(replica.run())
+        await replica.wait_for(0, timeout=5)
+        for rate in range(20):
+            big.add_device(SmartPlug(rate))
+        await replica.wait_for(primary.log.last_seq, timeout=5)
+        print(f"Replica home: {len(replica.smart_homes[0])} devices, max {replica.smart_homes[0].max_items}")
+        assert _same(replica, [big]) and replica.smart_homes[0].max_items == 30
+    finally:
+        await primary.close()
+    await asyncio.wait_for(task, 5)
+
+def test_replication():
+    """
+    Test the functionality of op-log replication between controllers.
+    
+    This function tests:
+    1. Sending a snapshot to an empty replica
+    2. Streaming changes with bandwidth proportional to the changes
+    3. Replicating changes made from other threads
+    4. Resuming from a sequence number without a snapshot
+    5. Falling back to a snapshot when the op log no longer covers the gap
+    6. Catching up from a store copy taken at a known sequence number
+    7. Giving replica homes the capacity of the primary's
+    8. Rejecting changes that do not apply
+    """
+    print("\n=== Testing Replication ===")
+    asyncio.run(_replicate())
+    
+    # Test keeping the capacity of homes
+    print("\nGrowing a home with room for 30 devices:")
+    asyncio.run(_replicate_capacity())
+    
+    # Test a change that does not apply
+    print("\nApplying a change to a missing device:")
+    fleet = generate_fleet(1, devices_per_home=2)
+    try:
+        apply_change(fleet, [1, 0, 5, "removed", None])
+        assert False, "Expected an IndexError"
+    except IndexError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nReplication testing completed successfully.")
+
+if __name__ == "__main__":
+    test_replication()
@@ -0,0 +1,109 @@
+from change_stream import ChangeStream
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from rules import RuleEngine, Total, Count
+
+def _switch_off_heaters(home):
+    """Switch off every heater in a home."""
+    for i in range(len(home)):
+        device = home.get_device(i)
+        if isinstance(device, SmartHeater) and device.switched_on:
+            home.toggle_device(i)
+
+def test_rule_engine():
+    """
+    Test the functionality of the RuleEngine class.
+    
+    This function tests:
+    1. Incremental aggregates over toggles, option updates, additions and removals
+    2. Firing a rule when its condition becomes true
+    3. Edge-triggering: not firing again until the condition resets
+    4. Combined conditions
+    5. Rejecting duplicate rule names
+    6. Running actions after later listeners have seen the triggering change
+    """
+    print("\n=== Testing RuleEngine Class ===")
+    
+    home = SmartHome()
+    home.add_device(SmartPlug(100))
+    home.add_device(SmartPlug(120))
+    home.add_device(SmartHeater())
+    home.toggle_device(2)
+    
+    engine = RuleEngine()
+    plug_watts = Total("consumption_rate", device_type="SmartPlug", on_only=True)
+    fired = []
+    
+    def shed(home):
+        fired.append("shed")
+        _switch_off_heaters(home)
+    
+    engine.add_rule("shed heaters", plug_watts > 200, shed)
+    engine.watch(home)
+    print(f"Initial on-plug wattage: {engine.value(home, plug_watts)}")
+    assert engine.value(home, plug_watts) == 0 and fired == []
+    
+    # Test the rule firing
+    print("\nTurning both plugs on:")
+    home.toggle_device(0)
+    assert engine.value(home, plug_watts) == 100 and fired == []
+    home.toggle_device(1)
+    print(home)
+    assert engine.value(home, plug_watts) == 220 and fired == ["shed"]
+    assert not home.get_device(2).switched_on
+    
+    # Test edge-triggering
+    print("\nRaising a plug's consumption rate while the rule holds:")
+    home.update_option(0, 150)
+    assert engine.value(home, plug_watts) == 270 and fired == ["shed"]
+    
+    print("\nDropping below the threshold and crossing it again:")
+    home.remove_device(1)
+    assert engine.value(home, plug_watts) == 150
+    home.add_device(SmartPlug(60))
+    home.toggle_device(2)
+    home.toggle_device(1)
+    print(home)
+    assert engine.value(home, plug_watts) == 210 and fired == ["shed", "shed"]
+    
+    # Test combined conditions
+    print("\nTesting a combined condition:")
+    ovens_on = Count("SmartOven", on_only=True)
+    engine.add_rule(
+        "ovens and plugs", 
+        (ovens_on >= 1) & (plug_watts > 100), 
+        lambda home: fired.append("combined")
+    )
+    home.add_device(SmartOven())
+    assert fired == ["shed", "shed"]
+    home.switch_all_on()
+    assert engine.value(home, ovens_on) == 1 and fired[-1] == "combined"
+    
+    # Test duplicate rule names
+    try:
+        print("\nAttempting to add a duplicate rule name:")
+        engine.add_rule("shed heaters", plug_watts > 0, shed)
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    # Test action order for listeners registered after the engine
+    print("\nStreaming changes from a listener registered after the engine:")
+    ordered = SmartHome()
+    ordered.add_devices([SmartPlug(150), SmartPlug(100), SmartHeater()])
+    ordered.toggle_device(2)
+    engine.watch(ordered)
+    stream = ChangeStream()
+    stream.watch(0, ordered)
+    ordered.switch_all_on()
+    changes, _, _ = stream.changes_since(0)
+    print([(change[2], change[4]) for change in changes])
+    assert [(change[2], change[4]) for change in changes] == [(0, True), (1, True), (2, False)]
+    
+    # Test unwatch
+    engine.unwatch(home)
+    home.switch_all_off()
+    
+    print("\nRuleEngine testing completed successfully.")
+
+if __name__ == "__main__":
+    test_rule_engine()
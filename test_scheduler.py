@@ -0,0 +1,189 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from scheduler import DAILY, Scheduler, next_daily
+
+class FakeClock:
+    """A manually advanced clock for driving the scheduler in tests."""
+    
+    def __init__(self, now=0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+def test_scheduler():
+    """
+    Test the functionality of the Scheduler class.
+    
+    This function tests:
+    1. Firing one-off actions when they are due
+    2. Recurring actions and skipping missed occurrences
+    3. Cancelling actions
+    4. Reporting failing actions
+    5. Saving and loading pending actions
+    6. Computing the next daily occurrence
+    7. Daily actions keeping their local time across daylight saving changes
+    8. Scheduling from another thread while the scheduler runs
+    """
+    print("\n=== Testing Scheduler Class ===")
+    
+    home = SmartHome()
+    home.add_device(SmartPlug(45))
+    home.add_device(SmartOven())
+    home.add_device(SmartHeater())
+    clock = FakeClock(1000.0)
+    scheduler = Scheduler([home], clock=clock)
+    
+    # Test one-off actions
+    print("\nScheduling an oven on at t=1010 and off at t=1020:")
+    on_id = scheduler.schedule(1010, 0, 1, "on")
+    off_id = scheduler.schedule(1020, 0, 1, "off")
+    assert scheduler.tick() == ([], [])
+    clock.now = 1015
+    assert scheduler.tick() == ([on_id], [])
+    print(home)
+    assert home.get_device(1).switched_on
+    clock.now = 1020
+    assert scheduler.tick() == ([off_id], [])
+    assert not home.get_device(1).switched_on
+    assert len(scheduler) == 0
+    
+    # Test recurring actions
+    print("\nScheduling the heater setting to 1 every 100 seconds:")
+    heater_id = scheduler.schedule(1100, 0, 2, "option", value=1, every=100)
+    clock.now = 1350
+    print(scheduler.tick())
+    print(home)
+    assert home.get_device(2).setting == 1
+    assert scheduler.next_due() == 1400 and len(scheduler) == 1
+    
+    # Test cancelling
+    print("\nCancelling the recurring action:")
+    scheduler.cancel(heater_id)
+    clock.now = 1500
+    assert scheduler.tick() == ([], []) and scheduler.next_due() is None
+    try:
+        scheduler.cancel(heater_id)
+    except KeyError as e:
+        print(f"Error caught: {e}")
+    
+    # Test failing actions
+    print("\nScheduling an invalid option value and a missing device:")
+    bad_value = scheduler.schedule(1500, 0, 0, "option", value=200)
+    bad_index = scheduler.schedule(1500, 0, 9, "toggle")
+    fired, errors = scheduler.tick()
+    print(errors)
+    assert fired == [] and [action_id for action_id, _ in errors] == [bad_value, bad_index]
+    
+    # Test invalid schedule
+    try:
+        print("\nAttempting to schedule an unknown action:")
+        scheduler.schedule(1600, 0, 0, "explode")
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    # Test save and load
+    print("\nSaving and loading pending actions:")
+    scheduler.schedule(2000, 0, 0, "toggle")
+    scheduler.schedule(3000, 0, 2, "option", value=5, every=60.5)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "schedule.csv")
+        scheduler.save(path)
+        restored = Scheduler([home], clock=clock)
+        restored.load(path)
+    assert len(restored) == 2 and restored.next_due() == 2000
+    clock.now = 3000
+    fired, errors = restored.tick()
+    print(fired, home)
+    assert len(fired) == 2 and home.get_device(2).setting == 5
+    assert restored.next_due() == 3060.5
+    
+    # Test that loading never reuses the id of a cancelled action
+    print("\nCancelling, loading and scheduling again:")
+    reuse_home = SmartHome()
+    reuse_home.add_device(SmartPlug(45))
+    reuse = Scheduler([reuse_home], clock=clock)
+    reuse.schedule(4000, 0, 0, "option", value=50)
+    cancelled_id = reuse.schedule(4000, 0, 0, "option", value=99)
+    reuse.cancel(cancelled_id)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "empty.csv")
+        Scheduler([reuse_home]).save(path)
+        reuse.load(path)
+        new_id = reuse.schedule(4000, 0, 0, "toggle")
+        assert new_id > cancelled_id
+        clock.now = 4000
+        fired, errors = reuse.tick()
+        assert cancelled_id not in fired and reuse_home.get_device(0).consumption_rate == 50
+        path = os.path.join(directory, "clash.csv")
+        reuse.schedule(5000, 0, 0, "toggle")
+        reuse.save(path)
+        try:
+            reuse.load(path)
+            assert False, "Loading ids already in use should fail"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    
+    # Test next_daily
+    print("\nTesting next_daily():")
+    start = next_daily(18, 0)
+    assert next_daily(18, 0, now=start) > start
+    assert next_daily(18, 0, now=start - 1) == start
+    
+    # Test daily actions across a daylight saving change
+    if hasattr(time, "tzset"):
+        print("\nScheduling a daily action across the end of summer time:")
+        saved_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "Europe/Berlin"
+        time.tzset()
+        try:
+            daily = Scheduler([home], clock=clock)
+            first = datetime(2026, 10, 24, 18, 0).timestamp()
+            daily.schedule(first, 0, 0, "toggle", every=DAILY)
+            clock.now = first
+            assert len(daily.tick()[0]) == 1
+            print(datetime.fromtimestamp(daily.next_due()))
+            assert daily.next_due() == datetime(2026, 10, 25, 18, 0).timestamp() == first + 25 * 3600
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "daily.csv")
+                daily.save(path)
+                restored = Scheduler([home], clock=clock)
+                restored.load(path)
+            clock.now = daily.next_due()
+            assert len(restored.tick()[0]) == 1
+            assert restored.next_due() == datetime(2026, 10, 26, 18, 0).timestamp()
+        finally:
+            if saved_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = saved_tz
+            time.tzset()
+    
+    # Test scheduling while running in the background
+    print("\nScheduling from another thread while running:")
+    background = Scheduler([home], clock=clock)
+    stop = threading.Event()
+    runner = threading.Thread(target=background.run, args=(stop, 0.001))
+    runner.start()
+    try:
+        ids = [background.schedule(clock.now + i % 2, 0, 0, "toggle") for i in range(2000)]
+        for action_id in ids[1::4]:
+            background.cancel(action_id)
+    finally:
+        stop.set()
+        runner.join()
+    background.tick()
+    assert len(background) == 500
+    clock.now += 2
+    assert len(background.tick()[0]) == 500
+    assert len(background) == 0 and background.next_due() is None
+    
+    print("\nScheduler testing completed successfully.")
+
+if __name__ == "__main__":
+    test_scheduler()
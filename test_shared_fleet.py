@@ -0,0 +1,105 @@
+import multiprocessing
+from fleet_generator import generate_fleet, generate_operations, replay
+from shared_fleet import SharedFleet, FleetRuntime
+
+def _count_switched_on(spec, results):
+    """Attach to a shared fleet in another process and count the devices on."""
+    fleet = SharedFleet(spec)
+    results.put(sum(fleet.states))
+    fleet.close()
+
+def test_shared_fleet():
+    """
+    Test the functionality of the SharedFleet and FleetRuntime classes.
+    
+    This function tests:
+    1. Copying a fleet into shared memory and reading it back
+    2. Updating devices in shared memory with validation
+    3. Applying operations on several worker processes
+    4. Broadcasting a fleet-wide switch and taking a snapshot
+    5. Reading the shared columns from another process
+    6. Surviving unexpected errors in workers and detecting dead workers
+    """
+    print("\n=== Testing Shared Fleet ===")
+    
+    # Test copying a fleet into shared memory
+    print("\nSharing a fleet of 50 homes:")
+    fleet = generate_fleet(50, seed=5)
+    shared = SharedFleet.create(fleet)
+    try:
+        print(shared.spec)
+        assert [str(home) for home in shared.to_homes()] == [str(home) for home in fleet]
+        device = fleet[3].get_device(0)
+        print(shared.get_device(3, 0), device)
+        
+        # Test updates and validation
+        print("\nUpdating devices in shared memory:")
+        state = shared.toggle_device(3, 0)
+        assert state != device.switched_on
+        try:
+            shared.update_option(3, 0, -1)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        try:
+            shared.get_device(50, 0)
+            assert False, "Expected an IndexError"
+        except IndexError as e:
+            print(f"Error caught: {e}")
+    finally:
+        shared.close()
+        shared.unlink()
+    
+    # Test the multi-process runtime
+    print("\nApplying 2000 operations on 3 worker processes:")
+    operations = generate_operations(fleet, 2000, seed=6)
+    expected = generate_fleet(50, seed=5)
+    replay(expected, operations)
+    with FleetRuntime(fleet, workers=3) as runtime:
+        print(runtime.ranges)
+        assert runtime.apply(operations + [(99, 0, "toggle", None)]) == 1
+        assert [str(home) for home in runtime.snapshot()] == [str(home) for home in expected]
+        
+        # Test single commands and errors from workers
+        print("\nToggling a device and updating an option out of range:")
+        assert runtime.toggle_device(49, 0) != expected[49].get_device(0).switched_on
+        try:
+            runtime.update_option(20, 0, 1000)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        
+        # Test fleet-wide switch and a zero-copy reader process
+        print("\nSwitching the fleet on and counting from a reader process:")
+        runtime.switch_all(True)
+        results = multiprocessing.Queue()
+        reader = multiprocessing.Process(target=_count_switched_on, args=(runtime.fleet.spec, results))
+        reader.start()
+        count = results.get(timeout=10)
+        reader.join()
+        print(f"{count} devices switched on")
+        assert count == runtime.fleet.spec.device_count
+        
+        # Test an unexpected error in a worker
+        print("\nSending a malformed command to a worker:")
+        try:
+            runtime.toggle_device(0, "a")
+            assert False, "Expected a TypeError"
+        except TypeError as e:
+            print(f"Error caught: {e}")
+        assert runtime.toggle_device(0, 0) in (True, False)
+        
+        # Test a dead worker
+        print("\nWaiting on a worker that has died:")
+        runtime._FleetRuntime__processes[0].terminate()
+        runtime._FleetRuntime__processes[0].join()
+        try:
+            runtime.toggle_device(0, 0)
+            assert False, "Expected a RuntimeError"
+        except RuntimeError as e:
+            print(f"Error caught: {e}")
+    
+    print("\nShared fleet testing completed successfully.")
+
+if __name__ == "__main__":
+    test_shared_fleet()
@@ -13,6 +13,9 @@ def test_smart_home():
     5. Removing devices
     6. Updating device options
     7. Handling invalid operations
+    8. Applying batches of operations atomically
+    9. Updating the options of several devices at once
+    10. Deferring changes made by listeners until every listener has been notified
     """
     print("\n=== Testing SmartHome Class ===")
     
@@ -119,6 +122,98 @@ def test_smart_home():
     except ValueError as e:
         print(f"Error caught: {e}")
     
+    # Test apply
+    print("\nTesting apply():")
+    batch_home = SmartHome(max_items=4)
+    batch_home.add_devices([SmartPlug(45), SmartOven(150)])
+    notifications = []
+    batch_home.add_listener(notifications.append)
+    changes = batch_home.apply([
+        ("toggle", 0),
+        ("set_switch", 0, True),
+        ("set_switch", 1, True),
+        ("update_option", 1, 200),
+        ("add", SmartHeater(3)),
+        ("remove", 0),
+        ("insert", 0, SmartPlug(10)),
+    ])
+    print(batch_home)
+    assert changes == 6 and len(notifications) == 1
+    assert [event.field for event in notifications[0]] == [
+        "switched_on", "switched_on", "temperature", "added", "removed", "added"
+    ]
+    assert batch_home.get_device(1).temperature == 200 and batch_home.get_device(1).switched_on
+    assert isinstance(batch_home.get_device(2), SmartHeater)
+    
+    # Test that an invalid batch changes nothing
+    print("\nTesting apply() with an invalid operation:")
+    before = str(batch_home)
+    for batch in (
+        [("toggle", 0), ("update_option", 1, 300)],
+        [("remove", 2), ("toggle", 2)],
+        [("add", SmartPlug(5)), ("add", SmartPlug(5))],
+        [("toggle", 0), ("explode", 0)],
+        [("toggle",)],
+    ):
+        try:
+            batch_home.apply(batch)
+            assert False, "Expected the batch to be rejected"
+        except (IndexError, ValueError) as e:
+            print(f"Error caught: {e}")
+    assert str(batch_home) == before and len(notifications) == 1
+    
+    # Test trusted batches
+    print("\nTesting apply() with a trusted batch:")
+    batch_home.apply([("update_option", 2, 1)], trusted=True)
+    assert batch_home.get_device(2).setting == 1 and len(notifications) == 2
+    
+    # Test switch states tracked within a batch without additions or removals
+    switch_home = SmartHome()
+    switch_home.add_devices([SmartPlug(45), SmartOven(150)])
+    assert switch_home.apply([("toggle", 0), ("set_switch", 0, False), ("set_switch", 0, False)]) == 2
+    assert not switch_home.get_device(0).switched_on
+    try:
+        switch_home.apply([("toggle", 1), ("set_switch", 1, True), ("toggle", 2)])
+        assert False, "Expected the batch to be rejected"
+    except IndexError as e:
+        print(f"Error caught: {e}")
+    assert not switch_home.get_device(1).switched_on
+    
+    # Test update_options
+    print("\nTesting update_options():")
+    batch_home.update_options([0, 1, 2], [20, 250, 4])
+    print(batch_home)
+    assert [(event.index, event.field, event.value) for event in notifications[-1]] == [
+        (0, "consumption_rate", 20), (1, "temperature", 250), (2, "setting", 4)
+    ]
+    batch_home.update_options([2], [0], trusted=True)
+    assert batch_home.get_device(2).setting == 0 and len(notifications) == 4
+    before = str(batch_home)
+    for indices, values in (([0, 3], [1, 1]), ([-1], [1]), ([0, 2], [1, 6])):
+        try:
+            batch_home.update_options(indices, values)
+            assert False, "Expected the update to be rejected"
+        except (IndexError, ValueError) as e:
+            print(f"Error caught: {e}")
+    assert str(batch_home) == before and len(notifications) == 4
+    
+    # Test deferred changes
+    print("\nTesting defer() from a listener:")
+    deferred_home = SmartHome()
+    deferred_home.add_device(SmartPlug(10))
+    seen = []
+    def switch_back(events):
+        if events[0].value:
+            deferred_home.defer(lambda: deferred_home.toggle_device(0))
+    deferred_home.add_listener(switch_back)
+    deferred_home.add_listener(lambda events: seen.append(events[0].value))
+    deferred_home.toggle_device(0)
+    print(seen)
+    assert seen == [True, False] and not deferred_home.get_device(0).switched_on
+    ran = []
+    deferred_home.defer(lambda: ran.append(True))
+    assert ran == [True]
+    
     print("\nSmartHome testing completed successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from smart_home_server import SmartHomeServer
+
+async def _request(reader, writer, method, path, body=None, headers=None):
+    """Send one request on an open connection and read the response."""
+    data = b"" if body is None else json.dumps(body).encode("utf-8")
+    lines = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(data)}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+    await writer.drain()
+    
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    length = int(response_headers["content-length"])
+    payload = await reader.readexactly(length)
+    return status, response_headers, json.loads(payload) if payload else None
+
+async def _exercise_server():
+    """Drive the server over a single keep-alive connection."""
+    home = SmartHome()
+    home.add_device(SmartPlug(45))
+    home.add_device(SmartOven())
+    home.add_device(SmartHeater())
+    server = SmartHomeServer([home], port=0)
+    await server.start()
+    
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        
+        # Test listing homes
+        print("\nTesting GET /homes:")
+        status, headers, body = await _request(reader, writer, "GET", "/homes")
+        print(status, body)
+        assert status == 200 and body == [{"id": 0, "devices": 3, "on": 0}]
+        
+        # Test ETag on the same connection
+        print("\nTesting If-None-Match with an unchanged home:")
+        status, headers, body = await _request(reader, writer, "GET", "/homes/0")
+        etag = headers["etag"]
+        status, headers, body = await _request(
+            reader, writer, "GET", "/homes/0", headers={"If-None-Match": etag}
+        )
+        print(status, body)
+        assert status == 304 and body is None
+        
+        # Test toggle and option update
+        print("\nTesting toggle and option update:")
+        status, headers, body = await _request(reader, writer, "POST", "/homes/0/devices/0/toggle")
+        print(status, body)
+        assert body["switched_on"] is True
+        status, headers, body = await _request(
+            reader, writer, "PUT", "/homes/0/devices/1/option", {"value": 200}
+        )
+        print(status, body)
+        assert body["value"] == 200
+        
+        # Test the ETag changes after a mutation
+        status, headers, body = await _request(
+            reader, writer, "GET", "/homes/0", headers={"If-None-Match": etag}
+        )
+        assert status == 200 and headers["etag"] != etag
+        
+        # Test batching and error statuses
+        print("\nTesting POST /batch:")
+        status, headers, body = await _request(reader, writer, "POST", "/batch", [
+            {"method": "POST", "path": "/homes/0/switch_all", "body": {"on": False}},
+            {"method": "PUT", "path": "/homes/0/devices/2/option", "body": {"value": 6}},
+            {"method": "GET", "path": "/homes/5"},
+        ])
+        print(status, body)
+        assert [result["status"] for result in body] == [200, 400, 404]
+        assert not any(home.get_device(i).switched_on for i in range(len(home)))
+        
+        # Test applying a batch of operations to one home
+        print("\nTesting POST /homes/0/apply:")
+        status, headers, body = await _request(reader, writer, "POST", "/homes/0/apply", [
+            ["toggle", 0], ["update_option", 1, 180], ["add", "SmartHeater", 4],
+        ])
+        print(status, body)
+        assert status == 200 and body["changes"] == 3
+        assert home.get_device(len(home) - 1).setting == 4
+        count = len(home)
+        status, headers, body = await _request(reader, writer, "POST", "/homes/0/apply", [
+            ["remove", 0], ["add", "SmartToaster"],
+        ])
+        print(status, body)
+        assert status == 400 and len(home) == count
+        
+        writer.close()
+    finally:
+        await server.close()
+
+def test_smart_home_server():
+    """
+    Test the functionality of the SmartHome HTTP/JSON API server.
+    
+    This function tests:
+    1. Listing homes
+    2. ETag and If-None-Match on read endpoints
+    3. Toggling devices and updating options
+    4. Batched requests and error statuses
+    5. Applying a batch of operations to one home atomically
+    6. Serving every request over one keep-alive connection
+    """
+    print("\n=== Testing SmartHome Server ===")
+    asyncio.run(_exercise_server())
+    print("\nSmartHome server testing completed successfully.")
+
+if __name__ == "__main__":
+    test_smart_home_server()
@@ -0,0 +1,168 @@
+import os
+import tempfile
+from smart_devices import SmartPlug, SmartOven, SmartHeater
+from smart_home import SmartHome
+from smart_homes_store import (
+    save_smart_homes, 
+    load_smart_homes, 
+    import_smart_homes, 
+    export_smart_homes
+)
+
+def _make_homes():
+    """Create two smart homes with a mix of devices for the store tests."""
+    first = SmartHome()
+    first.add_device(SmartPlug(45))
+    first.add_device(SmartOven(200))
+    first.toggle_device(1)
+    
+    second = SmartHome()
+    second.add_device(SmartHeater(4))
+    second.toggle_device(0)
+    
+    return [first, second]
+
+def test_smart_homes_store():
+    """
+    Test the functionality of the smart homes store.
+    
+    This function tests:
+    1. Saving and loading a fleet round trip
+    2. Skipping a corrupt home segment while loading the rest
+    3. Detecting a truncated store
+    4. Loading a store written before checksums were added
+    5. Skipping homes with a malformed switch state
+    6. Loading homes holding more devices than the default capacity
+    """
+    print("\n=== Testing Smart Homes Store ===")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "smart_homes.csv")
+        
+        # Test save/load round trip
+        print("\nTesting save and load round trip:")
+        homes = _make_homes()
+        save_smart_homes(homes, path)
+        loaded, errors = load_smart_homes(path)
+        for home in loaded:
+            print(home)
+        assert [str(home) for home in loaded] == [str(home) for home in homes]
+        assert errors == []
+        assert os.listdir(directory) == ["smart_homes.csv"]  # No temp files left behind
+        
+        # Test corrupt segment
+        print("\nTesting a corrupt home segment:")
+        with open(path) as file:
+            text = file.read()
+        with open(path, "w") as file:
+            file.write(text.replace("SmartOven,200,1", "SmartOven,210,1"))
+        loaded, errors = load_smart_homes(path)
+        print(f"Loaded {len(loaded)} home(s), errors: {errors}")
+        assert len(loaded) == 1 and str(loaded[0]) == str(homes[1])
+        assert len(errors) == 1
+        
+        # Test truncated store
+        print("\nTesting a truncated store:")
+        save_smart_homes(homes, path)
+        with open(path) as file:
+            lines = file.read().splitlines()
+        with open(path, "w") as file:
+            file.write("\n".join(lines[:-2]) + "\n")
+        loaded, errors = load_smart_homes(path)
+        print(f"Loaded {len(loaded)} home(s), errors: {errors}")
+        assert len(loaded) == 1 and str(loaded[0]) == str(homes[0])
+        assert len(errors) == 1
+        
+        # Test legacy store without checksums
+        print("\nTesting a legacy store:")
+        with open(path, "w") as file:
+            file.write("1\n2\nSmartPlug,45,1\nSmartHeater,2,0\n")
+        loaded, errors = load_smart_homes(path)
+        print(loaded[0])
+        assert len(loaded) == 1 and len(loaded[0]) == 2
+        assert errors == []
+        
+        # Test malformed switch states
+        print("\nTesting malformed switch states:")
+        for cell in ("yes", "2", ""):
+            with open(path, "w") as file:
+                file.write(f"2\n1\nSmartPlug,45,{cell}\n1\nSmartHeater,2,1\n")
+            loaded, errors = load_smart_homes(path)
+            print(f"Loaded {len(loaded)} home(s), errors: {errors}")
+            assert len(loaded) == 1 and loaded[0].get_device(0).switched_on
+            assert len(errors) == 1
+        
+        # Test homes above the default capacity
+        print("\nTesting a home of 12 devices:")
+        big = SmartHome(max_items=12)
+        big.add_devices([SmartPlug(i) for i in range(12)])
+        save_smart_homes([big] + homes, path)
+        loaded, errors = load_smart_homes(path)
+        assert errors == [] and [str(home) for home in loaded] == [str(home) for home in [big] + homes]
+        assert loaded[0].max_items == 12
+        with open(path, "w") as file:
+            rows = "".join(f"SmartPlug,{i},0\n" for i in range(12))
+            file.write(f"2\n12\n{rows}1\nSmartHeater,9,0\n")
+        loaded, errors = load_smart_homes(path)
+        print(f"Loaded {len(loaded)} home(s), errors: {errors}")
+        assert len(loaded) == 1 and str(loaded[0]) == str(big) and len(errors) == 1
+    
+    print("\nSmart homes store testing completed successfully.")
+
+def test_parallel_import_export():
+    """
+    Test the parallel multi-file import and export of smart home fleets.
+    
+    This function tests:
+    1. Exporting a fleet into shard files of a configured size
+    2. Importing the shard files back into one fleet in order
+    3. Reporting unreadable files without losing the rest
+    4. Removing the extra shards of an earlier, larger export
+    """
+    print("\n=== Testing Parallel Import/Export ===")
+    
+    homes = _make_homes() * 3
+    
+    with tempfile.TemporaryDirectory() as directory:
+        # Test export sharding
+        print("\nExporting 6 homes with 4 homes per file:")
+        paths = export_smart_homes(homes, directory, homes_per_file=4, max_workers=2)
+        print(paths)
+        assert [os.path.basename(path) for path in paths] == [
+            "smart_homes_0000.csv", 
+            "smart_homes_0001.csv"
+        ]
+        
+        # Test import and merge
+        print("\nImporting the shard files:")
+        loaded, errors = import_smart_homes(paths, max_workers=2)
+        print(f"Loaded {len(loaded)} home(s)")
+        assert [str(home) for home in loaded] == [str(home) for home in homes]
+        assert errors == []
+        
+        # Test missing file
+        print("\nImporting with a missing file:")
+        missing = os.path.join(directory, "missing.csv")
+        loaded, errors = import_smart_homes(paths + [missing], max_workers=2)
+        print(f"Loaded {len(loaded)} home(s), errors: {errors}")
+        assert len(loaded) == 6 and len(errors) == 1
+        
+        # Test re-exporting a smaller fleet
+        print("\nExporting 2 homes into the same directory:")
+        paths = export_smart_homes(homes[:2], directory, homes_per_file=4, max_workers=2)
+        assert sorted(os.listdir(directory)) == ["smart_homes_0000.csv"]
+        loaded, errors = import_smart_homes(paths)
+        assert [str(home) for home in loaded] == [str(home) for home in homes[:2]]
+        
+        # Test invalid shard size
+        try:
+            print("\nAttempting to export with 0 homes per file:")
+            export_smart_homes(homes, directory, homes_per_file=0)
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    
+    print("\nParallel import/export testing completed successfully.")
+
+if __name__ == "__main__":
+    test_smart_homes_store()
+    test_parallel_import_export()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+from fleet_generator import generate_fleet, generate_operations, replay
+from smart_devices import SmartPlug
+from smart_home import SmartHome
+from smart_homes_store import save_smart_homes, load_smart_homes
+from snapshot_archive import SnapshotArchive, snapshot_state
+
+def _archive_size(directory):
+    """Get the total size of the day files of an archive."""
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if name.startswith("day-"))
+
+def test_snapshot_archive():
+    """
+    Test the functionality of the delta-encoded snapshot archive.
+    
+    This function tests:
+    1. Archiving daily snapshots as keyframes and deltas
+    2. Restoring any day, including after reopening the archive
+    3. Archiving structural changes (added homes and devices)
+    4. Archiving straight from a CSV store
+    5. Restoring several days in parallel
+    6. Storage growing with churn rather than fleet size
+    7. Rejecting duplicate days, unknown days, unknown codecs and corrupt stores
+    """
+    print("\n=== Testing Snapshot Archive ===")
+    
+    fleet = generate_fleet(200, seed=5)
+    expected = {}
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "archive")
+        archive = SnapshotArchive(path, keyframe_interval=4)
+        
+        # Test archiving ten days with light churn
+        print("\nArchiving 10 days with 20 operations per day:")
+        sizes = []
+        for day in range(10):
+            label = f"2024-05-{day + 1:02d}"
+            if day:
+                replay(fleet, generate_operations(fleet, 20, seed=day))
+            if day == 6:
+                fleet.append(SmartHome())
+                fleet[-1].add_device(SmartPlug(90))
+                fleet[0].remove_device(0)
+            sizes.append(archive.append(label, fleet))
+            expected[label] = [str(home) for home in fleet]
+        print(f"Bytes per day: {sizes}")
+        assert archive.days == list(expected)
+        assert all(sizes[day] * 5 < sizes[0] for day in range(1, 10) if day % 4)
+        
+        # Test restoring single days
+        print("\nRestoring every day:")
+        for label in expected:
+            assert [str(home) for home in archive.restore(label)] == expected[label]
+        
+        # Test reopening
+        print("\nReopening the archive and appending from a store:")
+        reopened = SnapshotArchive(path, codec="lzma")
+        assert reopened.codec == "zlib" and reopened.keyframe_interval == 4
+        store = os.path.join(directory, "fleet.csv")
+        replay(fleet, generate_operations(fleet, 20, seed=99))
+        fleet.append(SmartHome())
+        save_smart_homes(fleet, store)
+        reopened.append("2024-05-11", store)
+        expected["2024-05-11"] = [str(home) for home in fleet]
+        assert snapshot_state(store) == snapshot_state(fleet)
+        assert [str(home) for home in reopened.restore("2024-05-11")] == expected["2024-05-11"]
+        
+        # Test parallel restore
+        print("\nRestoring all days with 2 worker processes:")
+        restored = reopened.restore_days(list(expected), max_workers=2)
+        assert {label: [str(home) for home in homes] for label, homes in restored.items()} == expected
+        
+        # Test export
+        print("\nExporting a day to a CSV store:")
+        reopened.export("2024-05-03", store)
+        homes, errors = load_smart_homes(store)
+        assert not errors and [str(home) for home in homes] == expected["2024-05-03"]
+        
+        # Test storage against full copies
+        print("\nComparing with compressed full snapshots:")
+        full = os.path.join(directory, "full")
+        every_day = SnapshotArchive(full, keyframe_interval=1)
+        for label in expected:
+            every_day.append(label, reopened.restore(label))
+        print(f"Delta archive: {_archive_size(path)} bytes, full snapshots: {_archive_size(full)} bytes")
+        assert _archive_size(path) * 2 < _archive_size(full)
+        
+        # Test lzma
+        print("\nArchiving with lzma:")
+        packed = SnapshotArchive(os.path.join(directory, "lzma"), codec="lzma")
+        packed.append("day", fleet)
+        assert [str(home) for home in packed.restore("day")] == expected["2024-05-11"]
+        
+        # Test errors
+        print("\nArchiving a day twice:")
+        try:
+            packed.append("day", fleet)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        
+        print("\nArchiving a store with a corrupt segment:")
+        with open(store) as file:
+            lines = file.read().splitlines()
+        with open(store, "w") as file:
+            file.write("\n".join(lines[:2] + lines[3:]) + "\n")
+        try:
+            packed.append("corrupt", store)
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        assert packed.days == ["day"]
+        
+        print("\nRestoring an unknown day:")
+        try:
+            packed.restore("2030-01-01")
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        
+        print("\nOpening an archive with an unknown codec:")
+        try:
+            SnapshotArchive(os.path.join(directory, "bz2"), codec="bz2")
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+    
+    print("\nSnapshot archive testing completed successfully.")
+
+if __name__ == "__main__":
+    test_snapshot_archive()
@@ -0,0 +1,161 @@
+import os
+import tempfile
+import zlib
+from smart_devices import SmartPlug
+from smart_home import SmartHome
+from fleet_generator import generate_fleet, write_fleet
+from store_codecs import CODECS, get_codec, codec_for_path, compare_codecs
+
+def test_store_codecs():
+    """
+    Test the functionality of the store codecs.
+    
+    This function tests:
+    1. Round-tripping a fleet through every codec
+    2. Splitting files at record boundaries
+    3. Decoding the parts of a file in parallel
+    4. Skipping corrupt and invalid records
+    5. Loading empty and tiny files split into more parts than bytes
+    6. Looking up codecs by name and file extension
+    7. Writing sharded fleets and comparing codecs
+    8. Round-tripping a home holding more devices than the default capacity
+    """
+    print("\n=== Testing Store Codecs ===")
+    
+    fleet = generate_fleet(300, seed=4)
+    expected = [str(home) for home in fleet]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        # Test round trips
+        print("\nRound-tripping 300 homes through every codec:")
+        paths = {}
+        for name, codec in CODECS.items():
+            paths[name] = os.path.join(directory, "fleet" + codec.extension)
+            codec.dump(fleet, paths[name])
+            homes, errors = codec.load(paths[name])
+            assert not errors and [str(home) for home in homes] == expected
+            print(f"{name}: {os.path.getsize(paths[name])} bytes")
+        assert os.path.getsize(paths["binary"]) < os.path.getsize(paths["csv"])
+        
+        # Test homes above the default capacity
+        print("\nRound-tripping a home of 12 devices through every codec:")
+        big = SmartHome(max_items=12)
+        big.add_devices([SmartPlug(i) for i in range(12)])
+        for name, codec in CODECS.items():
+            path = os.path.join(directory, "big" + codec.extension)
+            codec.dump([big, fleet[0]], path)
+            homes, errors = codec.load(path)
+            assert not errors and [str(home) for home in homes] == [str(big), expected[0]]
+            assert homes[0].max_items == 12
+        
+        # Test splitting
+        print("\nSplitting the self-delimiting files into 4 parts:")
+        for name in ("jsonl", "binary"):
+            codec = CODECS[name]
+            ranges = codec.split(paths[name], 4)
+            assert len(ranges) == 4
+            assert ranges[0][0] == len(codec.header) and ranges[-1][1] == os.path.getsize(paths[name])
+            assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+            with open(paths[name], "rb") as file:
+                data = file.read()
+            decoded = [codec.decode_range(data[start:end], start) for start, end in ranges]
+            assert sum(len(records) for records, _ in decoded) == 300
+            assert not any(errors for _, errors in decoded)
+            print(f"{name}: {ranges}")
+        assert CODECS["csv"].split(paths["csv"], 4) == [(0, os.path.getsize(paths["csv"]))]
+        
+        # Test parallel decoding
+        print("\nDecoding with 2 worker processes:")
+        for name in ("jsonl", "binary"):
+            homes, errors = CODECS[name].load(paths[name], max_workers=2)
+            assert not errors and [str(home) for home in homes] == expected
+        
+        # Test corrupt records
+        print("\nLoading files with corrupt records:")
+        with open(paths["jsonl"], "rb") as file:
+            lines = file.read().splitlines(keepends=True)
+        lines[1] = b'[["SmartOven",999,1]]\n'
+        lines[2] = b'not json\n'
+        lines[3] = b'[["SmartPlug",10,"yes"]]\n'
+        lines[4] = b'[["SmartPlug",10,2]]\n'
+        with open(paths["jsonl"], "wb") as file:
+            file.write(b"".join(lines))
+        homes, errors = CODECS["jsonl"].load(paths["jsonl"], max_workers=2)
+        for error in errors:
+            print(f"Error caught: {error}")
+        assert len(errors) == 4 and len(homes) == 296
+        
+        with open(paths["binary"], "r+b") as file:
+            file.seek(20)
+            byte = file.read(1)
+            file.seek(20)
+            file.write(bytes([byte[0] ^ 0xFF]))
+        homes, errors = CODECS["binary"].load(paths["binary"])
+        print(f"Error caught: {errors[0]}")
+        assert errors == ["Skipped home record at byte 4: Checksum mismatch"]
+        assert [str(home) for home in homes] == expected[1:]
+        
+        print("\nLoading a binary record with an invalid switch state:")
+        codec = CODECS["binary"]
+        payload = codec.DEVICE.pack(1, 10, 2)
+        with open(paths["binary"], "wb") as file:
+            file.write(codec.header + codec.RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+        homes, errors = codec.load(paths["binary"])
+        print(f"Error caught: {errors[0]}")
+        assert homes == [] and errors == ["Skipped home record at byte 4: Switch state must be 0 or 1, got 2"]
+        
+        # Test empty and tiny files
+        print("\nLoading empty and tiny files with more workers than bytes:")
+        for name in ("jsonl", "binary"):
+            codec = CODECS[name]
+            path = os.path.join(directory, "empty" + codec.extension)
+            codec.dump([], path)
+            assert codec.load(path, max_workers=2) == ([], [])
+        tiny = SmartHome()
+        tiny.add_device(SmartPlug(5))
+        for name in ("jsonl", "binary"):
+            codec = CODECS[name]
+            path = os.path.join(directory, "tiny" + codec.extension)
+            codec.dump([tiny], path)
+            parts = os.path.getsize(path) + 2
+            assert len(codec.split(path, parts)) == 1
+            homes, errors = codec.load(path, max_workers=2)
+            assert not errors and [str(home) for home in homes] == [str(tiny)]
+        
+        # Test wrong header
+        print("\nLoading a CSV store as binary:")
+        try:
+            CODECS["binary"].load(paths["csv"])
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        
+        # Test lookups
+        print("\nLooking up codecs:")
+        assert get_codec("jsonl") is CODECS["jsonl"]
+        assert codec_for_path("fleet.SHB") is CODECS["binary"]
+        assert codec_for_path("fleet.txt") is CODECS["csv"]
+        try:
+            get_codec("xml")
+            assert False, "Expected a ValueError"
+        except ValueError as e:
+            print(f"Error caught: {e}")
+        
+        # Test sharded writes
+        print("\nWriting binary shards of 100 homes:")
+        shards = write_fleet(fleet, os.path.join(directory, "shards"), "binary", homes_per_file=100)
+        assert len(shards) == 3 and all(shard.endswith(".shb") for shard in shards)
+        loaded = [home for shard in shards for home in CODECS["binary"].load(shard)[0]]
+        assert [str(home) for home in loaded] == expected
+    
+    # Test the comparison
+    print("\nComparing codecs:")
+    results = compare_codecs(fleet[:50], repeat=1)
+    for name, result in results.items():
+        print(f"{name}: {result['bytes']} bytes, encode {result['encode']:.4f} s, decode {result['decode']:.4f} s")
+    assert set(results) == set(CODECS)
+    
+    print("\nStore codecs testing completed successfully.")
+
+if __name__ == "__main__":
+    test_store_codecs()
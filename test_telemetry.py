@@ -0,0 +1,144 @@
+import os
+import tempfile
+from smart_devices import SmartPlug, SmartOven
+from smart_home import SmartHome
+from telemetry import RingBuffer, TelemetryRecorder
+
+class FakeClock:
+    """A manually advanced clock for driving the recorder in tests."""
+    
+    def __init__(self, now=0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+def test_ring_buffer():
+    """
+    Test the functionality of the RingBuffer class.
+    
+    This function tests:
+    1. Appending samples up to capacity
+    2. Evicting the oldest sample once full
+    3. Range queries
+    4. Rejecting an invalid capacity
+    """
+    print("\n=== Testing RingBuffer Class ===")
+    
+    buffer = RingBuffer(3)
+    for t in range(3):
+        assert buffer.append(t, t * 10) is None
+    print(buffer.samples())
+    assert buffer.append(3, 30) == (0, 0)
+    assert buffer.samples() == [(1, 10), (2, 20), (3, 30)]
+    assert buffer.samples(start=2, end=2) == [(2, 20)]
+    assert len(buffer) == 3
+    
+    try:
+        print("\nAttempting to create a RingBuffer with capacity 0:")
+        RingBuffer(0)
+    except ValueError as e:
+        print(f"Error caught: {e}")
+    
+    print("\nRingBuffer testing completed successfully.")
+
+def test_telemetry_recorder():
+    """
+    Test the functionality of the TelemetryRecorder class.
+    
+    This function tests:
+    1. Sampling the initial state of a watched home
+    2. Recording toggles and option updates
+    3. Keeping labels stable when devices are removed
+    4. Rolling evicted samples up into minute and hour aggregates on disk
+    5. Labelling devices afresh when a home is watched again
+    6. Flushing and dropping a home's series when it is unwatched
+    7. Buffering rollup rows and querying a file written by another recorder
+    """
+    print("\n=== Testing TelemetryRecorder Class ===")
+    
+    home = SmartHome()
+    home.add_device(SmartPlug(45))
+    home.add_device(SmartOven())
+    clock = FakeClock(0.0)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = TelemetryRecorder(capacity=4, directory=directory, clock=clock)
+        recorder.watch("home", home)
+        oven = recorder.label("home", 1)
+        print(f"Oven label: {oven}")
+        assert recorder.query(oven, "temperature") == [(0.0, 150.0)]
+        
+        # Test recording changes
+        print("\nRecording oven temperature changes every 30 seconds:")
+        for step, temperature in enumerate([160, 170, 180, 190, 200, 210], start=1):
+            clock.now = step * 30.0
+            home.update_option(1, temperature)
+        print(recorder.query(oven, "temperature"))
+        assert [value for _, value in recorder.query(oven, "temperature")] == [180, 190, 200, 210]
+        
+        # Test rollups of evicted samples
+        minutes = recorder.query_rollups(oven, "temperature", "minute")
+        for rollup in minutes:
+            print(f"Minute {rollup.start}: count={rollup.count} min={rollup.minimum} max={rollup.maximum}")
+        assert [(rollup.start, rollup.count) for rollup in minutes] == [(0.0, 2), (60.0, 1)]
+        assert os.path.exists(os.path.join(directory, "telemetry_minutes.csv"))
+        
+        # Test stable labels and retiring removed devices
+        print("\nRemoving the plug and toggling the oven:")
+        plug = recorder.label("home", 0)
+        clock.now = 4000.0
+        home.remove_device(0)
+        home.toggle_device(0)
+        assert recorder.label("home", 0) == oven
+        assert recorder.query(oven, "switched_on")[-1] == (4000.0, 1.0)
+        assert recorder.query(plug, "consumption_rate") == []
+        hours = recorder.query_rollups(plug, "consumption_rate", "hour")
+        print(f"Plug hour rollups: {[(rollup.start, rollup.last) for rollup in hours]}")
+        assert [(rollup.start, rollup.last) for rollup in hours] == [(0.0, 45.0)]
+        
+        # Test unwatching and watching again
+        print("\nUnwatching and watching the home again:")
+        recorder.unwatch("home")
+        recorder.watch("home", home)
+        print(f"Oven label: {recorder.label('home', 0)}")
+        assert recorder.label("home", 0) == "home/2"
+        recorder.unwatch("home")
+        assert len(recorder) == 0
+        
+        # Test that watch/unwatch cycles keep memory flat and flush history
+        print("\nWatching and unwatching a 2-device home 100 times:")
+        home.add_device(SmartPlug(30))
+        for cycle in range(100):
+            clock.now = 5000.0 + cycle
+            recorder.watch("home", home)
+            assert len(recorder) == 4
+            recorder.unwatch("home")
+        assert len(recorder) == 0
+        with open(os.path.join(directory, "telemetry_hours.csv")) as file:
+            assert sum("home/101," in line for line in file) == 2
+        
+        # Test buffered writes and the offset index
+        print("\nQuerying the hour rollups from a new recorder:")
+        reopened = TelemetryRecorder(capacity=1, directory=directory, clock=clock)
+        hours = reopened.query_rollups(plug, "consumption_rate", "hour")
+        assert [(rollup.start, rollup.last) for rollup in hours] == [(0.0, 45.0)]
+        size = os.path.getsize(os.path.join(directory, "telemetry_minutes.csv"))
+        other = SmartHome()
+        other.add_device(SmartPlug(10))
+        clock.now = 9000.0
+        reopened.watch("other", other)
+        for step, rate in enumerate([20, 30, 40]):
+            clock.now = 9000.0 + step * 60
+            other.update_option(0, rate)
+        assert os.path.getsize(os.path.join(directory, "telemetry_minutes.csv")) == size
+        minutes = reopened.query_rollups("other/0", "consumption_rate")
+        print([(rollup.start, rollup.count, rollup.last) for rollup in minutes])
+        assert [(rollup.start, rollup.count, rollup.last) for rollup in minutes] == [(9000.0, 2, 20.0), (9060.0, 1, 30.0)]
+        assert os.path.getsize(os.path.join(directory, "telemetry_minutes.csv")) > size
+    
+    print("\nTelemetryRecorder testing completed successfully.")
+
+if __name__ == "__main__":
+    test_ring_buffer()
+    test_telemetry_recorder()
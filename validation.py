@@ -0,0 +1,8 @@
+# Valid range and error message of each device option, by attribute name.
+# The device classes check their options against these bounds and the
+# device type registry builds its batch validation tables from them.
+OPTION_BOUNDS = {
+    "consumption_rate": (0, 150, "Consumption rate must be an integer between 0 and 150"),
+    "temperature": (0, 260, "Temperature must be an integer between 0 and 260 degrees Celsius"),
+    "setting": (0, 5, "Setting must be a whole number between 0 and 5"),
+}